@@ -0,0 +1,167 @@
+# backend/allocation.py
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import update, case
+
+from datab import db
+from model import ParkingLot, ParkingSpot
+from spot_pool import spot_pool
+
+# -----------------------------
+# ALLOCATION COUNTERS
+# -----------------------------
+# conflicts: guarded UPDATE matched no row because another worker claimed the spot first
+# retries:   extra attempts made after a conflict
+# exhausted: claims that gave up after SPOT_CLAIM_MAX_ATTEMPTS
+ALLOCATION_STATS = {"claims": 0, "conflicts": 0, "retries": 0, "exhausted": 0}
+
+
+class AllocationConflict(Exception):
+    """Raised when a spot could not be claimed within the allowed attempts."""
+
+
+def allocation_stats():
+    return dict(ALLOCATION_STATS)
+
+
+def _available_spot_ids(lot_id, count):
+    # the Redis pool (when enabled and seeded) answers without scanning parking_spots
+    pooled = spot_pool.pop(lot_id, count)
+    if pooled is not None and len(pooled) >= count:
+        return pooled
+
+    rows = (
+        db.session.query(ParkingSpot.id)
+        .filter_by(lot_id=lot_id, status=ParkingSpot.STATUS_AVAILABLE)
+        .order_by(ParkingSpot.id.asc())
+        .limit(count)
+        .all()
+    )
+    ids = [r[0] for r in rows]
+    if pooled is None:
+        return ids
+
+    # a short pool may just have lost ids (a rolled-back claim, a failed push):
+    # if the DB has free spots the pool didn't hand out, rebuild it
+    candidates = list(dict.fromkeys(pooled + ids))[:count]
+    if set(ids) - set(pooled):
+        spot_pool.seed_lot(lot_id)
+        spot_pool.discard(lot_id, candidates)
+    return candidates
+
+
+def _first_available_spot_id(lot_id):
+    ids = _available_spot_ids(lot_id, 1)
+    return ids[0] if ids else None
+
+
+def claim_spot(lot_id, vehicle_number, max_attempts=None):
+    """
+    Claim the first available spot of a lot for vehicle_number.
+
+    The claim is a single conditional UPDATE guarded by status='A', so two
+    workers can never both occupy the same spot. The caller owns the
+    transaction: nothing is committed here.
+
+    Returns the claimed spot id, or None if the lot has no available spot.
+    Raises AllocationConflict if every attempt lost the race.
+    """
+    if max_attempts is None:
+        max_attempts = current_app.config.get("SPOT_CLAIM_MAX_ATTEMPTS", 5)
+
+    for attempt in range(max_attempts):
+        if attempt:
+            ALLOCATION_STATS["retries"] += 1
+
+        spot_id = _first_available_spot_id(lot_id)
+        if spot_id is None:
+            return None
+
+        result = db.session.execute(
+            update(ParkingSpot)
+            .where(
+                ParkingSpot.id == spot_id,
+                ParkingSpot.status == ParkingSpot.STATUS_AVAILABLE,
+            )
+            .values(
+                status=ParkingSpot.STATUS_OCCUPIED,
+                vehicle_number=vehicle_number,
+                reserved_at=datetime.utcnow(),
+                change_seq=ParkingSpot.next_change_seq(lot_id),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            ALLOCATION_STATS["claims"] += 1
+            ParkingLot.adjust_counters(lot_id, available=-1, occupied=1)
+            return spot_id
+
+        ALLOCATION_STATS["conflicts"] += 1
+
+    ALLOCATION_STATS["exhausted"] += 1
+    raise AllocationConflict(f"Could not claim a spot in lot {lot_id} after {max_attempts} attempts")
+
+
+def claim_spots(lot_id, vehicle_numbers, max_attempts=None):
+    """
+    Set-based version of claim_spot for fleet bookings.
+
+    Each attempt picks len(pending) candidate spots with one SELECT and claims
+    them with one guarded UPDATE (vehicle numbers mapped per spot with CASE).
+    Spots lost to other workers are retried, up to max_attempts rounds.
+    The caller owns the transaction.
+
+    Returns a list aligned with vehicle_numbers: claimed spot id or None when the
+    lot ran out of spots.
+    """
+    if max_attempts is None:
+        max_attempts = current_app.config.get("SPOT_CLAIM_MAX_ATTEMPTS", 5)
+
+    results = [None] * len(vehicle_numbers)
+    pending = list(range(len(vehicle_numbers)))
+
+    for attempt in range(max_attempts):
+        if not pending:
+            break
+        if attempt:
+            ALLOCATION_STATS["retries"] += 1
+
+        candidates = _available_spot_ids(lot_id, len(pending))
+        if not candidates:
+            break
+
+        wanted = dict(zip(candidates, pending))  # spot_id -> index into vehicle_numbers
+        # RETURNING: the spots this UPDATE claimed (candidates taken concurrently are skipped)
+        won = db.session.execute(
+            update(ParkingSpot)
+            .where(
+                ParkingSpot.id.in_(candidates),
+                ParkingSpot.status == ParkingSpot.STATUS_AVAILABLE,
+            )
+            .values(
+                status=ParkingSpot.STATUS_OCCUPIED,
+                vehicle_number=case(
+                    {spot_id: vehicle_numbers[i] for spot_id, i in wanted.items()},
+                    value=ParkingSpot.id,
+                ),
+                reserved_at=datetime.utcnow(),
+                change_seq=ParkingSpot.next_change_seq(lot_id),
+            )
+            .returning(ParkingSpot.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        ALLOCATION_STATS["conflicts"] += len(candidates) - len(won)
+
+        for spot_id in won:
+            results[wanted[spot_id]] = spot_id
+        ALLOCATION_STATS["claims"] += len(won)
+        ParkingLot.adjust_counters(lot_id, available=-len(won), occupied=len(won))
+
+        lot_exhausted = len(candidates) < len(pending) and len(won) == len(candidates)
+        done = {wanted[spot_id] for spot_id in won}
+        pending = [i for i in pending if i not in done]
+        if lot_exhausted:
+            break
+
+    return results
@@ -1,5 +1,6 @@
 # backend/app.py
 
+import click
 from flask import Flask
 from flask_security import Security
 from flask_restful import Api
@@ -7,6 +8,10 @@ from flask_cors import CORS
 
 # --- Core Imports (Corrected Paths) ---
 from datab import db
+from model import ParkingLot, rebuild_rollups
+from migrations import run_migrations, applied_versions, MIGRATIONS
+from lot_import import detect_format, import_lots
+from archive import archive_cutoff, archive_reservations
 from config import Config
 from user_datastr import user_datastore
 
@@ -16,20 +21,32 @@ from cntrlrs.authentication_apis import (
 )
 
 
-from cntrlrs.admin_apis import AdminDashboardAPI, AdminAllBookingsAPI
-from cntrlrs.parkinglot_apis import ParkingLotAPI, ParkingLotSpotsAPI
+from cntrlrs.admin_apis import AdminDashboardAPI, AdminAllBookingsAPI, AdminStatsAPI
+from cntrlrs.parkinglot_apis import ParkingLotAPI, ParkingLotSpotsAPI, LotProvisionStatusAPI
 from cntrlrs.parkingspot_apis import ParkingSpotAPI, AdminSpotDetailsAPI
 from cntrlrs.booking_apis import (
     ReserveSpotAPI,
+    ReserveBatchAPI,
     ReleaseSpotAPI,
+    ReleaseBatchAPI,
     UserBookingsAPI
 )
 from cntrlrs.user_apis import UserListAPI
 from cntrlrs.chart_apis import ChartDataAPI, UserChartDataAPI
 from cntrlrs.export_csv_apis import ExportCSVAPI, DownloadCSVAPI
+from cntrlrs.event_apis import LotEventsAPI, AllLotsEventsAPI
+from cntrlrs.occupancy_apis import LotLayoutAPI, LotOccupancyAPI
+from cntrlrs.lot_import_apis import LotImportAPI
 from werkzeug.security import generate_password_hash
 
-from cache import cache
+from cache import tiered
+from spot_pool import spot_pool
+from events import broker
+from occupancy import bitmaps
+import query_counter
+import storage
+import sharding
+from cntrlrs import responses
 # ---------------------------------------------------
 # Application Factory
 # ---------------------------------------------------
@@ -37,16 +54,14 @@ def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
-    # Redis Cache Setup
-    app.config["CACHE_TYPE"] = "RedisCache"
-    app.config["CACHE_REDIS_HOST"] = "localhost"
-    app.config["CACHE_REDIS_PORT"] = 6379
-    app.config["CACHE_DEFAULT_TIMEOUT"] = 300  # 5 minutes
-
-    cache.init_app(app)
+    # Redis Cache Setup (L1 in-process LRU in front of Redis, see cache.py)
+    tiered.init_app(app)
     
-    # Initialize DB + Security
+    # Initialize DB + Security (pragmas / read replica: see storage.py; shards: sharding.py)
+    storage.configure(app)
+    sharding.configure(app)
     db.init_app(app)
+    storage.init_app(app)
     security = Security(app, user_datastore)
 
     # API prefix
@@ -54,7 +69,10 @@ def create_app():
 
     # Create DB + Auto-create admin
     with app.app_context():
-        db.create_all()
+        db.create_all(bind_key=None)  # the read replica is a copy of the primary
+        # columns / indexes added after a database was created
+        run_migrations()
+        storage.ensure_snapshot()
 
         # Create roles
         admin_role = user_datastore.find_or_create_role(
@@ -75,6 +93,20 @@ def create_app():
 
         db.session.commit()
 
+    # Extra shards: schema, id ranges, per-request routing (no-op without SHARD_URIS)
+    sharding.init_app(app)
+
+    # Seed per-lot free-spot pools (no-op unless SPOT_POOL_ENABLED)
+    spot_pool.init_app(app)
+
+    # Occupancy events for the SSE endpoints (Redis pub/sub or in-process)
+    broker.init_app(app)
+    # Per-lot occupancy bitmaps, kept current from those events
+    bitmaps.init_app(app)
+
+    # X-Query-Count header (no-op unless SQL_QUERY_COUNTER or debug)
+    query_counter.init_app(app)
+
     return app
 
 
@@ -83,6 +115,8 @@ def create_app():
 # ---------------------------------------------------
 app = create_app()
 api = Api(app, prefix="/api")
+# orjson encoding + gzip/brotli for every Resource
+responses.init_app(app, api)
 
 # CORS for Vue frontend
 CORS(app, origins=[
@@ -103,12 +137,15 @@ api.add_resource(CheckEmailAPI,   "/auth/check-email")
 
 # Admin
 api.add_resource(AdminDashboardAPI, "/admin")
+api.add_resource(AdminStatsAPI, "/admin/stats")
 api.add_resource(AdminSpotDetailsAPI, "/admin/spot-details/<int:spot_id>")
 
 # Parking Lots
 api.add_resource(ParkingLotAPI,
                  "/lots",
                  "/lots/<int:lot_id>")
+api.add_resource(LotProvisionStatusAPI, "/lots/provision/<string:task_id>")
+api.add_resource(LotImportAPI, "/lots/import")
 
 # Parking Spots
 api.add_resource(ParkingSpotAPI,
@@ -117,10 +154,20 @@ api.add_resource(ParkingSpotAPI,
 from cntrlrs.lot_spots_apis import SpotsByLotAPI
 api.add_resource(SpotsByLotAPI, "/lots/<int:lot_id>/spots")
 
+# Live occupancy (Server-Sent Events)
+api.add_resource(LotEventsAPI, "/lots/<int:lot_id>/events")
+api.add_resource(AllLotsEventsAPI, "/lots/events")
+
+# Compact occupancy (layout once + status bitmap)
+api.add_resource(LotLayoutAPI, "/lots/<int:lot_id>/layout")
+api.add_resource(LotOccupancyAPI, "/lots/<int:lot_id>/occupancy")
+
 
 # Bookings
 api.add_resource(ReserveSpotAPI,     "/reserve")
+api.add_resource(ReserveBatchAPI,    "/reserve/batch")
 api.add_resource(ReleaseSpotAPI,     "/bookings/release/<int:booking_id>")
+api.add_resource(ReleaseBatchAPI,    "/bookings/release/batch")
 api.add_resource(UserBookingsAPI,    "/bookings/user")
 
 # Users
@@ -151,8 +198,80 @@ def index():
     }, 200
 
 
+# ---------------------------------------------------
+# CLI Commands
+# ---------------------------------------------------
+@app.cli.command("migrate")
+def migrate():
+    """Apply pending schema migrations and list the schema version."""
+    applied = run_migrations()
+    click.echo(f"applied: {applied or 'nothing pending'}")
+    done = applied_versions()
+    for version, description, _ in sorted(MIGRATIONS, key=lambda m: m[0]):
+        click.echo(f"  [{'x' if version in done else ' '}] {version:03d} {description}")
+
+
+@app.cli.command("verify-occupancy")
+@click.option("--repair", is_flag=True, help="Write recomputed counters back to parking_lots.")
+def verify_occupancy(repair):
+    """Compare per-lot occupancy counters with parking_spots."""
+    drifted = {}
+    for shard_drift in sharding.for_each_shard(ParkingLot.verify_counters, repair=repair):
+        drifted.update(shard_drift)
+    for lot_id, counts in drifted.items():
+        click.echo(f"lot {lot_id}: stored (available, occupied)={counts['stored']} actual={counts['actual']}")
+    if repair:
+        db.session.commit()
+    click.echo(f"{len(drifted)} lot(s) drifted" + (", repaired" if repair and drifted else ""))
+
+
+@app.cli.command("import-lots")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Default: from the file extension.")
+@click.option("--chunk-size", type=int, default=None, help="Rows per transaction (default IMPORT_CHUNK_SIZE).")
+def import_lots_command(path, fmt, chunk_size):
+    """Bulk-create lots and their spots from a CSV or JSON-lines file."""
+    fmt = fmt or detect_format(filename=path)
+    if fmt is None:
+        raise click.UsageError("can't tell the format from the file name, pass --format")
+
+    def progress(report):
+        click.echo(f"  {report.rows} rows, {report.lots} lots, {report.failed} failed ({report.rows_per_sec} rows/sec)")
+
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        report = import_lots(f, fmt,
+                             chunk_size=chunk_size or app.config["IMPORT_CHUNK_SIZE"],
+                             max_errors=app.config["IMPORT_MAX_ERRORS"],
+                             progress=progress)
+    for err in report.errors:
+        click.echo(f"line {err['line']}: {err['error']}")
+    if report.failed > len(report.errors):
+        click.echo(f"... and {report.failed - len(report.errors)} more")
+    click.echo(f"{report.lots} lots / {report.spots} spots created, {report.failed} row(s) failed, "
+               f"{report.rows} rows in {report.seconds:.1f}s ({report.rows_per_sec} rows/sec)")
+
+
+@app.cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """Recompute the daily reporting rollups from reservation history."""
+    sharding.for_each_shard(rebuild_rollups)
+    db.session.commit()
+    click.echo("Rollups rebuilt.")
+
+
+@app.cli.command("archive-reservations")
+@click.option("--months", type=int, default=None, help="Released more than this many months ago (default ARCHIVE_AFTER_MONTHS).")
+def archive_reservations_command(months):
+    """Move old released reservations to reservations_archive."""
+    cutoff = archive_cutoff(months)
+    moved = sharding.for_each_shard(archive_reservations, cutoff, app.config["ARCHIVE_BATCH_SIZE"])
+    click.echo(f"{sum(moved)} reservation(s) released before {cutoff:%Y-%m-%d} archived.")
+
+
 # ---------------------------------------------------
 # Main Entry
 # ---------------------------------------------------
 if __name__ == "__main__":
+    app.config["SQL_QUERY_COUNTER"] = True
+    query_counter.init_app(app)
     app.run(debug=True)
@@ -0,0 +1,92 @@
+# backend/archive.py
+import calendar
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import select, insert, delete, func
+
+from datab import db, transaction
+from model import ParkingLot, ParkingSpot, Reservation, ReservationArchive
+
+# -----------------------------
+# HOT / COLD RESERVATIONS
+# -----------------------------
+# Reservations released more than ARCHIVE_AFTER_MONTHS ago are moved from
+# `reservations` to `reservations_archive` (same shard, same ids) by the
+# archive_old_reservations task, so the hot table only holds recent history.
+# Charts and reports read the daily rollups, which already count the moved
+# bookings; rebuild_rollups() reads both tables. Listings that can go back in
+# time (user and admin bookings, CSV export) add the archive only when the
+# requested range reaches it (reaches_archive).
+
+ARCHIVE_COLUMNS = (
+    "id", "user_id", "spot_id", "lot_id", "lot_name", "spot_number",
+    "parking_timestamp", "leaving_timestamp", "parking_cost", "vehicle_number", "remarks",
+)
+
+
+def archive_cutoff(months=None, now=None):
+    """Same time `months` calendar months ago (default ARCHIVE_AFTER_MONTHS)."""
+    if months is None:
+        months = current_app.config.get("ARCHIVE_AFTER_MONTHS", 12)
+    now = now or datetime.utcnow()
+    year, month = divmod(now.year * 12 + now.month - 1 - months, 12)
+    day = min(now.day, calendar.monthrange(year, month + 1)[1])
+    return now.replace(year=year, month=month + 1, day=day)
+
+
+def archive_reservations(cutoff, batch_size=5000):
+    """
+    Move the current shard's reservations released before `cutoff` into
+    reservations_archive, batch_size rows per transaction (copy + delete, so a
+    booking is always in exactly one of the two tables). Returns the count moved.
+    """
+    # SQLite hands out max(id) + 1 on tables without AUTOINCREMENT (older
+    # databases): the newest reservation stays hot so an archived id is never reused
+    newest = select(func.max(Reservation.id)).scalar_subquery()
+    moved = 0
+    while True:
+        with transaction():
+            ids = db.session.execute(
+                select(Reservation.id)
+                .where(Reservation.leaving_timestamp < cutoff, Reservation.id < newest)
+                .order_by(Reservation.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            rows = (
+                select(
+                    Reservation.id, Reservation.user_id, Reservation.spot_id,
+                    ParkingSpot.lot_id, ParkingLot.prime_location_name, ParkingSpot.spot_number,
+                    Reservation.parking_timestamp, Reservation.leaving_timestamp,
+                    Reservation.parking_cost, Reservation.vehicle_number, Reservation.remarks,
+                )
+                .join(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+                .join(ParkingLot, ParkingSpot.lot_id == ParkingLot.id)
+                .where(Reservation.id.in_(ids))
+            )
+            db.session.execute(insert(ReservationArchive).from_select(ARCHIVE_COLUMNS, rows))
+            db.session.execute(delete(Reservation).where(Reservation.id.in_(ids))
+                               .execution_options(synchronize_session=False))
+        moved += len(ids)
+    return moved
+
+
+def reaches_archive(user_id=None, start=None, end=None):
+    """
+    True if archived bookings (of user_id, or of anyone when None) on the
+    current shard can fall in [start, end) (on parking_timestamp; either end
+    open). One index lookup.
+    """
+    span = select(func.min(ReservationArchive.parking_timestamp), func.max(ReservationArchive.parking_timestamp))
+    if user_id is not None:
+        span = span.where(ReservationArchive.user_id == user_id)
+    oldest, newest = db.session.execute(span).one()
+    if newest is None:
+        return False
+    if start and newest < start:
+        return False
+    if end and oldest >= end:
+        return False
+    return True
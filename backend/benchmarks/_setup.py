@@ -0,0 +1,39 @@
+# backend/benchmarks/_setup.py
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def bench_app(path=None):
+    """
+    The full app (every route) on a throwaway SQLite file, caching in-process:
+    benchmarks never touch instance/parking.db and don't need Redis.
+    """
+    import config
+    path = path or os.path.join(tempfile.mkdtemp(prefix="parking-bench-"), "bench.db")
+    config.Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+    config.Config.CACHE_TYPE = "SimpleCache"
+    config.Config.CACHE_OPTIONS = {}
+    config.Config.SQL_QUERY_COUNTER = False
+    import app as app_module
+    return app_module.app
+
+
+def best_of(fn, repeat=5):
+    """(fastest wall time in seconds, fn's last result) over `repeat` runs."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def print_table(header, rows):
+    widths = [max(len(str(cell)) for cell in column) for column in zip(header, *rows)]
+    for line in [header, ["-" * w for w in widths], *rows]:
+        print("  ".join(str(cell).rjust(w) for cell, w in zip(line, widths)))
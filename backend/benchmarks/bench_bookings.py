@@ -0,0 +1,92 @@
+# backend/benchmarks/bench_bookings.py
+"""
+Bookings/sec and commits per booking for reserve + release.
+
+  commit per step  the old flow: occupy(), the reservation insert and
+                   finalize() each committed on their own
+  one transaction  the same work with one transaction per request
+                   (claim_spot + insert, then finalize)
+  api              one transaction per request, through the HTTP endpoints
+
+    python benchmarks/bench_bookings.py [--bookings 500] [--synchronous FULL]
+"""
+import argparse
+import time
+
+from _setup import bench_app, print_table
+
+COMMITS = {"count": 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bookings/sec and commits per booking")
+    parser.add_argument("--bookings", type=int, default=500)
+    parser.add_argument("--synchronous", help="override SQLITE_PRAGMAS synchronous (e.g. FULL, the SQLite default)")
+    args = parser.parse_args()
+
+    import config
+    if args.synchronous:
+        config.Config.SQLITE_PRAGMAS = dict(config.Config.SQLITE_PRAGMAS, synchronous=args.synchronous)
+    app = bench_app()
+
+    from sqlalchemy import event
+    from allocation import claim_spot
+    from datab import db, transaction
+    from model import ParkingLot, ParkingSpot, Reservation, User
+
+    @event.listens_for(db.session.__class__, "after_commit")
+    def count_commit(session):
+        COMMITS["count"] += 1
+
+    with app.app_context():
+        user = User(username="bench", email="bench@example.com", password="x")
+        lot = ParkingLot(prime_location_name="Bench", address="addr", pin_code="400001",
+                         price_per_hour=20.0, number_of_spots=10)
+        db.session.add_all([user, lot])
+        db.session.flush()
+        lot.create_spots()
+        db.session.commit()
+        user_id, lot_id = user.id, lot.id
+
+    def commit_per_step(n):
+        spot = ParkingSpot.query.filter_by(lot_id=lot_id, status=ParkingSpot.STATUS_AVAILABLE).first()
+        spot.occupy(f"C{n}")
+        db.session.commit()
+        reservation = Reservation(user_id=user_id, spot_id=spot.id, vehicle_number=f"C{n}")
+        db.session.add(reservation)
+        db.session.commit()
+        reservation.finalize()
+        db.session.commit()
+
+    def one_transaction(n):
+        with transaction():
+            spot_id = claim_spot(lot_id, f"T{n}")
+            reservation = Reservation(user_id=user_id, spot_id=spot_id, vehicle_number=f"T{n}")
+            db.session.add(reservation)
+        with transaction():
+            reservation.finalize()
+
+    client = app.test_client()
+
+    def api(n):
+        r = client.post("/api/reserve", json={"user_id": user_id, "lot_id": lot_id, "vehicle_number": f"A{n}"})
+        client.post(f"/api/bookings/release/{r.get_json()['data']['reservation_id']}")
+
+    rows = []
+    for label, cycle in (("commit per step", commit_per_step), ("one transaction", one_transaction), ("api", api)):
+        with app.app_context():
+            COMMITS["count"] = 0
+            start = time.perf_counter()
+            for n in range(args.bookings):
+                cycle(n)
+            elapsed = time.perf_counter() - start
+        rows.append([label, args.bookings, f"{elapsed:.2f}", f"{args.bookings / elapsed:.0f}",
+                     f"{COMMITS['count'] / args.bookings:.1f}"])
+
+    synchronous = config.Config.SQLITE_PRAGMAS.get("synchronous")
+    print(f"reserve + release, journal_mode={config.Config.SQLITE_PRAGMAS.get('journal_mode')} synchronous={synchronous}")
+    print_table(["flow", "bookings", "seconds", "bookings/sec", "commits/booking"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# backend/benchmarks/bench_charts.py
+"""
+Chart aggregation regression benchmark (user-010): 500 lots x 1,000 spots by
+default. Times the shared set-based aggregations and both chart endpoints
+(cache invalidated before every call), and with --naive the old
+per-lot / per-spot Python loops for comparison.
+
+    python benchmarks/bench_charts.py [--lots 500] [--spots 1000] [--naive] [--budget-ms 500]
+
+--budget-ms exits with status 1 if any set-based timing is over budget.
+"""
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+
+from _setup import bench_app, best_of, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chart aggregation benchmark")
+    parser.add_argument("--lots", type=int, default=500)
+    parser.add_argument("--spots", type=int, default=1000, help="spots per lot")
+    parser.add_argument("--bookings", type=int, default=20000)
+    parser.add_argument("--naive", action="store_true", help="also time the old per-lot / per-spot loops")
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    app = bench_app()
+
+    from sqlalchemy import func, insert
+    from cache import invalidate, CHARTS
+    from cntrlrs.chart_apis import lot_occupancy, user_bookings_by_lot, monthly_reservation_counts
+    from datab import db
+    from model import ParkingLot, ParkingSpot, Reservation, User, rebuild_rollups
+
+    random.seed(7)
+    with app.app_context():
+        print(f"seeding {args.lots} lots x {args.spots} spots, {args.bookings} bookings ...", flush=True)
+        users = [User(username=f"u{i}", email=f"u{i}@example.com", password="x") for i in range(20)]
+        db.session.add_all(users)
+        db.session.flush()
+        user_ids = [u.id for u in users]
+        lot_ids = db.session.execute(insert(ParkingLot).returning(ParkingLot.id), [
+            {"prime_location_name": f"Lot {i}", "address": "addr", "pin_code": "400001",
+             "price_per_hour": 20.0, "number_of_spots": args.spots}
+            for i in range(args.lots)
+        ]).scalars().all()
+        for lot_id in lot_ids:
+            db.session.execute(insert(ParkingSpot), [
+                {"lot_id": lot_id, "spot_number": f"S{n}",
+                 "status": ParkingSpot.STATUS_OCCUPIED if n % 4 == 0 else ParkingSpot.STATUS_AVAILABLE}
+                for n in range(1, args.spots + 1)
+            ])
+        ParkingLot.verify_counters(repair=True)
+
+        spot_ids = db.session.execute(db.select(func.min(ParkingSpot.id), func.max(ParkingSpot.id))).one()
+        now = datetime.utcnow()
+        rows = []
+        for n in range(args.bookings):
+            parked = now - timedelta(days=random.randint(0, 365), hours=random.randint(0, 23))
+            rows.append({"user_id": random.choice(user_ids), "spot_id": random.randint(*spot_ids),
+                         "vehicle_number": f"V{n}", "parking_timestamp": parked,
+                         "leaving_timestamp": parked + timedelta(hours=2), "parking_cost": 40.0})
+        db.session.execute(insert(Reservation), rows)
+        rebuild_rollups()
+        db.session.commit()
+
+        user_id = user_ids[0]
+        client = app.test_client()
+
+        def endpoint(url):
+            def call():
+                invalidate(CHARTS)
+                assert client.get(url).status_code == 200
+            return call
+
+        timings = [
+            ("lot_occupancy()", lambda: lot_occupancy()),
+            ("user_bookings_by_lot()", lambda: user_bookings_by_lot(user_id)),
+            ("monthly_reservation_counts()", lambda: monthly_reservation_counts()),
+            ("GET /api/chart/admin", endpoint("/api/chart/admin")),
+            ("GET /api/chart/user-dashboard", endpoint(f"/api/chart/user-dashboard?user_id={user_id}")),
+        ]
+        results = []
+        for label, fn in timings:
+            seconds, _ = best_of(fn)
+            results.append((label, seconds))
+
+        if args.naive:
+            def naive_admin():
+                # the old ChartDataAPI: every spot loaded and counted in Python
+                data = []
+                for lot in ParkingLot.query.all():
+                    occupied = sum(1 for s in lot.spots if s.status == ParkingSpot.STATUS_OCCUPIED)
+                    data.append((lot.id, len(lot.spots), occupied))
+                db.session.expire_all()
+                return data
+
+            def naive_user():
+                # the old UserChartDataAPI: a COUNT per lot plus len(lot.spots)
+                data = []
+                for lot in ParkingLot.query.all():
+                    booked = (Reservation.query.join(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+                              .filter(ParkingSpot.lot_id == lot.id, Reservation.user_id == user_id).count())
+                    data.append((lot.id, len(lot.spots), booked))
+                db.session.expire_all()
+                return data
+
+            results.append(("naive admin loop", best_of(naive_admin, repeat=1)[0]))
+            results.append(("naive user loop", best_of(naive_user, repeat=1)[0]))
+
+    print_table(["aggregation", "best ms"], [(label, f"{s * 1000:.1f}") for label, s in results])
+    if args.budget_ms is not None:
+        over = [label for label, s in results if not label.startswith("naive") and s * 1000 > args.budget_ms]
+        if over:
+            print(f"over budget ({args.budget_ms} ms): {', '.join(over)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# backend/benchmarks/bench_projections.py
+"""
+ORM hydration + to_dict() against the Core column projections
+(cntrlrs/serializers.py, user-020): latency and memory per 10k rows for the
+bookings and spots lists.
+
+    python benchmarks/bench_projections.py [--rows 10000]
+"""
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+from _setup import bench_app, best_of, print_table
+
+
+def measure(fn):
+    """(best ms, peak traced KiB, blocks still held after one run)."""
+    seconds, _ = best_of(fn)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    return seconds * 1000, peak / 1024, blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ORM to_dict vs column projections")
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    app = bench_app()
+
+    from sqlalchemy import insert
+    from datab import db
+    from model import ParkingLot, ParkingSpot, Reservation, User
+    from cntrlrs.serializers import BOOKING, SPOT
+
+    with app.app_context():
+        user = User(username="bench", email="bench@example.com", password="x")
+        lot = ParkingLot(prime_location_name="Bench", address="addr", pin_code="400001",
+                         price_per_hour=20.0, number_of_spots=args.rows)
+        db.session.add_all([user, lot])
+        db.session.flush()
+        spot_ids = lot.create_spots()
+        start = datetime(2025, 1, 1, 8, 30)
+        db.session.execute(insert(Reservation), [
+            {"user_id": user.id, "spot_id": spot_id, "vehicle_number": f"V{n}",
+             "parking_timestamp": start + timedelta(minutes=n),
+             "leaving_timestamp": start + timedelta(minutes=n + 120), "parking_cost": 40.0}
+            for n, spot_id in enumerate(spot_ids)
+        ])
+        db.session.commit()
+        user_id, lot_id = user.id, lot.id
+
+        def orm_bookings():
+            data = [r.to_dict() for r in Reservation.query.filter_by(user_id=user_id).all()]
+            db.session.expunge_all()
+            return data
+
+        def projected_bookings():
+            query = BOOKING.select().where(Reservation.user_id == user_id)
+            return [BOOKING.to_dict(row) for row in db.session.execute(query)]
+
+        def orm_spots():
+            data = [s.to_dict() for s in ParkingSpot.query.filter_by(lot_id=lot_id).all()]
+            db.session.expunge_all()
+            return data
+
+        def projected_spots():
+            query = SPOT.select().where(ParkingSpot.lot_id == lot_id)
+            return [SPOT.to_dict(row) for row in db.session.execute(query)]
+
+        assert orm_bookings() == projected_bookings()
+        assert orm_spots() == projected_spots()
+
+        rows = []
+        per = 10000 / args.rows
+        for payload, label, fn in (
+            ("bookings", "ORM to_dict", orm_bookings),
+            ("bookings", "projection", projected_bookings),
+            ("spots", "ORM to_dict", orm_spots),
+            ("spots", "projection", projected_spots),
+        ):
+            ms, peak_kib, blocks = measure(fn)
+            rows.append([payload, label, f"{ms * per:.1f}", f"{peak_kib * per:.0f}", f"{blocks * per:.0f}"])
+
+    print(f"{args.rows} rows, scaled per 10k rows")
+    print_table(["list", "serializer", "ms / 10k", "peak KiB / 10k", "blocks held / 10k"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# backend/benchmarks/bench_responses.py
+"""
+Response layer microbenchmark (user-019): encode time and bytes on the wire
+for a bookings and a spots payload.
+
+  stdlib + isoformat  the old path: to_dict() calls isoformat() on every
+                      datetime, then json.dumps
+  stdlib              json.dumps with the shared datetime default hook
+  orjson              the default encoder (native datetimes)
+
+Sizes are raw, gzip (COMPRESS_GZIP_LEVEL) and brotli (COMPRESS_BROTLI_QUALITY,
+when the brotli package is installed).
+
+    python benchmarks/bench_responses.py [--rows 2000]
+"""
+import argparse
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from _setup import best_of, print_table  # also puts backend/ on sys.path
+
+from config import Config
+from cntrlrs import responses
+
+
+def bookings(rows):
+    start = datetime(2025, 1, 1, 8, 30)
+    return [{
+        "id": n, "user_id": n % 50, "spot_id": n % 1000, "lot_name": f"Lot {n % 40}",
+        "spot_number": f"S{n % 1000}", "status": "released", "cost": 40.0,
+        "parking_timestamp": start + timedelta(minutes=n),
+        "leaving_timestamp": start + timedelta(minutes=n + 120),
+        "parking_cost": 40.0, "vehicle_number": f"MH01AB{n:04d}", "remarks": None,
+    } for n in range(rows)]
+
+
+def spots(rows):
+    start = datetime(2025, 1, 1, 8, 30)
+    return [{
+        "id": n, "lot_id": 1 + n // 1000, "spot_number": f"S{n}",
+        "status": "O" if n % 3 else "A", "vehicle_number": f"MH01AB{n:04d}" if n % 3 else None,
+        "reserved_at": start + timedelta(minutes=n) if n % 3 else None,
+    } for n in range(rows)]
+
+
+def isoformatted(items):
+    return [{k: v.isoformat() if isinstance(v, datetime) else v for k, v in item.items()} for item in items]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encode time and response size")
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    encoders = [
+        ("stdlib + isoformat", lambda items: json.dumps(
+            responses.success({"items": isoformatted(items)}, "OK")[0]).encode()),
+        ("stdlib", lambda items: responses._encode_stdlib(responses.success({"items": items}, "OK")[0])),
+    ]
+    if responses.orjson is not None:
+        encoders.append(("orjson", lambda items: responses._encode_orjson(responses.success({"items": items}, "OK")[0])))
+
+    rows = []
+    for payload, items in (("bookings", bookings(args.rows)), ("spots", spots(args.rows))):
+        for label, encode in encoders:
+            seconds, body = best_of(lambda: encode(items), repeat=10)
+            gz = len(gzip.compress(body, Config.COMPRESS_GZIP_LEVEL))
+            br = len(responses.brotli.compress(body, quality=Config.COMPRESS_BROTLI_QUALITY)) \
+                if responses.brotli is not None else "-"
+            rows.append([payload, label, f"{seconds * 1000:.2f}", len(body), gz, br])
+
+    print(f"{args.rows} rows per payload")
+    print_table(["payload", "encoder", "encode ms", "bytes", "gzip", "brotli"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# backend/benchmarks/bench_storage.py
+"""
+Read throughput while a writer books and releases spots (storage.py, user-023).
+
+Reader processes page through /api/admin/bookings (a @reads_from_replica view)
+while one writer process runs reserve + release cycles against the primary,
+like separate web workers sharing the database files:
+
+  rollback journal   primary only, journal_mode=DELETE: readers and the writer
+                     lock each other out
+  WAL profile        primary only, SQLITE_PRAGMAS as configured
+  replica: primary   WAL profile + READ_REPLICA_URI = the primary file (a
+                     separate query_only pool)
+  replica: snapshot  WAL profile + READ_REPLICA_URI = a snapshot file (reads
+                     lag the writer until the next refresh)
+
+    python benchmarks/bench_storage.py [--seconds 5] [--readers 4] [--bookings 2000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from _setup import bench_app, print_table
+
+SETUPS = ("rollback journal", "WAL profile", "replica: primary", "replica: snapshot")
+STARTUP_SECONDS = 5     # for every worker process to import the app before the clock starts
+
+
+def storage_app(setup, directory):
+    """The app on directory/bench.db with `setup`'s storage config (same in every process)."""
+    import config
+    path = os.path.join(directory, "bench.db")
+    if setup == "rollback journal":
+        config.Config.SQLITE_PRAGMAS = dict(config.Config.SQLITE_PRAGMAS, journal_mode="DELETE")
+    elif setup == "replica: primary":
+        config.Config.READ_REPLICA_URI = f"sqlite:///{path}"
+    elif setup == "replica: snapshot":
+        config.Config.READ_REPLICA_URI = f"sqlite:///{os.path.join(directory, 'replica.db')}"
+    app = bench_app(path)
+    app.logger.disabled = True      # "database is locked" 500s are counted, not printed
+    return app
+
+
+def seed(app, bookings):
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from datab import db
+    from model import ParkingLot, Reservation, User
+    import storage
+
+    with app.app_context():
+        user = User(username="bench", email="bench@example.com", password="x")
+        lot = ParkingLot(prime_location_name="Bench", address="addr", pin_code="400001",
+                         price_per_hour=20.0, number_of_spots=bookings + 10)
+        db.session.add_all([user, lot])
+        db.session.flush()
+        spot_ids = lot.create_spots()
+        start = datetime(2025, 1, 1, 8, 0)
+        db.session.execute(insert(Reservation), [
+            {"user_id": user.id, "spot_id": spot_id, "vehicle_number": f"V{n}",
+             "parking_timestamp": start + timedelta(minutes=n),
+             "leaving_timestamp": start + timedelta(minutes=n + 60), "parking_cost": 20.0}
+            for n, spot_id in enumerate(spot_ids[:bookings])
+        ])
+        db.session.commit()
+        storage.refresh_snapshot()  # no-op unless the replica is a snapshot file
+        return {"user_id": user.id, "lot_id": lot.id}
+
+
+def read(app, start, stop):
+    client = app.test_client()
+    reads, errors, latencies = 0, 0, []
+    time.sleep(max(0.0, start - time.time()))
+    while time.time() < stop:
+        started = time.perf_counter()
+        r = client.get("/api/admin/bookings?limit=50")
+        latencies.append(time.perf_counter() - started)
+        if r.status_code == 200:
+            reads += 1
+        else:
+            errors += 1
+    return {"reads": reads, "errors": errors, "latencies": latencies}
+
+
+def write(app, start, stop, user_id, lot_id):
+    client = app.test_client()
+    cycles, errors, n = 0, 0, 0
+    time.sleep(max(0.0, start - time.time()))
+    while time.time() < stop:
+        n += 1
+        r = client.post("/api/reserve", json={"user_id": user_id, "lot_id": lot_id, "vehicle_number": f"W{n}"})
+        if r.status_code != 200:
+            errors += 1
+            continue
+        r = client.post(f"/api/bookings/release/{r.json['data']['reservation_id']}")
+        if r.status_code == 200:
+            cycles += 1
+        else:
+            errors += 1
+    return {"cycles": cycles, "errors": errors}
+
+
+def worker(args):
+    """--role seed|read|write: one process of a run; prints its result as JSON."""
+    app = storage_app(args.setup, args.directory)
+    if args.role == "seed":
+        result = seed(app, args.bookings)
+    elif args.role == "read":
+        result = read(app, args.start, args.start + args.seconds)
+    else:
+        ids = json.loads(args.ids)
+        result = write(app, args.start, args.start + args.seconds, ids["user_id"], ids["lot_id"])
+    print(json.dumps(result))
+
+
+def run_setup(setup, seconds, readers, bookings):
+    directory = tempfile.mkdtemp(prefix="parking-bench-")
+    base = [sys.executable, __file__, "--setup", setup, "--directory", directory, "--seconds", str(seconds)]
+
+    def output(proc):
+        out, _ = proc.communicate()
+        if proc.returncode:
+            raise SystemExit(f"{setup}: worker failed")
+        return json.loads(out.strip().splitlines()[-1])
+
+    ids = output(subprocess.Popen(base + ["--role", "seed", "--bookings", str(bookings)],
+                                  stdout=subprocess.PIPE, text=True))
+    start = str(time.time() + STARTUP_SECONDS)
+    procs = [subprocess.Popen(base + ["--role", "read", "--start", start], stdout=subprocess.PIPE, text=True)
+             for _ in range(readers)]
+    procs.append(subprocess.Popen(base + ["--role", "write", "--start", start, "--ids", json.dumps(ids)],
+                                  stdout=subprocess.PIPE, text=True))
+    *read_results, write_result = [output(p) for p in procs]
+
+    latencies = sorted(l for r in read_results for l in r["latencies"])
+    return [
+        setup,
+        f"{sum(r['reads'] for r in read_results) / seconds:.0f}",
+        f"{latencies[len(latencies) // 2] * 1000:.1f}" if latencies else "-",
+        f"{latencies[int(len(latencies) * 0.95)] * 1000:.1f}" if latencies else "-",
+        f"{write_result['cycles'] / seconds:.0f}",
+        sum(r["errors"] for r in read_results),
+        write_result["errors"],
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read throughput under writes: primary vs read replica")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=4, help="reader processes")
+    parser.add_argument("--bookings", type=int, default=2000, help="released bookings seeded before the run")
+    # worker processes
+    parser.add_argument("--role", choices=("seed", "read", "write"), help=argparse.SUPPRESS)
+    parser.add_argument("--setup", choices=SETUPS, help=argparse.SUPPRESS)
+    parser.add_argument("--directory", help=argparse.SUPPRESS)
+    parser.add_argument("--start", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--ids", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role:
+        worker(args)
+        return
+
+    rows = [run_setup(setup, args.seconds, args.readers, args.bookings) for setup in SETUPS]
+    print(f"{args.readers} reader processes + 1 writer, {args.seconds:g}s per setup, {args.bookings} bookings")
+    print_table(["storage", "reads/s", "read p50 ms", "read p95 ms", "write cycles/s",
+                 "read errors", "write errors"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,382 @@
+# backend/cache.py
+import json
+import logging
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
 from flask_caching import Cache
+from redis.exceptions import RedisError
+
+log = logging.getLogger(__name__)
 
 cache = Cache()
+
+
+# -----------------------------
+# L1: IN-PROCESS LRU
+# -----------------------------
+class LocalLRU:
+    """Size-bounded in-process LRU with per-entry expiry (thread safe)."""
+    def __init__(self, max_items=1024):
+        self.max_items = max_items
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# -----------------------------
+# TWO-TIER CACHE
+# -----------------------------
+class TwoTierCache:
+    """
+    L1 is a LocalLRU per process, L2 the shared flask-caching backend (Redis).
+    Reads try L1, then L2 (filling L1). Tag bumps are published on a Redis
+    channel so every worker updates its L1 tag versions straight away; L1
+    versions also expire after CACHE_L1_VERSION_TTL in case a message is lost.
+    When L2 errors it is skipped for CACHE_L2_RETRY_SECONDS and the cache
+    keeps working on L1 alone instead of failing the request.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.l1 = LocalLRU()
+        self.l1_timeout = 30
+        self.version_timeout = 5
+        self.retry_seconds = 5
+        self.channel = "cache:invalidate"
+        self.redis = None
+        self._down_until = 0.0
+        self._listener = None
+        self._held = set()
+        self._held_lock = threading.Lock()
+
+    def init_app(self, app, redis_client=None):
+        self.backend.init_app(app)
+        config = app.config
+        self.l1 = LocalLRU(config.get("CACHE_L1_MAX_ITEMS", 1024))
+        self.l1_timeout = config.get("CACHE_L1_TIMEOUT", 30)
+        self.version_timeout = config.get("CACHE_L1_VERSION_TTL", 5)
+        self.retry_seconds = config.get("CACHE_L2_RETRY_SECONDS", 5)
+        self.channel = config.get("CACHE_INVALIDATION_CHANNEL", self.channel)
+
+        # the Redis client behind RedisCache (None for other backends);
+        # redis_client swaps it out, e.g. for fakeredis
+        l2 = app.extensions["cache"][self.backend]
+        if redis_client is not None and hasattr(l2, "_write_client"):
+            l2._read_client = l2._write_client = redis_client
+        self.redis = getattr(l2, "_write_client", None)
+        if self.redis is not None and config.get("CACHE_PUBSUB_ENABLED", True):
+            self._start_listener()
+
+    @property
+    def l2_available(self):
+        return time.monotonic() >= self._down_until
+
+    def _l2(self, op, *args, **kwargs):
+        if not self.l2_available:
+            return None
+        try:
+            return getattr(self.backend, op)(*args, **kwargs)
+        except (RedisError, OSError) as e:
+            log.warning("Cache L2 unavailable, using L1 only for %ss: %s", self.retry_seconds, e)
+            self._down_until = time.monotonic() + self.retry_seconds
+            return None
+
+    # entries -------------------------------------------------
+    def get(self, key):
+        value = self.l1.get(key)
+        if value is None:
+            value = self._l2("get", key)
+            if value is not None:
+                self.l1.set(key, value, self.l1_timeout)
+        return value
+
+    def set(self, key, value, timeout=None):
+        self.l1.set(key, value, min(timeout or self.l1_timeout, self.l1_timeout))
+        self._l2("set", key, value, timeout=timeout)
+
+    # locks ---------------------------------------------------
+    def acquire(self, key, timeout):
+        """
+        Non-blocking lock on `key`: one holder per process, and across workers
+        through an L2 add (SETNX) that expires after `timeout` seconds in case
+        the holder dies. With L2 down the process-local lock still holds.
+        """
+        with self._held_lock:
+            if key in self._held:
+                return False
+            self._held.add(key)
+        if self._l2("add", key, 1, timeout=timeout) is False:
+            with self._held_lock:
+                self._held.discard(key)
+            return False
+        return True
+
+    def release(self, key):
+        self._l2("delete", key)
+        with self._held_lock:
+            self._held.discard(key)
+
+    # tag versions --------------------------------------------
+    def versions(self, keys):
+        found = [self.l1.get(k) for k in keys]
+        missing = [k for k, v in zip(keys, found) if v is None]
+        if missing:
+            shared = dict(zip(missing, self._l2("get_many", *missing) or [None] * len(missing)))
+            for key in missing:
+                if shared[key] is None:
+                    # first use (or evicted / L2 down): start a fresh version
+                    fresh = time.time_ns()
+                    if self._l2("add", key, fresh, timeout=0):
+                        shared[key] = fresh
+                    else:
+                        shared[key] = self._l2("get", key) or fresh
+                self.l1.set(key, shared[key], self.version_timeout)
+            found = [v if v is not None else shared[k] for k, v in zip(keys, found)]
+        return found
+
+    def bump(self, keys):
+        version = time.time_ns()
+        bumped = {k: version for k in keys}
+        for key in keys:
+            self.l1.set(key, version, self.version_timeout)
+        self._l2("set_many", bumped, timeout=0)
+        if self.redis is not None and self.l2_available:
+            try:
+                self.redis.publish(self.channel, json.dumps(bumped))
+            except (RedisError, OSError) as e:
+                log.warning("Cache invalidation not published: %s", e)
+
+    # pub/sub -------------------------------------------------
+    def _apply(self, data):
+        for key, version in json.loads(data).items():
+            current = self.l1.get(key)
+            if current is None or version > current:
+                self.l1.set(key, version, self.version_timeout)
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # bumps may have been missed while disconnected
+                self.l1.clear()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        self._apply(message["data"])
+            except (RedisError, OSError, ValueError) as e:
+                log.warning("Cache invalidation listener reconnecting: %s", e)
+                time.sleep(self.retry_seconds)
+
+    def _start_listener(self):
+        if self._listener is None or not self._listener.is_alive():
+            self._listener = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+            self._listener.start()
+
+
+tiered = TwoTierCache(cache)
+
+
+# -----------------------------
+# TAGS
+# -----------------------------
+# Every cached view lists the tags its data depends on. Each tag has a version
+# stored in the cache; the version goes into the key of every entry built from
+# it, so bumping one version invalidates all of those entries at once (O(1),
+# no key scans) and the stale ones simply age out.
+LOTS = "lots"          # lot list / lot details / occupancy counters
+CHARTS = "charts"      # admin charts and dashboard aggregates
+LOT_INFO = "lot-info"  # lot names / addresses / prices shown next to bookings
+
+
+def lot_tag(lot_id):
+    return f"lot:{lot_id}"
+
+
+def layout_tag(lot_id):
+    """Bumped when a lot's spots change outside the occupancy events (background provisioning)."""
+    return f"layout:{lot_id}"
+
+
+def user_tag(user_id):
+    return f"user:{user_id}"
+
+
+CACHE_STATS = {"hits": 0, "misses": 0, "invalidations": 0, "stale_served": 0, "early_refreshes": 0}
+
+
+def cache_stats():
+    return dict(CACHE_STATS, l1_items=len(tiered.l1), l2_available=tiered.l2_available)
+
+
+def _version_key(tag):
+    return f"tagver:{tag}"
+
+
+def tag_versions(tags):
+    """
+    Current version of each tag. Versions are the time.time_ns() of the last
+    bump; a tag never bumped (or evicted) gets a fresh one, which only ever
+    makes its old entries unreachable.
+    """
+    return tiered.versions([_version_key(t) for t in tags])
+
+
+def invalidate(*tags):
+    """Bump the version of each tag; entries built from the old versions are never read again."""
+    tags = set(tags)
+    tiered.bump([_version_key(t) for t in tags])
+    CACHE_STATS["invalidations"] += len(tags)
+
+
+def invalidate_reservation(lot_id, user_id):
+    """Everything a reserve / release touches: the lot's spots, the user, lot counters and charts."""
+    invalidate(lot_tag(lot_id), user_tag(user_id), LOTS, CHARTS)
+
+
+# -----------------------------
+# VIEW DECORATOR
+# -----------------------------
+def cached_view(tags, timeout=None, unless=None):
+    """
+    Cache a Resource method under versioned tags.
+    `tags(*args, **kwargs)` gets the view arguments and returns the tag list,
+    e.g. lambda lot_id: [lot_tag(lot_id)]. The key also holds the request path
+    and query string. Only 200 responses are stored.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            if unless and unless():
+                return fn(self, *args, **kwargs)
+
+            view_tags = tags(*args, **kwargs)
+            versions = tag_versions(view_tags)
+            key = "view:%s:%s:%s" % (
+                fn.__qualname__,
+                ",".join(f"{t}@{v}" for t, v in zip(view_tags, versions)),
+                request.full_path,
+            )
+            cached = tiered.get(key)
+            if cached is not None:
+                CACHE_STATS["hits"] += 1
+                return cached
+
+            CACHE_STATS["misses"] += 1
+            result = fn(self, *args, **kwargs)
+            if _cacheable(result):
+                tiered.set(key, result, timeout=timeout)
+            return result
+        return wrapper
+    return decorator
+
+
+def _cacheable(result):
+    status = result[1] if isinstance(result, tuple) and len(result) > 1 else 200
+    return status == 200
+
+
+def _wait_for(key, seconds):
+    """Poll for an entry another caller is building; None if it doesn't show up in time."""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = tiered.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def single_flight_view(tags, timeout, stale_timeout=300, early_refresh=True):
+    """
+    cached_view for expensive aggregates (dashboard, charts). When the entry has
+    expired or its tags were bumped, one caller per key (across workers) rebuilds
+    it while everyone else keeps getting the previous value, for up to
+    `stale_timeout` more seconds.
+
+    With early_refresh, a caller may rebuild before expiry with a probability
+    that grows as expiry nears and with how long the last rebuild took
+    (XFetch, scaled by CACHE_EARLY_REFRESH_BETA), so a hot entry is usually
+    refreshed by one worker before it ever expires.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            config = current_app.config
+            versions = tag_versions(tags(*args, **kwargs))
+            key = f"swr:{fn.__qualname__}:{request.full_path}"
+            entry = tiered.get(key)
+
+            fresh = entry is not None and entry["versions"] == versions
+            if fresh:
+                refresh_at = entry["expires"]
+                beta = config.get("CACHE_EARLY_REFRESH_BETA", 1.0) if early_refresh else 0
+                if beta:
+                    # log(u) <= 0, so this moves the refresh point earlier
+                    refresh_at += entry["delta"] * beta * math.log(1.0 - random.random())
+                if time.time() < refresh_at:
+                    CACHE_STATS["hits"] += 1
+                    return entry["result"]
+
+            lock_key = "lock:" + key
+            locked = tiered.acquire(lock_key, config.get("SINGLE_FLIGHT_LOCK_TIMEOUT", 30))
+            if not locked:
+                if entry is None:
+                    entry = _wait_for(key, config.get("SINGLE_FLIGHT_WAIT_SECONDS", 5))
+                if entry is not None:
+                    CACHE_STATS["stale_served"] += 1
+                    return entry["result"]
+                # nothing to serve and the rebuild is taking too long: compute it ourselves
+
+            try:
+                if fresh:
+                    CACHE_STATS["early_refreshes"] += 1
+                else:
+                    CACHE_STATS["misses"] += 1
+                started = time.time()
+                result = fn(self, *args, **kwargs)
+                finished = time.time()
+                if _cacheable(result):
+                    tiered.set(key, {
+                        "result": result,
+                        "versions": versions,
+                        "expires": finished + timeout,
+                        "delta": finished - started,
+                    }, timeout=timeout + stale_timeout)
+                return result
+            finally:
+                if locked:
+                    tiered.release(lock_key)
+        return wrapper
+    return decorator
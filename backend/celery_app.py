@@ -2,13 +2,19 @@
 from celery import Celery
 from celery.schedules import crontab
 
-from datetime import datetime
+from datetime import datetime, date
+from sqlalchemy import func
 import csv, os, sys
 sys.path.insert(0, os.path.dirname(__file__))
 
 from app import create_app
-from model import User, Reservation
+from datab import db
+from model import User, Reservation, ParkingLot, UserDailyStat
 from mail import send_email
+from spot_pool import spot_pool
+import storage
+from sharding import for_each_shard
+from archive import archive_cutoff, archive_reservations
 
 # -----------------------------
 # INIT FLASK APP
@@ -41,14 +47,15 @@ def send_daily_reminder():
 
         users = User.query.all()
 
-        for u in users:
-            # Check if user has a booking today
-            booked_today = Reservation.query.filter(
-                Reservation.user_id == u.id,
+        # users with a booking today, on any shard
+        booked_today = set()
+        for user_ids in for_each_shard(lambda: db.session.query(Reservation.user_id).filter(
                 Reservation.parking_timestamp >= datetime(today.year, today.month, today.day)
-            ).first()
+        ).distinct().all()):
+            booked_today.update(user_id for user_id, in user_ids)
 
-            if booked_today:
+        for u in users:
+            if u.id in booked_today:
                 continue  # Skip users who already booked
 
             html = f"""
@@ -80,24 +87,36 @@ def send_monthly_report():
     with flask_app.app_context():
         users = User.query.all()
 
-        for u in users:
-            # month filter
-            now = datetime.now()
-            month_start = datetime(now.year, now.month, 1)
-
-            reservations = Reservation.query.filter(
-                Reservation.user_id == u.id,
-                Reservation.parking_timestamp >= month_start
-            ).all()
+        # month filter
+        now = datetime.now()
+        month_start = date(now.year, now.month, 1)
+
+        # this month's bookings / spend per user and lot, straight from the daily rollups
+        # (rollups live with their lot, so each shard answers for its own lots)
+        per_user = {}
+        lot_names = {}
+        for rows, names in for_each_shard(lambda: (
+            db.session.query(
+                UserDailyStat.user_id, UserDailyStat.lot_id,
+                func.sum(UserDailyStat.bookings), func.sum(UserDailyStat.revenue)
+            ).filter(UserDailyStat.day >= month_start)
+             .group_by(UserDailyStat.user_id, UserDailyStat.lot_id).all(),
+            db.session.query(ParkingLot.id, ParkingLot.prime_location_name).all(),
+        )):
+            for user_id, lot_id, bookings, revenue in rows:
+                per_user.setdefault(user_id, []).append((lot_id, bookings, revenue))
+            lot_names.update(names)
 
-            total_bookings = len(reservations)
-            total_amount = sum(r.parking_cost or 0 for r in reservations)
+        for u in users:
+            stats = per_user.get(u.id, [])
+            total_bookings = sum(bookings for _, bookings, _ in stats)
+            total_amount = round(sum(revenue for _, _, revenue in stats), 2)
 
             lot_count = {}
-            for r in reservations:
-                if r.spot and r.spot.lot:
-                    name = r.spot.lot.prime_location_name
-                    lot_count[name] = lot_count.get(name, 0) + 1
+            for lot_id, bookings, _ in stats:
+                name = lot_names.get(lot_id)
+                if name:
+                    lot_count[name] = lot_count.get(name, 0) + bookings
 
             most_used = max(lot_count, key=lot_count.get) if lot_count else "None"
 
@@ -120,6 +139,37 @@ def send_monthly_report():
         return "Monthly reports sent."
 
 
+# ---------------------------------------------------------------------------------------------------
+# 4️⃣ SPOT POOL RECONCILIATION — repair drift between Redis free-spot pools and the DB
+# ---------------------------------------------------------------------------------------------------
+@celery.task()
+def reconcile_spot_pools():
+    with flask_app.app_context():
+        repaired = spot_pool.reconcile()
+        return {"repaired_lots": repaired}
+
+
+# ---------------------------------------------------------------------------------------------------
+# 5️⃣ READ REPLICA SNAPSHOT — recopy the primary into READ_REPLICA_URI (no-op without a snapshot file)
+# ---------------------------------------------------------------------------------------------------
+@celery.task()
+def refresh_read_replica():
+    with flask_app.app_context():
+        path = storage.refresh_snapshot()
+        return {"snapshot": path}
+
+
+# ---------------------------------------------------------------------------------------------------
+# 6️⃣ RESERVATION ARCHIVE — move bookings released more than ARCHIVE_AFTER_MONTHS ago out of reservations
+# ---------------------------------------------------------------------------------------------------
+@celery.task()
+def archive_old_reservations():
+    with flask_app.app_context():
+        cutoff = archive_cutoff()
+        moved = for_each_shard(archive_reservations, cutoff, flask_app.config["ARCHIVE_BATCH_SIZE"])
+        return {"cutoff": cutoff.isoformat(), "archived": sum(moved)}
+
+
 # ---------------------------------------------------------------------------------------------------
 # CELERY BEAT SCHEDULES
 # ---------------------------------------------------------------------------------------------------
@@ -133,4 +183,16 @@ celery.conf.beat_schedule = {
         "task": "celery_app.send_monthly_report",
         "schedule": crontab(minute="*/2"),
     },
+    "spot-pool-reconcile-task": {
+        "task": "celery_app.reconcile_spot_pools",
+        "schedule": crontab(minute="*/10"),
+    },
+    "read-replica-refresh-task": {
+        "task": "celery_app.refresh_read_replica",
+        "schedule": flask_app.config["READ_REPLICA_REFRESH_SECONDS"],
+    },
+    "reservation-archive-task": {
+        "task": "celery_app.archive_old_reservations",
+        "schedule": crontab(hour=3, minute=30),
+    },
 }
@@ -1,19 +1,22 @@
 # backend/cntrlrs/admin_apis.py
 from flask import request
 from flask_restful import Resource
-from sqlalchemy import and_
+from sqlalchemy import and_, func, select
 
-from datab import db
+from datab import db, reads_from_replica
 from model import User, Role, ParkingLot, ParkingSpot, Reservation
 from user_datastr import user_datastore
+from allocation import allocation_stats
+from cntrlrs.booking_apis import booking_history
+from cntrlrs.pagination import wants_legacy_listing, page_params, sharded_keyset_page
+from cntrlrs.streaming import stream_format, stream_rows
+from cntrlrs.serializers import ADMIN_BOOKING, ADMIN_ARCHIVED_BOOKING
 
-from cache import cache
-
-def success(data=None, message="OK"):
-    return {"status": "success", "data": data or {}, "message": message}, 200
-
-def error(message="Error", code=400):
-    return {"status": "error", "data": {}, "message": message}, code
+from cache import single_flight_view, cache_stats, CHARTS
+from events import broker
+import sharding
+from sharding import scatter
+from cntrlrs.responses import success, error
 
 
 '''class AdminDashboardAPI(Resource):
@@ -37,13 +40,18 @@ def error(message="Error", code=400):
         }
         return success(data, "Admin dashboard summary")'''
 class AdminDashboardAPI(Resource):
-    @cache.cached(timeout=60) 
+    @single_flight_view(lambda: [CHARTS], timeout=60)
+    @reads_from_replica
     def get(self):
-        lots = ParkingLot.query.count()
-        spots = ParkingSpot.query.count()
-
-        # FIXED LINE
-        occupied = Reservation.query.filter(Reservation.leaving_timestamp.is_(None)).count()
+        # spot totals from the per-lot occupancy counters (one row per lot, no spot scan),
+        # summed over the shards
+        totals = scatter(lambda: tuple(db.session.query(
+            func.count(ParkingLot.id),
+            func.coalesce(func.sum(ParkingLot.available_count), 0),
+            func.coalesce(func.sum(ParkingLot.occupied_count), 0),
+        ).one()))
+        lots, available, occupied = (sum(column) for column in zip(*totals))
+        spots = available + occupied
 
         users = User.query.count()
         active_reservations = occupied  # same thing
@@ -58,6 +66,16 @@ class AdminDashboardAPI(Resource):
         return success(data, "Admin dashboard summary")
 
 
+class AdminStatsAPI(Resource):
+    """
+    GET /admin/stats
+    Returns runtime counters (spot allocation conflicts / retries, cache hits / misses, SSE clients)
+    """
+    def get(self):
+        events = dict(broker.stats, subscribers=broker.subscriber_count)
+        return success({"allocation": allocation_stats(), "cache": cache_stats(), "events": events}, "Runtime stats")
+
+
 class AdminCreateRoleAPI(Resource):
     """
     Optional: Create roles (not usually needed since create_or_find_role used on init)
@@ -72,33 +90,70 @@ class AdminCreateRoleAPI(Resource):
         role = user_datastore.find_or_create_role(name=name, description=desc)
         db.session.commit()
         return success({"id": role.id, "name": role.name}, "Role created/found")
+
+
+# Users live on the primary only, so bookings read from another shard come back
+# from the ADMIN_BOOKING join without their user; these fill it in.
+def _user_dicts(user_ids):
+    rows = db.session.execute(select(User.id, User.username, User.email).where(User.id.in_(user_ids)))
+    return {r.id: {"id": r.id, "username": r.username, "email": r.email} for r in rows}
+
+
+def with_users(bookings):
+    """Add the missing `user` of bookings from other shards (one query for the list)."""
+    missing = {b["user_id"] for b in bookings if b["user"] is None}
+    if missing and sharding.enabled():
+        users = _user_dicts(missing)
+        for booking in bookings:
+            if booking["user"] is None:
+                booking["user"] = users.get(booking["user_id"])
+    return bookings
+
+
+def booking_with_user():
+    """ADMIN_BOOKING.to_dict for streams: missing users are looked up once each."""
+    users = {}
+
+    def to_dict(row):
+        booking = ADMIN_BOOKING.to_dict(row)
+        if booking["user"] is None and sharding.enabled():
+            user_id = booking["user_id"]
+            if user_id not in users:
+                users[user_id] = _user_dicts([user_id]).get(user_id)
+            booking["user"] = users[user_id]
+        return booking
+    return to_dict
+
+
 class AdminAllBookingsAPI(Resource):
     """
-    GET /admin/bookings
-    Return all reservations (for admin view)
+    GET /admin/bookings?limit=50&after=<cursor>&lot_id=&status=active|released&from=&to=
+    Return reservations newest first (for admin view), one keyset page at a time.
+    spot, spot.lot and user columns are joined into the same Core SELECT and
+    turned into dicts directly (serializers.ADMIN_BOOKING), one statement per page.
+    Without paging params and with LEGACY_UNPAGINATED_LISTS on, returns every booking.
+    Archived bookings are added when the from / to range reaches them (booking_history).
+    ?format=ndjson|json-stream streams every matching booking instead (full dump).
     """
+    @reads_from_replica
     def get(self):
-        bookings = Reservation.query.order_by(Reservation.id.desc()).all()
-        booking_list = []
-        for b in bookings:
-            # use existing Reservation.to_dict() but convert datetimes to iso strings if needed
-            d = b.to_dict()
-            # add user details (safe - admin needs to see who booked)
-            if b.user:
-                d["user"] = {
-                    "id": b.user.id,
-                    "username": getattr(b.user, "username", None),
-                    "email": getattr(b.user, "email", None)
-                }
-            else:
-                d["user"] = None
-
-            # add spot/lot info if not present in to_dict (optional)
-            if not d.get("lot_name") and b.spot and b.spot.lot:
-                d["lot_name"] = b.spot.lot.prime_location_name
-            if not d.get("spot_number") and b.spot:
-                d["spot_number"] = b.spot.spot_number
-
-            booking_list.append(d)
-
-        return success({"bookings": booking_list}, "All bookings")
+        try:
+            # archived bookings are included when from / to reaches them
+            query, key = booking_history(ADMIN_BOOKING, ADMIN_ARCHIVED_BOOKING, ("id",))
+            if stream_format():
+                return stream_rows(query.order_by(key[0].desc()), booking_with_user(),
+                                   "bookings", "All bookings", sharded=sharding.enabled())
+            if wants_legacy_listing():
+                shards = scatter(lambda: db.session.execute(query.order_by(key[0].desc())).all())
+                rows = sorted((r for rows in shards for r in rows), key=lambda r: r.id, reverse=True)
+                return success({"bookings": with_users([ADMIN_BOOKING.to_dict(r) for r in rows])}, "All bookings")
+            params = page_params()
+            bookings, next_cursor, prev_cursor = sharded_keyset_page(query, key, params, descending=True)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        return success({
+            "bookings": with_users([ADMIN_BOOKING.to_dict(b) for b in bookings]),
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+        }, "All bookings")
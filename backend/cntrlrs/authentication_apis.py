@@ -10,13 +10,7 @@ from model import User
 # IMPORTANT: using simple Werkzeug hashing
 from werkzeug.security import generate_password_hash, check_password_hash
 
-
-def success(data=None, message="OK"):
-    return {"status": "success", "data": data or {}, "message": message}, 200
-
-
-def error(message="Error", code=400):
-    return {"status": "error", "data": {}, "message": message}, code
+from cntrlrs.responses import success, error
 
 
 class RegisterAPI(Resource):
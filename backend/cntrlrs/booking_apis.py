@@ -1,20 +1,21 @@
 # backend/cntrlrs/booking_apis.py
-from flask import request
+from flask import request, current_app
 from flask_restful import Resource
 from datetime import datetime
+from sqlalchemy import insert, update, select, case, union_all
 
-from datab import db
-from model import ParkingLot, ParkingSpot, Reservation, User
-from cntrlrs.chart_apis import ChartDataAPI
-from cntrlrs.parkinglot_apis import ParkingLotAPI
-from cntrlrs.lot_spots_apis import SpotsByLotAPI
-from cache import cache
-
-def success(data=None, message="OK"):
-    return {"status": "success", "data": data or {}, "message": message}, 200
-
-def error(message="Error", code=400):
-    return {"status": "error", "data": {}, "message": message}, code
+from datab import db, transaction
+from model import ParkingLot, ParkingSpot, Reservation, ReservationArchive, User, record_rollup
+from allocation import claim_spot, claim_spots, AllocationConflict
+from spot_pool import spot_pool
+from archive import reaches_archive
+from events import publish_spots
+from cntrlrs.pagination import wants_legacy_listing, page_params, sharded_keyset_page, date_arg
+from sharding import scatter, use_shard_of, on_shard, shard_of
+from cache import invalidate, invalidate_reservation, lot_tag, user_tag, LOTS, CHARTS, LOT_INFO
+from cntrlrs.conditional import conditional_view
+from cntrlrs.serializers import BOOKING, ARCHIVED_BOOKING
+from cntrlrs.responses import success, error
 
 
 class ReserveSpotAPI(Resource):
@@ -36,31 +37,97 @@ class ReserveSpotAPI(Resource):
         if not user:
             return error("User not found", 404)
 
-        lot = ParkingLot.query.get(lot_id)
+        # spot, reservation and rollups are written on the lot's shard
+        lot = ParkingLot.query.get(lot_id) if use_shard_of(lot_id) is not None else None
         if not lot:
             return error("Parking lot not found", 404)
 
-        # first available spot (by id ascending)
-        spot = ParkingSpot.query.filter_by(lot_id=lot.id, status=ParkingSpot.STATUS_AVAILABLE).order_by(ParkingSpot.id.asc()).first()
-        if not spot:
-            return error("No available spots in this lot", 400)
+        # claim first available spot (by id ascending) with one guarded UPDATE;
+        # reservation insert and spot claim share a single commit
+        try:
+            with transaction():
+                spot_id = claim_spot(lot.id, vehicle_number)
+                if spot_id is None:
+                    return error("No available spots in this lot", 400)
 
-        # create reservation and occupy spot
-        reservation = Reservation(user_id=user.id, spot_id=spot.id, vehicle_number=vehicle_number, parking_timestamp=datetime.utcnow())
-        db.session.add(reservation)
-        db.session.flush()  # get reservation.id
+                reservation = Reservation(user_id=user.id, spot_id=spot_id, vehicle_number=vehicle_number, parking_timestamp=datetime.utcnow())
+                db.session.add(reservation)
+                record_rollup(reservation.parking_timestamp.date(), lot.id, user.id, bookings=1)
+        except AllocationConflict:
+            return error("Parking lot is busy, please try again", 409)
+        # IMPORTANT: cache invalidation
+        invalidate_reservation(lot.id, user.id)
+        publish_spots(lot.id, [spot_id], ParkingSpot.STATUS_OCCUPIED)
 
-        # occupy spot
-        spot.occupy(vehicle_number)
+        return success({"reservation_id": reservation.id, "spot_id": spot_id}, "Spot reserved")
 
-        db.session.add(reservation)
-        db.session.commit()
-        # IMPORTANT: cache invalidation
-        cache.delete_memoized(SpotsByLotAPI.get, lot_id)
-        cache.delete_memoized(ChartDataAPI.get)
-        cache.delete_memoized(ParkingLotAPI.get)
 
-        return success({"reservation_id": reservation.id, "spot_id": spot.id}, "Spot reserved")
+class ReserveBatchAPI(Resource):
+    """
+    POST /reserve/batch
+    body: { user_id, lot_id, vehicles: ["GJ05AB1234", ...] }
+    Fleet check-in: allocates one spot per vehicle in a single transaction.
+    Returns per-vehicle results in request order.
+    """
+    def post(self):
+        payload = request.get_json() or {}
+        user_id = payload.get("user_id")
+        lot_id = payload.get("lot_id")
+        vehicles = payload.get("vehicles")
+
+        if not user_id or not lot_id or not vehicles or not isinstance(vehicles, list):
+            return error("user_id, lot_id and a non-empty vehicles list required", 400)
+        if len(vehicles) > current_app.config.get("BATCH_MAX_ITEMS", 500):
+            return error("Too many vehicles in one batch", 400)
+        if not all(isinstance(v, str) and v for v in vehicles):
+            return error("vehicles must be non-empty strings", 400)
+
+        user = User.query.get(user_id)
+        if not user:
+            return error("User not found", 404)
+
+        lot = ParkingLot.query.get(lot_id) if use_shard_of(lot_id) is not None else None
+        if not lot:
+            return error("Parking lot not found", 404)
+
+        now = datetime.utcnow()
+        with transaction():
+            spot_ids = claim_spots(lot.id, vehicles)
+            rows = [
+                {"user_id": user.id, "spot_id": spot_id, "vehicle_number": vehicle, "parking_timestamp": now}
+                for vehicle, spot_id in zip(vehicles, spot_ids)
+                if spot_id is not None
+            ]
+            reservation_ids = {}
+            if rows:
+                db.session.execute(insert(Reservation), rows)
+                record_rollup(now.date(), lot.id, user.id, bookings=len(rows))
+                reservation_ids = dict(db.session.execute(
+                    select(Reservation.spot_id, Reservation.id).where(
+                        Reservation.spot_id.in_([r["spot_id"] for r in rows]),
+                        Reservation.leaving_timestamp.is_(None),
+                    )
+                ).all())
+
+        results = []
+        for vehicle, spot_id in zip(vehicles, spot_ids):
+            if spot_id is None:
+                results.append({"vehicle_number": vehicle, "status": "failed", "message": "No available spot"})
+            else:
+                results.append({
+                    "vehicle_number": vehicle,
+                    "status": "reserved",
+                    "reservation_id": reservation_ids.get(spot_id),
+                    "spot_id": spot_id,
+                })
+
+        # cache invalidation once per batch
+        if rows:
+            invalidate_reservation(lot.id, user.id)
+            publish_spots(lot.id, [r["spot_id"] for r in rows], ParkingSpot.STATUS_OCCUPIED)
+
+        return success({"results": results, "reserved": len(rows), "failed": len(vehicles) - len(rows)},
+                       "Batch reservation processed")
 
 
 class ReleaseSpotAPI(Resource):
@@ -75,23 +142,231 @@ class ReleaseSpotAPI(Resource):
         if reservation.leaving_timestamp:
             return error("Reservation already released", 400)
 
-        reservation.finalize()
+        try:
+            with transaction():
+                reservation.finalize()
+        except ValueError as e:
+            # a concurrent release got there first
+            return error(str(e), 400)
 
-        spot = ParkingSpot.query.get(reservation.spot_id)
+        spot = reservation.spot
         lot_id = spot.lot_id
+        spot_pool.push(lot_id, [spot.id])
         # IMPORTANT: cache invalidation
-        cache.delete_memoized(SpotsByLotAPI.get, lot_id)
-        cache.delete_memoized(ChartDataAPI.get)
-        cache.delete_memoized(ParkingLotAPI.get)
+        invalidate_reservation(lot_id, reservation.user_id)
+        publish_spots(lot_id, [spot.id], ParkingSpot.STATUS_AVAILABLE)
 
         return success(reservation.to_dict(), "Reservation finalized and spot released")
 
 
+def release_bookings(booking_ids, now):
+    """
+    Finalize bookings of the current shard in one transaction with set-based UPDATEs.
+    Returns (found, to_release, costs, released, lots): the rows found, the ones
+    still active, their costs, the ids this transaction finalized and
+    {lot_id: freed spot ids}.
+    """
+    reservations_table = Reservation.__table__
+    with transaction():
+        found = {
+            row.id: row for row in db.session.execute(
+                select(
+                    Reservation.id, Reservation.user_id, Reservation.spot_id, Reservation.parking_timestamp,
+                    Reservation.leaving_timestamp, ParkingSpot.lot_id, ParkingLot.price_per_hour,
+                )
+                .join(ParkingSpot, Reservation.spot_id == ParkingSpot.id)
+                .join(ParkingLot, ParkingSpot.lot_id == ParkingLot.id)
+                .where(Reservation.id.in_(booking_ids))
+            )
+        }
+
+        to_release = {}
+        for booking_id in booking_ids:
+            row = found.get(booking_id)
+            if row is not None and row.leaving_timestamp is None:
+                to_release[booking_id] = row
+
+        costs = {
+            booking_id: Reservation.cost_between(row.parking_timestamp, now, row.price_per_hour)
+            for booking_id, row in to_release.items()
+        }
+        released = set()
+        lots = {}  # lot_id -> released spot ids
+        if to_release:
+            # RETURNING names the rows this UPDATE finalized; a concurrent release
+            # (even one stamped with the same `now`) is left out
+            released = set(db.session.execute(
+                reservations_table.update()
+                .where(
+                    reservations_table.c.id.in_(to_release.keys()),
+                    reservations_table.c.leaving_timestamp.is_(None),
+                )
+                .values(
+                    leaving_timestamp=now,
+                    parking_cost=case(costs, value=reservations_table.c.id),
+                )
+                .returning(reservations_table.c.id)
+            ).scalars().all())
+
+        # free the spots, one UPDATE per affected lot so its counters can follow
+        for booking_id in released:
+            row = to_release[booking_id]
+            lots.setdefault(row.lot_id, []).append(row.spot_id)
+        for lot_id, spot_ids in lots.items():
+            freed = db.session.execute(
+                update(ParkingSpot)
+                .where(
+                    ParkingSpot.id.in_(spot_ids),
+                    ParkingSpot.status == ParkingSpot.STATUS_OCCUPIED,
+                )
+                .values(status=ParkingSpot.STATUS_AVAILABLE, vehicle_number=None, reserved_at=None,
+                        change_seq=ParkingSpot.next_change_seq(lot_id))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            ParkingLot.adjust_counters(lot_id, available=freed, occupied=-freed)
+
+        # revenue / parked hours into the reporting rollups, one upsert per day/lot/user
+        rollups = {}
+        for booking_id in released:
+            row = to_release[booking_id]
+            key = (row.parking_timestamp.date(), row.lot_id, row.user_id)
+            revenue, hours = rollups.get(key, (0.0, 0.0))
+            rollups[key] = (
+                revenue + costs[booking_id],
+                hours + (now - row.parking_timestamp).total_seconds() / 3600.0,
+            )
+        for (day, lot_id, user_id), (revenue, hours) in rollups.items():
+            record_rollup(day, lot_id, user_id, revenue=revenue, hours=hours)
+    return found, to_release, costs, released, lots
+
+
+class ReleaseBatchAPI(Resource):
+    """
+    POST /bookings/release/batch
+    body: { booking_ids: [1, 2, ...] }
+    Finalizes many reservations in one transaction (per shard) with set-based UPDATEs.
+    Returns per-booking results in request order.
+    """
+    def post(self):
+        payload = request.get_json() or {}
+        booking_ids = payload.get("booking_ids")
+
+        if not booking_ids or not isinstance(booking_ids, list):
+            return error("a non-empty booking_ids list required", 400)
+        if len(booking_ids) > current_app.config.get("BATCH_MAX_ITEMS", 500):
+            return error("Too many bookings in one batch", 400)
+        try:
+            booking_ids = list(dict.fromkeys(int(b) for b in booking_ids))
+        except (TypeError, ValueError):
+            return error("booking_ids must be integers", 400)
+
+        now = datetime.utcnow()
+        # a batch can span lots on different shards: one transaction per shard
+        by_shard = {}
+        for booking_id in booking_ids:
+            shard = shard_of(booking_id)
+            if shard is not None:
+                by_shard.setdefault(shard, []).append(booking_id)
+        found, to_release, costs, released, lots = {}, {}, {}, set(), {}
+        for shard, ids in by_shard.items():
+            with on_shard(shard):
+                parts = release_bookings(ids, now)
+            for merged, part in zip((found, to_release, costs, released, lots), parts):
+                merged.update(part)
+
+        results = []
+        for booking_id in booking_ids:
+            if booking_id in released:
+                results.append({"booking_id": booking_id, "status": "released", "cost": costs[booking_id]})
+            elif booking_id in found:
+                results.append({"booking_id": booking_id, "status": "failed", "message": "Reservation already released"})
+            else:
+                results.append({"booking_id": booking_id, "status": "failed", "message": "Reservation not found"})
+
+        # return spots to the pools and invalidate caches once per affected lot / user
+        for lot_id, spot_ids in lots.items():
+            spot_pool.push(lot_id, spot_ids)
+            publish_spots(lot_id, spot_ids, ParkingSpot.STATUS_AVAILABLE)
+        if lots:
+            users = {to_release[b].user_id for b in released}
+            invalidate(*[lot_tag(l) for l in lots], *[user_tag(u) for u in users], LOTS, CHARTS)
+
+        return success({"results": results, "released": len(released), "failed": len(booking_ids) - len(released)},
+                       "Batch release processed")
+
+
+def filter_reservations(query, archived=False):
+    """
+    Optional booking filters shared by the list endpoints (ORM query or Core select):
+    ?lot_id=3&status=active|released&from=2025-01-01&to=2025-02-01 (on parking_timestamp).
+    archived=True filters a reservations_archive query instead.
+    Raises ValueError on bad input.
+    """
+    table = ReservationArchive if archived else Reservation
+    lot_id = request.args.get("lot_id")
+    if lot_id:
+        try:
+            lot_id = int(lot_id)
+        except ValueError:
+            raise ValueError("lot_id must be an integer")
+        if archived:
+            query = query.filter(ReservationArchive.lot_id == lot_id)
+        else:
+            query = query.filter(Reservation.spot_id.in_(
+                select(ParkingSpot.id).where(ParkingSpot.lot_id == lot_id)
+            ))
+
+    status = request.args.get("status")
+    if status == "active":
+        query = query.filter(table.leaving_timestamp.is_(None))
+    elif status == "released":
+        query = query.filter(table.leaving_timestamp.isnot(None))
+    elif status:
+        raise ValueError("status must be active or released")
+
+    start, end = date_arg("from"), date_arg("to")
+    if start:
+        query = query.filter(table.parking_timestamp >= start)
+    if end:
+        query = query.filter(table.parking_timestamp < end)
+    return query
+
+
+def booking_history(projection, archived_projection, key, user_id=None):
+    """
+    (query, sort columns) for bookings as `projection` rows (of one user when
+    user_id is given), with the filters of filter_reservations(); `key` names
+    the sort columns, e.g. ("parking_timestamp", "id"). Archived bookings
+    (archive.py, as archived_projection rows) are unioned in only when the
+    from / to range reaches them on some shard; recent history reads the hot
+    table alone. Raises ValueError on bad input.
+    """
+    query = projection.select()
+    if user_id is not None:
+        query = query.where(Reservation.user_id == user_id)
+    query = filter_reservations(query)
+    if request.args.get("status") == "active" or not any(
+            scatter(reaches_archive, user_id, date_arg("from"), date_arg("to"))):
+        return query, [getattr(Reservation, name) for name in key]
+
+    archived = archived_projection.select()
+    if user_id is not None:
+        archived = archived.where(ReservationArchive.user_id == user_id)
+    archived = filter_reservations(archived, archived=True)
+    bookings = union_all(query, archived).subquery("bookings")
+    return select(bookings), [bookings.c[name] for name in key]
+
+
 class UserBookingsAPI(Resource):
     """
     GET /bookings/user
     frontend passes user_id as query param: ?user_id=5
+    Paged newest first with ?limit=&after=&before= (keyset on parking_timestamp, id),
+    plus the filters of filter_reservations(); archived history is included when
+    the from / to range reaches it (booking_history).
+    Supports If-None-Match / If-Modified-Since (304 while the user's bookings are unchanged).
     """
+    @conditional_view(lambda: [user_tag(request.args.get("user_id")), LOT_INFO])
     def get(self):
         user_id = request.args.get("user_id")
         if not user_id:
@@ -101,8 +376,24 @@ class UserBookingsAPI(Resource):
         if not user:
             return error("User not found", 404)
 
-        bookings = [r.to_dict() for r in user.reservations]
-        return success({"bookings": bookings}, "User bookings")
+        # spot and lot columns come from the same SELECT, straight into dicts
+        try:
+            query, key = booking_history(BOOKING, ARCHIVED_BOOKING, ("parking_timestamp", "id"), user.id)
+            if wants_legacy_listing():
+                # a user's bookings can be on every shard
+                shards = scatter(lambda: db.session.execute(query.order_by(key[-1].asc())).all())
+                rows = sorted((r for rows in shards for r in rows), key=lambda r: r.id)
+                return success({"bookings": [BOOKING.to_dict(r) for r in rows]}, "User bookings")
+            params = page_params()
+            rows, next_cursor, prev_cursor = sharded_keyset_page(query, key, params, descending=True)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        return success({
+            "bookings": [BOOKING.to_dict(r) for r in rows],
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+        }, "User bookings")
 
     
 
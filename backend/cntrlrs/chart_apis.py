@@ -2,15 +2,64 @@
 from flask_restful import Resource
 from sqlalchemy import func
 from flask import request
-from datab import db
-from model import ParkingLot, ParkingSpot, Reservation
+from datab import db, reads_from_replica
+from sharding import scatter
+from model import ParkingLot, LotDailyStat, UserDailyStat
 
-from cache import cache
-def success(data=None, message="OK"):
-    return {"status": "success", "data": data or {}, "message": message}, 200
+from cache import cached_view, single_flight_view, user_tag, CHARTS
+from cntrlrs.responses import success, error
 
-def error(message="Error", code=400):
-    return {"status": "error", "data": {}, "message": message}, code
+
+# -----------------------------
+# SHARED AGGREGATIONS
+# -----------------------------
+# Set-based building blocks for the chart endpoints: each one is a single
+# statement (per shard) whose cost grows with the number of lots, never with spots.
+def lot_occupancy():
+    """
+    [{lot_id, lot_name, total_spots, available, occupied}] for every lot,
+    read from the per-lot occupancy counters (one SELECT over parking_lots).
+    """
+    shards = scatter(lambda: db.session.query(
+        ParkingLot.id, ParkingLot.prime_location_name,
+        ParkingLot.available_count, ParkingLot.occupied_count,
+    ).order_by(ParkingLot.id).all())
+    rows = sorted((row for rows in shards for row in rows), key=lambda row: row[0])
+    return [
+        {
+            "lot_id": lot_id,
+            "lot_name": name,
+            "total_spots": available + occupied,
+            "available": available,
+            "occupied": occupied,
+        }
+        for lot_id, name, available, occupied in rows
+    ]
+
+
+def user_bookings_by_lot(user_id):
+    """
+    {lot_id: bookings} for one user, summed from the day/user/lot rollups (they
+    still count bookings that were archived out of reservations).
+    """
+    shards = scatter(lambda: (
+        db.session.query(UserDailyStat.lot_id, func.sum(UserDailyStat.bookings))
+        .filter(UserDailyStat.user_id == user_id)
+        .group_by(UserDailyStat.lot_id)
+        .all()
+    ))
+    return {lot_id: count for rows in shards for lot_id, count in rows}
+
+
+def monthly_reservation_counts():
+    """[{month: "YYYY-MM", count}] read from the day/lot rollups, not raw reservations."""
+    shards = scatter(lambda: db.session.query(func.strftime("%Y-%m", LotDailyStat.day).label("ym"),
+                                              func.sum(LotDailyStat.bookings)).group_by("ym").all())
+    monthly = {}
+    for rows in shards:
+        for month, count in rows:
+            monthly[month] = monthly.get(month, 0) + count
+    return [{"month": m, "count": c} for m, c in sorted(monthly.items())]
 
 
 class ChartDataAPI(Resource):
@@ -20,42 +69,11 @@ class ChartDataAPI(Resource):
       - spots_by_lot: [{lot_id, lot_name, total_spots, available, occupied}]
       - monthly_reservations_count: [{month, count}] (simple aggregate)
     """
-    @cache.cached(timeout=60)
+    @single_flight_view(lambda: [CHARTS], timeout=60)
+    @reads_from_replica
     def get(self):
-        lots = ParkingLot.query.all()
-        spots_by_lot = []
-        for l in lots:
-            total = len(l.spots)
-            available = sum(1 for s in l.spots if s.status == ParkingSpot.STATUS_AVAILABLE)
-            occupied = total - available
-            spots_by_lot.append({
-                "lot_id": l.id,
-                "lot_name": l.prime_location_name,
-                "total_spots": total,
-                "available": available,
-                "occupied": occupied
-            })
-
-        # simple monthly reservations (month-year text)
-        monthly = db.session.query(func.strftime("%Y-%m", Reservation.parking_timestamp).label("ym"),
-                                   func.count(Reservation.id)).group_by("ym").all()
-        monthly_reservations = [{"month": m, "count": c} for m, c in monthly]
-
-        data = {"spots_by_lot": spots_by_lot, "monthly_reservations": monthly_reservations}
+        data = {"spots_by_lot": lot_occupancy(), "monthly_reservations": monthly_reservation_counts()}
         return success(data, "Chart data")
-    
-# backend/cntrlrs/chart_apis.py
-from flask_restful import Resource
-from flask import request
-from sqlalchemy import func
-from datab import db
-from model import ParkingLot, ParkingSpot, Reservation
-
-def success(data=None, message="OK"):
-    return {"status": "success", "data": data or {}, "message": message}, 200
-
-def error(message="Error", code=400):
-    return {"status": "error", "data": {}, "message": message}, code
 
 
 class UserChartDataAPI(Resource):
@@ -63,9 +81,8 @@ class UserChartDataAPI(Resource):
     GET /chart/user-dashboard?user_id=5
     Returns user-specific chart data.
     """
-    @cache.cached(
-    timeout=60,
-    key_prefix=lambda: f"user_chart_{request.args.get('user_id')}")
+    @cached_view(lambda: [CHARTS, user_tag(request.args.get("user_id"))], timeout=60)
+    @reads_from_replica
     def get(self):
         # 1) Read user_id from query params
         user_id = request.args.get("user_id")
@@ -78,30 +95,16 @@ class UserChartDataAPI(Resource):
         except:
             return error("user_id must be integer", 400)
 
-        lots = ParkingLot.query.all()
-        spots_by_lot = []
-
-        for lot in lots:
-            total = len(lot.spots)
-
-            # Count spots booked by given user for each lot
-            user_booked = (
-                db.session.query(Reservation)
-                .join(ParkingSpot)
-                .filter(
-                    Reservation.user_id == user_id,
-                    ParkingSpot.lot_id == lot.id
-                )
-                .count()
-            )
-
-            spots_by_lot.append({
-                "lot_id": lot.id,
-                "lot_name": lot.prime_location_name,
-                "total_spots": total,
-                "user_booked": user_booked
-            })
+        # 2) lot totals + this user's bookings per lot: two queries in total
+        booked = user_bookings_by_lot(user_id)
+        spots_by_lot = [
+            {
+                "lot_id": lot["lot_id"],
+                "lot_name": lot["lot_name"],
+                "total_spots": lot["total_spots"],
+                "user_booked": booked.get(lot["lot_id"], 0),
+            }
+            for lot in lot_occupancy()
+        ]
 
         return success({"spots_by_lot": spots_by_lot}, "User chart data")
-    
-
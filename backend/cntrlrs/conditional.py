@@ -0,0 +1,65 @@
+# backend/cntrlrs/conditional.py
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Response, request
+
+from cache import tag_versions
+
+
+def _validators(view_tags):
+    """
+    ETag and Last-Modified for the current request, from the cache tag versions
+    alone (no DB access). Any bump of a tag the view depends on changes the ETag;
+    versions are bump times in ns, so the newest one is the Last-Modified.
+    HTTP dates have whole seconds: while the newest bump is less than a second
+    old another one could land in the same second, so there is no
+    Last-Modified (None) until then and only the ETag validates.
+    """
+    versions = tag_versions(view_tags)
+    digest = hashlib.sha1(f"{request.full_path}|{versions}".encode()).hexdigest()[:32]
+    newest = max(versions)
+    if time.time_ns() - newest < 1_000_000_000:
+        return digest, None
+    last_modified = datetime.fromtimestamp(newest / 1e9, timezone.utc).replace(microsecond=0)
+    return digest, last_modified
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional_view(tags, unless=None):
+    """
+    Conditional GET for a Resource method. `tags(*args, **kwargs)` lists the
+    cache tags the response depends on (same as cached_view). A matching
+    If-None-Match / If-Modified-Since gets an empty 304 before the view runs,
+    so nothing is queried or serialized; 200 responses carry ETag and
+    (see _validators) Last-Modified. Put it above @cached_view so the 304
+    skips the cache too.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            if unless and unless():
+                return fn(self, *args, **kwargs)
+
+            etag, last_modified = _validators(tags(*args, **kwargs))
+            headers = {"ETag": f'W/"{etag}"', "Cache-Control": "no-cache"}
+            if last_modified is not None:
+                headers["Last-Modified"] = last_modified.strftime("%a, %d %b %Y %H:%M:%S GMT")
+            if _not_modified(etag, last_modified):
+                return Response(status=304, headers=headers)
+
+            result = fn(self, *args, **kwargs)
+            if isinstance(result, tuple) and len(result) == 2 and result[1] == 200:
+                return result[0], 200, headers
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,58 @@
+# backend/cntrlrs/event_apis.py
+import json
+import queue
+
+from flask import Response, current_app
+from flask_restful import Resource
+
+from model import ParkingLot
+from events import broker
+from cntrlrs.responses import error
+
+
+def sse_response(subscriber):
+    """
+    text/event-stream of the subscriber's events. A comment line goes out every
+    EVENTS_HEARTBEAT_SECONDS so proxies keep the connection open; the stream ends
+    when the broker drops the client for falling behind (the browser's
+    EventSource then reconnects on its own).
+    """
+    heartbeat = current_app.config.get("EVENTS_HEARTBEAT_SECONDS", 15)
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while not subscriber.dropped:
+                try:
+                    event = subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield "event: %s\ndata: %s\n\n" % (event["type"], json.dumps(event))
+            yield 'event: dropped\ndata: {"message": "Client too slow, reconnect"}\n\n'
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+class LotEventsAPI(Resource):
+    """
+    GET /lots/<lot_id>/events
+    Server-Sent Events with the lot's spot status changes (reserve / release / resize),
+    so screens no longer need to poll /lots/<lot_id>/spots.
+    """
+    def get(self, lot_id):
+        if not ParkingLot.query.get(lot_id):
+            return error("Parking lot not found", 404)
+        return sse_response(broker.subscribe(lot_id))
+
+
+class AllLotsEventsAPI(Resource):
+    """
+    GET /lots/events
+    Same as /lots/<lot_id>/events for every lot (admin grid).
+    """
+    def get(self):
+        return sse_response(broker.subscribe())
@@ -4,15 +4,23 @@ from flask import request, send_file
 from celery.result import AsyncResult
 import os
 
+from cntrlrs.pagination import date_arg
+
 class ExportCSVAPI(Resource):
-    # Trigger CSV export
+    # Trigger CSV export (?from=&to= limit it to a parking date range)
     def get(self):
         from tasks.export_csv_task import export_user_csv
         user_id = request.args.get("user_id")
         if not user_id:
             return {"status": "error", "message": "user_id required"}, 400
+        try:
+            start, end = date_arg("from"), date_arg("to")
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
 
-        task = export_user_csv.delay(int(user_id))
+        task = export_user_csv.delay(int(user_id),
+                                     start.isoformat() if start else None,
+                                     end.isoformat() if end else None)
         return {"status": "started", "task_id": task.id}
 
 # Check task status and download CSV
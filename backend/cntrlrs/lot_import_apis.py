@@ -0,0 +1,33 @@
+# backend/cntrlrs/lot_import_apis.py
+import io
+
+from flask import current_app, request
+from flask_restful import Resource
+
+from lot_import import detect_format, import_lots
+from cntrlrs.responses import success, error
+
+
+class LotImportAPI(Resource):
+    """
+    POST /lots/import              (?format=csv|jsonl)
+    Body: a multipart "file" upload, or the raw CSV / JSON-lines text.
+    Columns: prime_location_name, address, pin_code, price_per_hour, number_of_spots.
+    Responds with the import report: counts, per-row errors and rows/sec.
+    """
+    def post(self):
+        upload = request.files.get("file")
+        fmt = detect_format(request.args.get("format"),
+                            upload.filename if upload else None,
+                            request.mimetype)
+        if fmt is None:
+            return error("format must be csv or jsonl (?format=, file extension or Content-Type)", 400)
+
+        raw = upload.stream if upload else request.stream
+        stream = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        report = import_lots(
+            stream, fmt,
+            chunk_size=current_app.config.get("IMPORT_CHUNK_SIZE", 200),
+            max_errors=current_app.config.get("IMPORT_MAX_ERRORS", 1000),
+        )
+        return success(report.to_dict(), f"Imported {report.lots} lot(s), {report.failed} row(s) failed")
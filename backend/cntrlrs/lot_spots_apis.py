@@ -1,34 +1,77 @@
+from flask import request
 from flask_restful import Resource
 from model import ParkingLot, ParkingSpot
 from datab import db
 
-from cache import cache
-
-def success(data=None, message="OK"):
-    return {"status": "success", "data": data or {}, "message": message}, 200
-
-def error(message="Error", code=400):
-    return {"status": "error", "data": {}, "message": message}, code
+from cache import cached_view, invalidate, lot_tag
+from cntrlrs.conditional import conditional_view
+from cntrlrs.pagination import encode_cursor, decode_cursor
+from cntrlrs.streaming import stream_format, is_stream_request, stream_rows
+from cntrlrs.serializers import SPOT
+from cntrlrs.responses import success, error
 
 
 class SpotsByLotAPI(Resource):
     """
     GET /lots/<lot_id>/spots
     Returns all spots in a given parking lot
+    ?format=ndjson|json-stream streams the spots instead (not cached)
+    ?since=<token> returns only the spots changed after the token (delta sync);
+    every response carries the next token, and "full": true marks a complete
+    snapshot (no token, or one from before spots were deleted)
     """
-    @cache.cached(timeout=120)
+    @conditional_view(lambda lot_id: [lot_tag(lot_id)], unless=is_stream_request)
+    @cached_view(lambda lot_id: [lot_tag(lot_id)], timeout=120, unless=is_stream_request)
     def get(self, lot_id):
         lot = ParkingLot.query.get(lot_id)
         if not lot:
             return error("Parking lot not found", 404)
 
-        spots = ParkingSpot.query.filter_by(lot_id=lot_id)\
-                                 .order_by(ParkingSpot.id.asc()).all()
+        query = SPOT.select().where(ParkingSpot.lot_id == lot_id)\
+                             .order_by(ParkingSpot.id.asc())
+        if "since" in request.args:
+            try:
+                since = spot_seq_from_token(request.args["since"], lot_id)
+            except ValueError as e:
+                return error(str(e), 400)
+            full = since < lot.spot_seq_floor
+            if not full:
+                query = query.where(ParkingSpot.change_seq > since)
+            return success({
+                "lot_name": lot.prime_location_name,
+                "spots": [SPOT.to_dict(row) for row in db.session.execute(query)],
+                "token": spot_seq_token(lot),
+                "full": full,
+            }, "Spots loaded")
+
+        if stream_format():
+            return stream_rows(query, SPOT.to_dict, "spots", "Spots loaded",
+                               extra={"lot_name": lot.prime_location_name})
 
         return success({
             "lot_name": lot.prime_location_name,
-            "spots": [s.to_dict() for s in spots]
+            "spots": [SPOT.to_dict(row) for row in db.session.execute(query)],
+            "token": spot_seq_token(lot),
         }, "Spots loaded")
 
+
+# Delta tokens are [lot_id, spot_seq] in the same opaque encoding as page cursors.
+# The lot's spot_seq is read before its spots, so a change racing the read is at
+# worst sent again with the next delta, never skipped.
+def spot_seq_token(lot):
+    return encode_cursor([lot.id, lot.spot_seq])
+
+
+def spot_seq_from_token(token, lot_id):
+    if not token:
+        return -1  # ?since= with no token: full snapshot
+    try:
+        lot_part, seq = decode_cursor(token, [ParkingLot.id, ParkingLot.spot_seq])
+    except ValueError:
+        raise ValueError("Invalid since token")
+    if lot_part != lot_id or not isinstance(seq, int):
+        raise ValueError("Invalid since token")
+    return seq
+
 def clear_spots_cache(lot_id):
-    cache.delete_memoized(SpotsByLotAPI.get, lot_id)
\ No newline at end of file
+    invalidate(lot_tag(lot_id))
\ No newline at end of file
@@ -0,0 +1,59 @@
+# backend/cntrlrs/occupancy_apis.py
+from flask import Response, request
+from flask_restful import Resource
+
+from occupancy import bitmaps, load_layout, layout_version, encode_bitmap
+from cntrlrs.responses import success, error
+
+
+def wants_binary():
+    return request.args.get("format") == "binary" or \
+        "application/octet-stream" in request.headers.get("Accept", "")
+
+
+class LotLayoutAPI(Resource):
+    """
+    GET /lots/<lot_id>/layout?v=<layout_version>
+    Spot ids / numbers in bitmap order: [[id, spot_number], ...].
+    Fetched once per layout_version; with ?v= matching the current version the
+    response is immutable and cached by the browser for good.
+    """
+    def get(self, lot_id):
+        rows = load_layout(lot_id)
+        if rows is None:
+            return error("Parking lot not found", 404)
+        version = layout_version([r.id for r in rows])
+        if request.args.get("v") == version:
+            headers = {"Cache-Control": "public, max-age=31536000, immutable"}
+        else:
+            headers = {"Cache-Control": "no-cache"}
+        headers["ETag"] = f'"{version}"'
+        data, code = success({
+            "lot_id": lot_id,
+            "layout_version": version,
+            "spots": [[r.id, r.spot_number] for r in rows],
+        }, "Lot layout")
+        return data, code, headers
+
+
+class LotOccupancyAPI(Resource):
+    """
+    GET /lots/<lot_id>/occupancy
+    Packed status bitmap (bit i = spot i of the layout, MSB first, 1 = occupied),
+    served from the in-memory / Redis bitmap without touching the ORM.
+    JSON with base64 by default; ?format=binary or Accept: application/octet-stream
+    returns the raw bytes with the layout version in X-Layout-Version.
+    """
+    def get(self, lot_id):
+        snapshot = bitmaps.snapshot(lot_id)
+        if snapshot is None:
+            return error("Parking lot not found", 404)
+        version, bits = snapshot
+        if wants_binary():
+            return Response(bits, mimetype="application/octet-stream",
+                            headers={"X-Layout-Version": version, "Cache-Control": "no-cache"})
+        return success({
+            "lot_id": lot_id,
+            "layout_version": version,
+            "bitmap": encode_bitmap(bits),
+        }, "Lot occupancy")
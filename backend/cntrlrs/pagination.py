@@ -0,0 +1,166 @@
+# backend/cntrlrs/pagination.py
+import base64
+import json
+from datetime import datetime
+
+from flask import request, current_app
+from sqlalchemy import DateTime, Select, tuple_
+
+from datab import db
+import sharding
+
+
+# -----------------------------
+# CURSORS
+# -----------------------------
+# A cursor is the sort key of a boundary row (e.g. [parking_timestamp, id]),
+# JSON encoded and base64'd so clients treat it as an opaque token.
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(token, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("Invalid cursor")
+    decoded = []
+    for value, column in zip(values, columns):
+        if isinstance(column.type, DateTime) and value is not None:
+            value = datetime.fromisoformat(value)
+        decoded.append(value)
+    return decoded
+
+
+# -----------------------------
+# REQUEST PARAMS
+# -----------------------------
+class PageParams:
+    def __init__(self, limit, after=None, before=None):
+        self.limit = limit
+        self.after = after
+        self.before = before
+
+
+def wants_legacy_listing():
+    """
+    True when the old "whole table" response should be returned: the
+    LEGACY_UNPAGINATED_LISTS flag is on and the client sent no paging params.
+    """
+    paging = any(k in request.args for k in ("limit", "after", "before"))
+    return current_app.config.get("LEGACY_UNPAGINATED_LISTS", False) and not paging
+
+
+def page_params():
+    """Read limit/after/before from the query string. Raises ValueError on bad input."""
+    default = current_app.config.get("PAGE_DEFAULT_LIMIT", 50)
+    maximum = current_app.config.get("PAGE_MAX_LIMIT", 500)
+    try:
+        limit = int(request.args.get("limit", default))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be >= 1")
+    after = request.args.get("after")
+    before = request.args.get("before")
+    if after and before:
+        raise ValueError("use either after or before, not both")
+    return PageParams(min(limit, maximum), after, before)
+
+
+def date_arg(name):
+    """Optional ISO date/datetime query param (e.g. from=2025-01-01)."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date (YYYY-MM-DD)")
+
+
+# -----------------------------
+# KEYSET PAGINATION
+# -----------------------------
+def keyset_page(query, columns, params, descending=False, key_of=None):
+    """
+    Page through `query` ordered by `columns` (the last column must be unique, e.g. id)
+    without OFFSET: the cursor row's key goes straight into the WHERE clause, so each
+    page is an index range scan no matter how deep it is.
+
+    `query` is an ORM Query or a Core select() (rows come back as Row tuples).
+    key_of(row) returns the row's values for `columns`; defaults to attribute lookup.
+    Returns (rows, next_cursor, prev_cursor).
+    """
+    if key_of is None:
+        key_of = lambda row: [getattr(row, c.key) for c in columns]
+
+    key = tuple_(*columns)
+    forward = not params.before
+    if params.after:
+        cursor = tuple_(*decode_cursor(params.after, columns))
+        query = query.filter(key < cursor if descending else key > cursor)
+    elif params.before:
+        cursor = tuple_(*decode_cursor(params.before, columns))
+        query = query.filter(key > cursor if descending else key < cursor)
+
+    # walking backwards from a `before` cursor reads the index in the opposite direction
+    reverse = descending if forward else not descending
+    query = query.order_by(*[c.desc() if reverse else c.asc() for c in columns])
+
+    query = query.limit(params.limit + 1)
+    rows = db.session.execute(query).all() if isinstance(query, Select) else query.all()
+    has_more = len(rows) > params.limit
+    rows = rows[:params.limit]
+    if not forward:
+        rows.reverse()
+    if not rows:
+        return rows, None, None
+
+    if forward:
+        next_cursor = encode_cursor(key_of(rows[-1])) if has_more else None
+        prev_cursor = encode_cursor(key_of(rows[0])) if params.after else None
+    else:
+        next_cursor = encode_cursor(key_of(rows[-1]))
+        prev_cursor = encode_cursor(key_of(rows[0])) if has_more else None
+    return rows, next_cursor, prev_cursor
+
+
+def sharded_keyset_page(query, columns, params, descending=False, key_of=None):
+    """
+    keyset_page() over every shard (sharding.py): each shard pages from the same
+    cursor in parallel and the pages are merged on the sort key. The key ends in
+    an id that is unique across shards, so one cursor is valid on all of them.
+
+    `query` is a Core select(), or a callable building the query (ORM queries
+    are tied to a session, so each shard has to build its own).
+    """
+    build = query if callable(query) else (lambda: query)
+    if key_of is None:
+        key_of = lambda row: [getattr(row, c.key) for c in columns]
+    if not sharding.enabled():
+        return keyset_page(build(), columns, params, descending, key_of)
+
+    pages = sharding.scatter(lambda: keyset_page(build(), columns, params, descending, key_of))
+    rows = sorted((row for page, _, _ in pages for row in page),
+                  key=lambda row: tuple(key_of(row)), reverse=descending)
+    forward = not params.before
+    if forward:
+        has_more = len(rows) > params.limit or any(next_cursor for _, next_cursor, _ in pages)
+        rows = rows[:params.limit]
+    else:
+        has_more = len(rows) > params.limit or any(prev_cursor for _, _, prev_cursor in pages)
+        rows = rows[-params.limit:]
+    if not rows:
+        return rows, None, None
+
+    if forward:
+        next_cursor = encode_cursor(key_of(rows[-1])) if has_more else None
+        prev_cursor = encode_cursor(key_of(rows[0])) if params.after else None
+    else:
+        next_cursor = encode_cursor(key_of(rows[-1]))
+        prev_cursor = encode_cursor(key_of(rows[0])) if has_more else None
+    return rows, next_cursor, prev_cursor
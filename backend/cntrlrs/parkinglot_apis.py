@@ -1,38 +1,83 @@
 # backend/cntrlrs/parkinglot_apis.py
-from flask import request
+from celery.result import AsyncResult
+from flask import current_app, request
 from flask_restful import Resource
 from sqlalchemy.exc import IntegrityError
 
-from datab import db
+from datab import db, transaction
 from model import ParkingLot, ParkingSpot
 
-from cache import cache
-from cntrlrs.chart_apis import ChartDataAPI
-def success(data=None, message="OK"):
-    return {"status": "success", "data": data or {}, "message": message}, 200
+from cache import cached_view, invalidate, lot_tag, LOTS, CHARTS, LOT_INFO
+from cntrlrs.conditional import conditional_view
+from spot_pool import spot_pool
+from events import publish_spots, publish_spots_removed, publish_lot_deleted
+from occupancy import bitmaps, encode_bitmap
+from cntrlrs.pagination import wants_legacy_listing, page_params, sharded_keyset_page
+from sharding import scatter, use_shard, choose_shard
+from cntrlrs.serializers import SPOT_STATUS
+from cntrlrs.responses import success, error
 
-def error(message="Error", code=400):
-    return {"status": "error", "data": {}, "message": message}, code
+
+def lot_detail(lot):
+    """
+    Lot with its spots. ?compact=1 swaps the spot list for the occupancy bitmap
+    and layout version (see /lots/<id>/layout and /lots/<id>/occupancy).
+    """
+    if request.args.get("compact") not in ("1", "true"):
+        return lot.to_dict(include_spots=True)
+    data = lot.to_dict()
+    version, bits = bitmaps.snapshot(lot.id)
+    data["layout_version"] = version
+    data["occupancy_bitmap"] = encode_bitmap(bits)
+    return data
+
+
+def provision_async(to_create):
+    """Growing a lot by this many spots goes to the provision_lot_spots task."""
+    threshold = current_app.config.get("SPOT_PROVISION_ASYNC_THRESHOLD", 0)
+    return bool(threshold) and to_create > threshold
+
+
+def start_provisioning(lot, message):
+    """Queue the spot inserts of a large lot; 202 with the task id to poll."""
+    from tasks.provision_spots_task import provision_lot_spots
+    task = provision_lot_spots.delay(lot.id)
+    data, _ = success({"lot": lot.to_dict(), "task_id": task.id}, message)
+    return data, 202
 
 
 class ParkingLotAPI(Resource):
     """
-    GET /lots
+    GET /lots                      (?limit=&after=&before= for keyset pages by id)
     POST /lots
     PUT /lots/<int:lot_id>
     DELETE /lots/<int:lot_id>
     """
-    @cache.cached(timeout=300)
+    # a single lot only depends on its own tag; the list on every lot
+    @conditional_view(lambda lot_id=None: [lot_tag(lot_id)] if lot_id else [LOTS])
+    @cached_view(lambda lot_id=None: [lot_tag(lot_id)] if lot_id else [LOTS], timeout=300)
     def get(self, lot_id=None):
         if lot_id:
             lot = ParkingLot.query.get(lot_id)
             if not lot:
                 return error("Parking lot not found", 404)
-            return success(lot.to_dict(include_spots=True), "Lot found")
-        else:
-            lots = ParkingLot.query.all()
-            data = [l.to_dict() for l in lots]
+            return success(lot_detail(lot), "Lot found")
+        elif wants_legacy_listing():
+            # every shard's lots, in id order
+            shards = scatter(lambda: [l.to_dict() for l in ParkingLot.query.order_by(ParkingLot.id).all()])
+            data = sorted((lot for lots in shards for lot in lots), key=lambda lot: lot["id"])
             return success({"lots": data}, "List of lots")
+        else:
+            try:
+                lots, next_cursor, prev_cursor = sharded_keyset_page(
+                    lambda: ParkingLot.query, [ParkingLot.id], page_params())
+            except ValueError as e:
+                return error(str(e), 400)
+            return success({
+                "lots": [l.to_dict() for l in lots],
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+            }, "List of lots")
 
     def post(self):
         payload = request.get_json() or {}
@@ -45,22 +90,28 @@ class ParkingLotAPI(Resource):
         if not name or not address or not pin_code:
             return error("prime_location_name, address and pin_code required", 400)
 
-        lot = ParkingLot(
-            prime_location_name=name,
-            address=address,
-            pin_code=pin_code,
-            price_per_hour=price_per_hour,
-            number_of_spots=number_of_spots
-        )
-        db.session.add(lot)
-        db.session.commit()
-
-        # Create spots automatically
-        lot.create_spots(commit=True)
-
-        cache.delete_memoized(ParkingLotAPI.get)
-        cache.delete_memoized(ChartDataAPI.get)
-        return success(lot.to_dict(include_spots=True), "Parking lot created")
+        # the new lot (and its spots) live on the shard of its region
+        use_shard(choose_shard(pin_code))
+        with transaction():
+            lot = ParkingLot(
+                prime_location_name=name,
+                address=address,
+                pin_code=pin_code,
+                price_per_hour=price_per_hour,
+                number_of_spots=number_of_spots
+            )
+            db.session.add(lot)
+            db.session.flush()  # get lot.id
+
+            # Create spots automatically (large lots: in the background)
+            if not provision_async(number_of_spots):
+                lot.create_spots()
+        spot_pool.seed_lot(lot.id)
+
+        invalidate(LOTS, CHARTS)
+        if provision_async(number_of_spots):
+            return start_provisioning(lot, "Parking lot created, spots are being provisioned")
+        return success(lot_detail(lot), "Parking lot created")
 
     def put(self, lot_id):
         lot = ParkingLot.query.get(lot_id)
@@ -68,44 +119,48 @@ class ParkingLotAPI(Resource):
             return error("Parking lot not found", 404)
 
         payload = request.get_json() or {}
-        # allow partial updates
-        if "prime_location_name" in payload:
-            lot.prime_location_name = payload["prime_location_name"]
-        if "address" in payload:
-            lot.address = payload["address"]
-        if "pin_code" in payload:
-            lot.pin_code = payload["pin_code"]
-        if "price_per_hour" in payload:
-            lot.price_per_hour = float(payload["price_per_hour"])
+        new_count = None
         if "number_of_spots" in payload:
             new_count = int(payload["number_of_spots"])
             if new_count < 0:
                 return error("number_of_spots must be >= 0", 400)
-            # If decreasing, only allow if the spots that will be removed are available
-            current_count = lot.number_of_spots
-            if new_count < current_count:
-                # find spots to delete
-                to_delete_count = current_count - new_count
-                # delete from the end: highest numbered spots which are available only
-                spots = ParkingSpot.query.filter_by(lot_id=lot.id).order_by(ParkingSpot.id.desc()).all()
-                deletable = [s for s in spots if s.is_available()]
-                if len(deletable) < to_delete_count:
-                    return error("Cannot reduce spots: some spots are occupied", 400)
-                for s in deletable[:to_delete_count]:
-                    db.session.delete(s)
-            lot.number_of_spots = new_count
-            if new_count > current_count:
-                # create additional spots
-                db.session.add(lot)
-                db.session.commit()
-                lot.create_spots(commit=True)
-
-        db.session.add(lot)
-        db.session.commit()
 
-        cache.delete_memoized(ParkingLotAPI.get)
-        cache.delete_memoized(ChartDataAPI.get)
-        return success(lot.to_dict(include_spots=True), "Parking lot updated")
+        removed, created, background = [], [], False
+        try:
+            with transaction():
+                # allow partial updates
+                if "prime_location_name" in payload:
+                    lot.prime_location_name = payload["prime_location_name"]
+                if "address" in payload:
+                    lot.address = payload["address"]
+                if "pin_code" in payload:
+                    lot.pin_code = payload["pin_code"]
+                if "price_per_hour" in payload:
+                    lot.price_per_hour = float(payload["price_per_hour"])
+                if new_count is not None:
+                    current_count = lot.number_of_spots
+                    if new_count < current_count:
+                        # delete from the end: highest numbered spots which are available only
+                        removed = lot.remove_available_spots(current_count - new_count)
+                    lot.number_of_spots = new_count
+                    if new_count > current_count:
+                        # create additional spots (same transaction as the lot update)
+                        background = provision_async(new_count - current_count)
+                        if not background:
+                            created = lot.create_spots()
+        except ValueError as e:
+            return error(str(e), 400)
+
+        if new_count is not None:
+            spot_pool.discard(lot.id, removed)
+            spot_pool.push(lot.id, created)
+            publish_spots_removed(lot.id, removed)
+            publish_spots(lot.id, created, ParkingSpot.STATUS_AVAILABLE)
+
+        invalidate(lot_tag(lot.id), LOTS, CHARTS, LOT_INFO)
+        if background:
+            return start_provisioning(lot, "Parking lot updated, spots are being provisioned")
+        return success(lot_detail(lot), "Parking lot updated")
 
     def delete(self, lot_id):
         lot = ParkingLot.query.get(lot_id)
@@ -117,9 +172,10 @@ class ParkingLotAPI(Resource):
             return error("Cannot delete lot: some spots are occupied", 400)
         db.session.delete(lot)
         db.session.commit()
+        spot_pool.drop_lot(lot_id)
+        publish_lot_deleted(lot_id)
 
-        cache.delete_memoized(ParkingLotAPI.get)
-        cache.delete_memoized(ChartDataAPI.get)
+        invalidate(lot_tag(lot_id), LOTS, CHARTS, LOT_INFO)
         return success({}, "Parking lot deleted")
 # Add inside admin_apis.py OR parkinglot_apis.py
 
@@ -135,18 +191,29 @@ class ParkingLotSpotsAPI(Resource):
         if not lot:
             return error("Parking lot not found", 404)
 
-        spots = ParkingSpot.query.filter_by(lot_id=lot_id).order_by(ParkingSpot.spot_number).all()
-
-        data = [
-            {
-                "id": s.id,
-                "spot_number": s.spot_number,
-                "status": s.status
-            }
-            for s in spots
-        ]
+        query = SPOT_STATUS.select().where(ParkingSpot.lot_id == lot_id).order_by(ParkingSpot.spot_number)
+        data = [SPOT_STATUS.to_dict(row) for row in db.session.execute(query)]
 
         return {
             "status": "success",
             "spots": data
         }, 200
+
+
+class LotProvisionStatusAPI(Resource):
+    """
+    GET /lots/provision/<task_id>
+    Progress of a background spot provisioning (see SPOT_PROVISION_ASYNC_THRESHOLD).
+    """
+    def get(self, task_id):
+        task = AsyncResult(task_id)
+        if task.state == "FAILURE":
+            return error(f"Spot provisioning failed: {task.result}", 500)
+        if task.state == "PENDING":
+            return success({"state": "pending"}, "Spot provisioning queued")
+        if task.state == "PROGRESS":
+            return success({"state": "running", **(task.info or {})}, "Spot provisioning in progress")
+        result = dict(task.result or {})
+        if result.pop("status", None) == "error":
+            return error(result.get("message", "Spot provisioning failed"), 404)
+        return success({"state": "done", **result}, "Spots provisioned")
@@ -3,12 +3,7 @@ from flask_restful import Resource
 
 from datab import db
 from model import ParkingSpot, User, Reservation
-
-def success(data=None, message="OK"):
-    return {"status": "success", "data": data or {}, "message": message}, 200
-
-def error(message="Error", code=400):
-    return {"status": "error", "data": {}, "message": message}, code
+from cntrlrs.responses import success, error
 
 
 class ParkingSpotAPI(Resource):
@@ -53,7 +48,7 @@ class ParkingSpotAPI(Resource):
                 user = User.query.get(active.user_id)
                 data.update({
                     "vehicle_number": active.vehicle_number,
-                    "reserved_at": active.parking_timestamp.isoformat(),
+                    "reserved_at": active.parking_timestamp,
                     "user_name": user.username if user else None,
                     "user_email": user.email if user else None
                 })
@@ -85,7 +80,7 @@ class AdminSpotDetailsAPI(Resource):
                     "email": user.email
                 },
                 "vehicle_number": active.vehicle_number,
-                "start_time": active.parking_timestamp.isoformat(),
+                "start_time": active.parking_timestamp,
             }
         else:
             data = {
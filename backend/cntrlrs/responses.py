@@ -0,0 +1,124 @@
+# backend/cntrlrs/responses.py
+import gzip
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import make_response, request
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+
+# -----------------------------
+# ENVELOPE
+# -----------------------------
+def success(data=None, message="OK"):
+    return {"status": "success", "data": data or {}, "message": message}, 200
+
+def error(message="Error", code=400):
+    return {"status": "error", "data": {}, "message": message}, code
+
+
+# -----------------------------
+# JSON ENCODING
+# -----------------------------
+# datetimes are encoded natively (ISO 8601, same text as isoformat()), so
+# to_dict() methods can return them as they are.
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _encode_orjson(value):
+    return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _encode_stdlib(value):
+    return json.dumps(value, default=_default, separators=(",", ":")).encode()
+
+
+_encode = _encode_orjson if orjson else _encode_stdlib
+
+
+def encode(value):
+    """JSON bytes for a response body."""
+    return _encode(value)
+
+
+def dumps(value):
+    """JSON text (streamed responses build their body from these)."""
+    return _encode(value).decode()
+
+
+def output_json(data, code, headers=None):
+    """Flask-RESTful representation for application/json using encode()."""
+    response = make_response(encode(data), code)
+    response.headers.extend(headers or {})
+    response.mimetype = "application/json"
+    return response
+
+
+# -----------------------------
+# COMPRESSION
+# -----------------------------
+def _pick_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality("br") > 0:
+        return "br"
+    if accepted.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def init_app(app, api):
+    """
+    Shared response layer: every Resource is encoded by output_json (orjson
+    unless RESPONSE_JSON_ENCODER = "json"), and buffered responses of
+    COMPRESS_MIMETYPES larger than COMPRESS_MIN_SIZE are sent brotli or gzip
+    encoded, whichever the client accepts (brotli needs the brotli package).
+    Streams (NDJSON, SSE) and 304s are left alone.
+    """
+    global _encode
+    _encode = _encode_orjson if orjson and app.config.get("RESPONSE_JSON_ENCODER", "orjson") == "orjson" \
+        else _encode_stdlib
+    api.representations["application/json"] = output_json
+
+    if not app.config.get("COMPRESS_ENABLED", True):
+        return
+    min_size = app.config.get("COMPRESS_MIN_SIZE", 1024)
+    mimetypes = set(app.config.get("COMPRESS_MIMETYPES", ["application/json"]))
+    gzip_level = app.config.get("COMPRESS_GZIP_LEVEL", 6)
+    brotli_quality = app.config.get("COMPRESS_BROTLI_QUALITY", 5)
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or response.mimetype not in mimetypes or "Content-Encoding" in response.headers):
+            return response
+        response.vary.add("Accept-Encoding")
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        encoding = _pick_encoding()
+        if encoding == "br":
+            body = brotli.compress(body, quality=brotli_quality)
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=gzip_level)
+        else:
+            return response
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,128 @@
+# backend/cntrlrs/serializers.py
+from sqlalchemy import select
+
+from model import User, ParkingLot, ParkingSpot, Reservation, ReservationArchive
+
+
+# -----------------------------
+# PROJECTIONS
+# -----------------------------
+class Projection:
+    """
+    The columns one endpoint returns, selected through Core and turned into dicts
+    straight from the row tuples: no ORM objects, no identity map, no lazy loads.
+
+    columns: (output key, column) pairs; joins: (target, onclause) outer joins;
+    finish(dict) adds derived values (e.g. a booking's status) when given.
+    The SELECT is built once at import; endpoints add their WHERE / ORDER BY.
+    """
+    def __init__(self, columns, joins=(), finish=None):
+        self.keys = tuple(key for key, _ in columns)
+        stmt = select(*[column.label(key) for key, column in columns])
+        for target, onclause in joins:
+            stmt = stmt.outerjoin(target, onclause)
+        self.stmt = stmt
+        self.finish = finish
+
+    def select(self):
+        return self.stmt
+
+    def to_dict(self, row):
+        data = dict(zip(self.keys, row))
+        return self.finish(data) if self.finish else data
+
+
+# Same keys as ParkingSpot.to_dict()
+SPOT = Projection([
+    ("id", ParkingSpot.id),
+    ("lot_id", ParkingSpot.lot_id),
+    ("spot_number", ParkingSpot.spot_number),
+    ("status", ParkingSpot.status),
+    ("vehicle_number", ParkingSpot.vehicle_number),
+    ("reserved_at", ParkingSpot.reserved_at),
+])
+
+# Admin spot grid (ParkingLotSpotsAPI)
+SPOT_STATUS = Projection([
+    ("id", ParkingSpot.id),
+    ("spot_number", ParkingSpot.spot_number),
+    ("status", ParkingSpot.status),
+])
+
+# Same keys as User.to_dict()
+USER = Projection([
+    ("id", User.id),
+    ("username", User.username),
+    ("email", User.email),
+    ("active", User.active),
+    ("created_at", User.created_at),
+])
+
+# Same keys as Reservation.to_dict(); spot and lot come from the same SELECT
+def _booking(data):
+    data["status"] = "active" if not data["leaving_timestamp"] else "released"
+    data["cost"] = data["parking_cost"]
+    return data
+
+
+_BOOKING_COLUMNS = [
+    ("id", Reservation.id),
+    ("user_id", Reservation.user_id),
+    ("spot_id", Reservation.spot_id),
+    ("lot_name", ParkingLot.prime_location_name),
+    ("spot_number", ParkingSpot.spot_number),
+    ("parking_timestamp", Reservation.parking_timestamp),
+    ("leaving_timestamp", Reservation.leaving_timestamp),
+    ("parking_cost", Reservation.parking_cost),
+    ("vehicle_number", Reservation.vehicle_number),
+    ("remarks", Reservation.remarks),
+]
+_BOOKING_JOINS = [
+    (ParkingSpot, Reservation.spot_id == ParkingSpot.id),
+    (ParkingLot, ParkingSpot.lot_id == ParkingLot.id),
+]
+BOOKING = Projection(_BOOKING_COLUMNS, _BOOKING_JOINS, _booking)
+
+# Same keys, from reservations_archive (lot and spot were copied in at archive time)
+_ARCHIVED_BOOKING_COLUMNS = [
+    ("id", ReservationArchive.id),
+    ("user_id", ReservationArchive.user_id),
+    ("spot_id", ReservationArchive.spot_id),
+    ("lot_name", ReservationArchive.lot_name),
+    ("spot_number", ReservationArchive.spot_number),
+    ("parking_timestamp", ReservationArchive.parking_timestamp),
+    ("leaving_timestamp", ReservationArchive.leaving_timestamp),
+    ("parking_cost", ReservationArchive.parking_cost),
+    ("vehicle_number", ReservationArchive.vehicle_number),
+    ("remarks", ReservationArchive.remarks),
+]
+ARCHIVED_BOOKING = Projection(_ARCHIVED_BOOKING_COLUMNS, finish=_booking)
+
+
+# Admin bookings list: the booking plus {id, username, email} of its user
+def _admin_booking(data):
+    user_id = data.pop("user_ref")
+    username, email = data.pop("user_username"), data.pop("user_email")
+    data["user"] = {"id": user_id, "username": username, "email": email} if user_id is not None else None
+    return _booking(data)
+
+
+ADMIN_BOOKING = Projection(
+    _BOOKING_COLUMNS + [
+        ("user_ref", User.id),
+        ("user_username", User.username),
+        ("user_email", User.email),
+    ],
+    _BOOKING_JOINS + [(User, Reservation.user_id == User.id)],
+    _admin_booking,
+)
+
+ADMIN_ARCHIVED_BOOKING = Projection(
+    _ARCHIVED_BOOKING_COLUMNS + [
+        ("user_ref", User.id),
+        ("user_username", User.username),
+        ("user_email", User.email),
+    ],
+    [(User, ReservationArchive.user_id == User.id)],
+    _admin_booking,
+)
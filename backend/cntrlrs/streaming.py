@@ -0,0 +1,77 @@
+# backend/cntrlrs/streaming.py
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import Select
+
+from datab import db
+import sharding
+from cntrlrs.responses import dumps
+
+NDJSON = "ndjson"
+JSON_STREAM = "json-stream"
+
+
+def stream_format():
+    """
+    Streaming mode asked for by the client, or None for the normal response:
+      ?format=ndjson or Accept: application/x-ndjson -> one JSON object per line
+      ?format=json-stream                            -> usual envelope, array sent in chunks
+    """
+    fmt = request.args.get("format")
+    if fmt in (NDJSON, JSON_STREAM):
+        return fmt
+    if "application/x-ndjson" in request.headers.get("Accept", ""):
+        return NDJSON
+    return None
+
+
+def is_stream_request():
+    # used as `unless=` on cached views: streamed responses bypass the cache
+    return stream_format() is not None
+
+
+def stream_rows(query, to_dict, key, message="OK", extra=None, fmt=None, sharded=False):
+    """
+    Stream every row of `query` (ORM Query or Core select()) without building the list in memory.
+    Rows are fetched `STREAM_BATCH_SIZE` at a time through yield_per (a
+    server-side cursor) and flushed to the client batch by batch, so peak
+    memory is one batch and the first bytes go out right away.
+    `extra` holds other data fields sent ahead of the array (json-stream only).
+    sharded=True streams the (Core) query from every shard in turn (sharding.py),
+    so rows come shard by shard rather than in one global order.
+    """
+    fmt = fmt or stream_format()
+    batch_size = current_app.config.get("STREAM_BATCH_SIZE", 500)
+
+    def rows():
+        if sharded:
+            for shard in sharding.shard_ids():
+                with sharding.on_shard(shard):
+                    yield from db.session.execute(query.execution_options(yield_per=batch_size))
+        elif isinstance(query, Select):
+            yield from db.session.execute(query.execution_options(yield_per=batch_size))
+        else:
+            yield from query.yield_per(batch_size)
+
+    def generate():
+        buffer = []
+        first = True
+        if fmt == JSON_STREAM:
+            head = "".join("%s: %s, " % (dumps(k), dumps(v)) for k, v in (extra or {}).items())
+            yield '{"status": "success", "data": {%s"%s": [' % (head, key)
+        for row in rows():
+            item = dumps(to_dict(row))
+            if fmt == NDJSON:
+                buffer.append(item + "\n")
+            else:
+                buffer.append(item if first else "," + item)
+                first = False
+            if len(buffer) >= batch_size:
+                yield "".join(buffer)
+                buffer = []
+        if buffer:
+            yield "".join(buffer)
+        if fmt == JSON_STREAM:
+            yield ']}, "message": %s}' % dumps(message)
+
+    mimetype = "application/x-ndjson" if fmt == NDJSON else "application/json"
+    return Response(stream_with_context(generate()), mimetype=mimetype)
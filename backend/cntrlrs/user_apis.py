@@ -1,21 +1,35 @@
 # backend/cntrlrs/user_apis.py
 from flask_restful import Resource
 
-from datab import db
+from datab import db, reads_from_replica
 from model import User
-
-def success(data=None, message="OK"):
-    return {"status": "success", "data": data or {}, "message": message}, 200
-
-def error(message="Error", code=400):
-    return {"status": "error", "data": {}, "message": message}, code
+from cntrlrs.pagination import wants_legacy_listing, page_params, keyset_page
+from cntrlrs.streaming import stream_format, stream_rows
+from cntrlrs.serializers import USER
+from cntrlrs.responses import success, error
 
 
 class UserListAPI(Resource):
     """
     GET /users -> list users
+    GET /users?limit=50&after=<cursor> -> keyset page ordered by id
+    GET /users?format=ndjson|json-stream -> stream every user
     """
+    @reads_from_replica
     def get(self):
-        users = User.query.all()
-        data = [u.to_dict() for u in users]
-        return success({"users": data}, "List of users")
+        query = USER.select()
+        if stream_format():
+            return stream_rows(query.order_by(User.id.asc()), USER.to_dict, "users", "List of users")
+        if wants_legacy_listing():
+            data = [USER.to_dict(row) for row in db.session.execute(query)]
+            return success({"users": data}, "List of users")
+
+        try:
+            users, next_cursor, prev_cursor = keyset_page(query, [User.id], page_params())
+        except ValueError as e:
+            return error(str(e), 400)
+        return success({
+            "users": [USER.to_dict(row) for row in users],
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+        }, "List of users")
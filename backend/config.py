@@ -2,8 +2,124 @@ class Config:
     SECRET_KEY = 'your_secret_key_here'
     SQLALCHEMY_DATABASE_URI = 'sqlite:///parking.db'
 
+    # Storage profile (storage.py). Pragmas run on every new SQLite connection:
+    # WAL lets readers carry on while a booking writes.
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',       # fsync at checkpoints only (safe with WAL)
+        'busy_timeout': 5000,          # ms to wait for the write lock instead of failing
+        'cache_size': -32000,          # page cache per connection, in KiB
+        'mmap_size': 268435456,        # 256 MB memory-mapped reads
+        'temp_store': 'MEMORY',
+    }
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_recycle': 3600,
+    }
+    # Optional read replica for the GET-heavy views (@reads_from_replica): either
+    # the primary file itself (separate read-only pool) or a snapshot file such as
+    # 'sqlite:///parking_replica.db', recopied every READ_REPLICA_REFRESH_SECONDS
+    # by the refresh_read_replica task (reads can lag by up to that much).
+    READ_REPLICA_URI = None
+    READ_REPLICA_REFRESH_SECONDS = 60
+
+    # Sharding by lot (sharding.py): extra SQLite files / engines for lots, spots and
+    # reservations; the primary above stays shard 0 (and keeps users). New lots go to
+    # the shard of their pin code prefix (e.g. {'39': 1, '40': 2}), else by a hash of it.
+    SHARD_URIS = []
+    SHARD_PIN_CODE_PREFIXES = {}
+    SHARD_SCATTER_WORKERS = 8        # threads for cross-shard reads
+
+    # Hot/cold reservations (archive.py): bookings released more than
+    # ARCHIVE_AFTER_MONTHS ago move to reservations_archive, nightly
+    ARCHIVE_AFTER_MONTHS = 12
+    ARCHIVE_BATCH_SIZE = 5000          # rows moved per transaction
+
     # Set a valid hashing scheme (EVEN if not used)
     SECURITY_PASSWORD_HASH = 'plaintext'
     SECURITY_PASSWORD_SALT = 'dummy_salt_value'
 
     SECURITY_TOKEN_AUTHENTICATION_HEADER = 'Authorization'
+
+    # Redis Cache Setup (L2, shared by all workers)
+    CACHE_TYPE = 'RedisCache'
+    CACHE_REDIS_HOST = 'localhost'
+    CACHE_REDIS_PORT = 6379
+    CACHE_DEFAULT_TIMEOUT = 300  # 5 minutes
+    # fail fast when Redis is down; the cache then runs on L1 only
+    CACHE_OPTIONS = {'socket_connect_timeout': 0.5, 'socket_timeout': 0.5}
+    CACHE_L2_RETRY_SECONDS = 5
+
+    # L1: per-process LRU in front of Redis
+    CACHE_L1_MAX_ITEMS = 1024
+    CACHE_L1_TIMEOUT = 30          # max seconds an entry lives in L1
+    CACHE_L1_VERSION_TTL = 5       # tag versions re-read from Redis at least this often
+    # tag bumps are broadcast to every worker's L1 over this pub/sub channel
+    CACHE_PUBSUB_ENABLED = True
+    CACHE_INVALIDATION_CHANNEL = 'cache:invalidate'
+
+    # Stampede protection (single_flight_view): one rebuild per key at a time
+    SINGLE_FLIGHT_LOCK_TIMEOUT = 30    # lock expiry if the rebuilding worker dies
+    SINGLE_FLIGHT_WAIT_SECONDS = 5     # wait for the first build when there is nothing stale
+    CACHE_EARLY_REFRESH_BETA = 1.0     # probabilistic early refresh; 0 turns it off
+
+    # Spot allocation: attempts at the guarded claim UPDATE before giving up
+    SPOT_CLAIM_MAX_ATTEMPTS = 5
+
+    # Report SQL statements per request in the X-Query-Count header (always on
+    # in debug mode and the tests; adds an event hook per statement otherwise)
+    SQL_QUERY_COUNTER = False
+
+    # Keyset pagination for list endpoints. While the legacy flag is on, requests
+    # without limit/after/before still get the whole list (current frontend).
+    LEGACY_UNPAGINATED_LISTS = True
+    PAGE_DEFAULT_LIMIT = 50
+    PAGE_MAX_LIMIT = 500
+
+    # Response layer (cntrlrs/responses.py): "orjson" (if installed) or "json",
+    # and gzip / brotli for JSON bodies of at least COMPRESS_MIN_SIZE bytes
+    RESPONSE_JSON_ENCODER = 'orjson'
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_MIMETYPES = ['application/json']
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5
+
+    # Rows fetched / flushed per chunk by streaming (?format=ndjson) responses
+    STREAM_BATCH_SIZE = 500
+
+    # Lot create / resize: growing a lot by more than this many spots is handed to
+    # the provision_lot_spots Celery task (0 = always inline, the default; needs a
+    # worker, e.g. 10000), which inserts SPOT_PROVISION_CHUNK spots per
+    # transaction and reports progress
+    SPOT_PROVISION_ASYNC_THRESHOLD = 0
+    SPOT_PROVISION_CHUNK = 5000
+
+    # Bulk lot import (POST /api/lots/import, flask import-lots): rows per
+    # transaction, and how many per-row errors the report lists
+    IMPORT_CHUNK_SIZE = 200
+    IMPORT_MAX_ERRORS = 1000
+
+    # Fleet booking: max vehicles / bookings per batch request
+    BATCH_MAX_ITEMS = 500
+
+    # Live occupancy events (SSE). "memory" fans out inside one process;
+    # use "redis" when running several workers, and for spots created by the
+    # Celery provisioning task to reach SSE clients.
+    EVENTS_BACKEND = 'memory'
+    EVENTS_REDIS_URL = 'redis://127.0.0.1:6379/0'
+    EVENTS_CHANNEL = 'occupancy:events'
+    EVENTS_CLIENT_BUFFER = 100       # queued events per client before it is dropped
+    EVENTS_HEARTBEAT_SECONDS = 15
+
+    # Occupancy bitmaps behind /lots/<id>/occupancy: "memory" (per worker, fed by the
+    # occupancy events) or "redis" (one shared copy); rebuilt from the DB at least every TTL
+    OCCUPANCY_BITMAP_BACKEND = 'memory'
+    OCCUPANCY_BITMAP_REDIS_URL = 'redis://127.0.0.1:6379/1'
+    OCCUPANCY_BITMAP_TTL = 300
+
+    # Optional Redis pool of free spot ids per lot (see spot_pool.py)
+    SPOT_POOL_ENABLED = False
+    SPOT_POOL_REDIS_URL = 'redis://127.0.0.1:6379/1'
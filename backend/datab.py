@@ -1,3 +1,80 @@
+from contextlib import contextmanager
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql import TextClause
+from sqlalchemy.sql.util import find_tables
+
+REPLICA_BIND = "replica"
+SHARD_BIND_PREFIX = "shard_"
+# tables partitioned by lot (sharding.py); everything else lives on the primary
+SHARDED_TABLES = frozenset({
+    "parking_lots", "parking_spots", "reservations", "reservations_archive",
+    "lot_daily_stats", "user_daily_stats",
+})
+
+
+def _is_sharded(mapper, clause):
+    if mapper is not None:
+        return sa.inspect(mapper).local_table.name in SHARDED_TABLES
+    if clause is None or isinstance(clause, TextClause):
+        return True  # raw SQL in this app is about lots / spots / reservations
+    tables = find_tables(clause, include_crud=True, include_joins=True)
+    return any(getattr(t, "name", None) in SHARDED_TABLES for t in tables)
+
+
+class RoutingSession(Session):
+    """
+    Session that routes statements:
+    - lot-scoped tables go to the shard picked for the request (sharding.use_shard);
+    - reads go to the "replica" bind (READ_REPLICA_URI, see storage.py) once the
+      request has opted in with use_replica() / @reads_from_replica. INSERT /
+      UPDATE / DELETE and flushes always go to the primary;
+    - everything else, and everything without shards / replica, to the primary.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            shard = g.get("shard")
+            if shard and _is_sharded(mapper, clause):
+                return self._db.engines[f"{SHARD_BIND_PREFIX}{shard}"]
+            if (not self._flushing and g.get("use_replica") and REPLICA_BIND in self._db.engines
+                    and not getattr(clause, "is_dml", False)):
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def use_replica():
+    """Route the rest of this request's reads to the read replica (if one is configured)."""
+    g.use_replica = True
+
+
+def reads_from_replica(view):
+    """Decorator for read-only views: their queries go to the read replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        use_replica()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def transaction():
+    """
+    Unit of work: everything done inside the block is committed once at the end,
+    or rolled back together if anything raises.
 
-db = SQLAlchemy()
+        with transaction():
+            reservation.finalize()
+    """
+    try:
+        yield db.session
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
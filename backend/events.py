@@ -0,0 +1,136 @@
+# backend/events.py
+import json
+import logging
+import queue
+import threading
+import time
+
+import redis
+from redis.exceptions import RedisError
+
+log = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """One SSE client: a bounded queue of events for one lot (or every lot if lot_id is None)."""
+    def __init__(self, lot_id, buffer_size):
+        self.lot_id = lot_id
+        self.queue = queue.Queue(maxsize=buffer_size)
+        self.dropped = False
+
+    def wants(self, event):
+        return self.lot_id is None or self.lot_id == event.get("lot_id")
+
+
+class EventBroker:
+    """
+    Fan-out of occupancy changes to SSE clients.
+    With EVENTS_BACKEND = "redis" events go through a pub/sub channel, so a
+    change made by any worker reaches the clients of every worker; with
+    "memory" (single worker) they are handed straight to local subscribers.
+    A client whose buffer fills up is dropped instead of slowing publishers
+    down or growing without bound; its stream ends and the browser reconnects.
+    """
+    def __init__(self):
+        self.redis = None
+        self.channel = "occupancy:events"
+        self.buffer_size = 100
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._listener = None
+        # callbacks fed with every event: on_publish once, in the worker that made
+        # the change; on_deliver in every worker (after the pub/sub hop when on Redis)
+        self.on_publish = []
+        self.on_deliver = []
+        self.stats = {"published": 0, "delivered": 0, "dropped_clients": 0}
+
+    def init_app(self, app, redis_client=None):
+        self.channel = app.config.get("EVENTS_CHANNEL", self.channel)
+        self.buffer_size = app.config.get("EVENTS_CLIENT_BUFFER", 100)
+        if app.config.get("EVENTS_BACKEND", "memory") != "redis":
+            return
+        self.redis = redis_client or redis.Redis.from_url(app.config["EVENTS_REDIS_URL"])
+        if self._listener is None or not self._listener.is_alive():
+            self._listener = threading.Thread(target=self._listen, name="occupancy-events", daemon=True)
+            self._listener.start()
+
+    # subscribers ---------------------------------------------
+    def subscribe(self, lot_id=None):
+        subscriber = Subscriber(lot_id, self.buffer_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    # publishing ----------------------------------------------
+    def _run_hooks(self, hooks, event):
+        for hook in hooks:
+            try:
+                hook(event)
+            except Exception:
+                log.exception("Occupancy event hook failed")
+
+    def publish(self, event):
+        self.stats["published"] += 1
+        self._run_hooks(self.on_publish, event)
+        if self.redis is not None:
+            try:
+                self.redis.publish(self.channel, json.dumps(event))
+                return
+            except RedisError as e:
+                log.warning("Occupancy event not published to Redis, delivering locally: %s", e)
+        self._fanout(event)
+
+    def _fanout(self, event):
+        self._run_hooks(self.on_deliver, event)
+        with self._lock:
+            subscribers = [s for s in self._subscribers if s.wants(event)]
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(event)
+                self.stats["delivered"] += 1
+            except queue.Full:
+                subscriber.dropped = True
+                self.unsubscribe(subscriber)
+                self.stats["dropped_clients"] += 1
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        self._fanout(json.loads(message["data"]))
+            except (RedisError, OSError, ValueError) as e:
+                log.warning("Occupancy event listener reconnecting: %s", e)
+                time.sleep(5)
+
+
+broker = EventBroker()
+
+
+# -----------------------------
+# EVENTS
+# -----------------------------
+def publish_spots(lot_id, spot_ids, status):
+    """Spots of a lot changed status ('A' / 'O') after reserve / release / resize."""
+    if spot_ids:
+        broker.publish({"type": "spots", "lot_id": lot_id, "status": status, "spot_ids": list(spot_ids)})
+
+
+def publish_spots_removed(lot_id, spot_ids):
+    if spot_ids:
+        broker.publish({"type": "spots_removed", "lot_id": lot_id, "spot_ids": list(spot_ids)})
+
+
+def publish_lot_deleted(lot_id):
+    broker.publish({"type": "lot_deleted", "lot_id": lot_id})
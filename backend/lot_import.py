@@ -0,0 +1,193 @@
+# backend/lot_import.py
+import csv
+import json
+import time
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from datab import db, transaction
+from model import ParkingLot
+from cache import invalidate, LOTS, CHARTS, LOT_INFO
+from spot_pool import spot_pool
+from sharding import choose_shard, on_shard
+
+# -----------------------------
+# BULK LOT IMPORT
+# -----------------------------
+# One lot per CSV row / JSON line, with the POST /api/lots fields:
+#   prime_location_name,address,pin_code,price_per_hour,number_of_spots
+# The file is read row by row and written in chunks (one transaction each), so
+# memory stays flat however long it is. Rows that fail validation are reported
+# by line number and the rest of the file still goes in.
+
+FORMATS = {"csv": "csv", "jsonl": "jsonl", "ndjson": "jsonl"}
+MIMETYPES = {"text/csv": "csv", "application/x-ndjson": "jsonl", "application/jsonl": "jsonl"}
+MAX_LENGTHS = {"prime_location_name": 255, "address": 255, "pin_code": 10}
+
+
+def detect_format(explicit=None, filename=None, mimetype=None):
+    """'csv' / 'jsonl' from ?format=, the file extension or the content type; None if unknown."""
+    if explicit:
+        return FORMATS.get(explicit.lower())
+    if filename and "." in filename:
+        return FORMATS.get(filename.rsplit(".", 1)[-1].lower())
+    return MIMETYPES.get(mimetype)
+
+
+def read_rows(stream, fmt):
+    """(line number, row dict, problem) for each record of a text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, "expected a JSON object"
+            continue
+        yield line_no, row, None
+
+
+def clean_row(row):
+    """ParkingLot fields of one row; ValueError with the reason if it isn't valid."""
+    data = {}
+    for key, max_length in MAX_LENGTHS.items():
+        value = str(row.get(key) or "").strip()
+        if not value:
+            raise ValueError(f"{key} required")
+        if len(value) > max_length:
+            raise ValueError(f"{key} longer than {max_length} characters")
+        data[key] = value
+    try:
+        data["price_per_hour"] = float(row.get("price_per_hour") or 0)
+        data["number_of_spots"] = int(row.get("number_of_spots") or 0)
+    except (TypeError, ValueError):
+        raise ValueError("price_per_hour and number_of_spots must be numbers")
+    if data["price_per_hour"] < 0 or data["number_of_spots"] < 0:
+        raise ValueError("price_per_hour and number_of_spots must be >= 0")
+    return data
+
+
+class ImportReport:
+    def __init__(self, max_errors):
+        self.rows = 0
+        self.lots = 0
+        self.spots = 0
+        self.failed = 0
+        self.errors = []            # first max_errors of them; `failed` counts all
+        self.max_errors = max_errors
+        self.started = time.monotonic()
+        self.finished = None
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": message})
+
+    def finish(self):
+        self.finished = time.monotonic()
+
+    @property
+    def seconds(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rows_per_sec(self):
+        return round(self.rows / self.seconds, 1) if self.seconds else 0.0
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "lots_created": self.lots,
+            "spots_created": self.spots,
+            "failed": self.failed,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": self.rows_per_sec,
+        }
+
+
+def _insert(rows):
+    """Lots (one batched INSERT on flush) and their spots for [(line, fields)], in one transaction."""
+    with transaction():
+        lots = [ParkingLot(**fields) for _, fields in rows]
+        db.session.add_all(lots)
+        db.session.flush()
+        spots = sum(len(lot.create_spots()) for lot in lots)
+        lot_ids = [lot.id for lot in lots]
+    spot_pool.seed(lot_ids)
+    return len(lot_ids), spots
+
+
+def _insert_chunk(chunk, report):
+    # each lot goes to the shard of its region: one transaction per shard
+    by_shard = {}
+    for line, fields in chunk:
+        by_shard.setdefault(choose_shard(fields["pin_code"]), []).append((line, fields))
+    for shard, rows in by_shard.items():
+        with on_shard(shard):
+            _insert_shard_chunk(rows, report)
+
+
+def _insert_shard_chunk(chunk, report):
+    try:
+        lots, spots = _insert(chunk)
+    except SQLAlchemyError:
+        # something in the chunk was refused by the DB: redo it row by row so
+        # only the offending rows are reported
+        lots = spots = 0
+        for line, fields in chunk:
+            try:
+                added_lots, added_spots = _insert([(line, fields)])
+            except SQLAlchemyError as e:
+                report.error(line, str(e.orig) if getattr(e, "orig", None) else str(e))
+                continue
+            lots += added_lots
+            spots += added_spots
+    report.lots += lots
+    report.spots += spots
+
+
+def import_lots(stream, fmt, chunk_size=200, max_errors=1000, progress=None):
+    """
+    Import lots (and their spots) from a CSV / JSON-lines text stream.
+    Returns an ImportReport; progress(report) is called after every chunk.
+    Caches are invalidated once, at the end.
+    """
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError("format must be csv or jsonl")
+    report = ImportReport(max_errors)
+    chunk = []
+    try:
+        for line, row, problem in read_rows(stream, fmt):
+            report.rows += 1
+            if problem is None:
+                try:
+                    chunk.append((line, clean_row(row)))
+                except ValueError as e:
+                    problem = str(e)
+            if problem is not None:
+                report.error(line, problem)
+            if len(chunk) >= chunk_size:
+                _insert_chunk(chunk, report)
+                chunk = []
+                if progress:
+                    progress(report)
+    except (UnicodeDecodeError, csv.Error) as e:
+        report.error(None, f"unreadable input, import stopped: {e}")
+    if chunk:
+        _insert_chunk(chunk, report)
+        if progress:
+            progress(report)
+    report.finish()
+
+    if report.lots:
+        invalidate(LOTS, CHARTS, LOT_INFO)
+    return report
@@ -0,0 +1,130 @@
+# backend/migrations.py
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from datab import db
+from model import ParkingSpot, Reservation, ReservationArchive, LotDailyStat, UserDailyStat, rebuild_rollups
+
+# -----------------------------
+# MIGRATION REGISTRY
+# -----------------------------
+# db.create_all() only creates missing tables, so anything added to an existing
+# table (columns, indexes) ships as a numbered migration. Each migration runs once
+# per database inside its own transaction and must also be safe on a fresh
+# database that create_all() already built with the new schema.
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return decorator
+
+
+def _columns(conn, table):
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+@migration(1, "occupancy counters on parking_lots")
+def add_occupancy_counters(conn):
+    columns = _columns(conn, "parking_lots")
+    if "available_count" not in columns:
+        conn.execute(text("ALTER TABLE parking_lots ADD COLUMN available_count INTEGER NOT NULL DEFAULT 0"))
+    if "occupied_count" not in columns:
+        conn.execute(text("ALTER TABLE parking_lots ADD COLUMN occupied_count INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(text("""
+        UPDATE parking_lots SET
+            available_count = (SELECT COUNT(*) FROM parking_spots s
+                               WHERE s.lot_id = parking_lots.id AND s.status = 'A'),
+            occupied_count  = (SELECT COUNT(*) FROM parking_spots s
+                               WHERE s.lot_id = parking_lots.id AND s.status = 'O')
+    """))
+
+
+@migration(2, "hot-path indexes on parking_spots and reservations")
+def add_hot_path_indexes(conn):
+    # index definitions live on the models; create the ones this database lacks
+    names = {"ix_parking_spots_lot_status", "ix_reservations_user_parking", "ix_reservations_active_spot"}
+    for table in (ParkingSpot.__table__, Reservation.__table__):
+        for index in table.indexes:
+            if index.name in names:
+                index.create(conn, checkfirst=True)
+
+
+@migration(3, "backfill daily reporting rollups")
+def backfill_rollups(conn):
+    for table in (LotDailyStat.__table__, UserDailyStat.__table__):
+        table.create(conn, checkfirst=True)
+    rebuild_rollups(conn)
+
+
+@migration(4, "spot change sequence for delta sync")
+def add_spot_change_seq(conn):
+    if "spot_seq" not in _columns(conn, "parking_lots"):
+        conn.execute(text("ALTER TABLE parking_lots ADD COLUMN spot_seq INTEGER NOT NULL DEFAULT 0"))
+    if "spot_seq_floor" not in _columns(conn, "parking_lots"):
+        conn.execute(text("ALTER TABLE parking_lots ADD COLUMN spot_seq_floor INTEGER NOT NULL DEFAULT 0"))
+    if "change_seq" not in _columns(conn, "parking_spots"):
+        conn.execute(text("ALTER TABLE parking_spots ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0"))
+    for index in ParkingSpot.__table__.indexes:
+        if index.name == "ix_parking_spots_lot_change_seq":
+            index.create(conn, checkfirst=True)
+
+
+@migration(5, "reservations_archive, per-user rollup index")
+def add_reservations_archive(conn):
+    ReservationArchive.__table__.create(conn, checkfirst=True)
+    for index in UserDailyStat.__table__.indexes:
+        if index.name == "ix_user_daily_stats_user_day":
+            index.create(conn, checkfirst=True)
+
+
+@migration(6, "parking_timestamp index on reservations_archive")
+def add_archive_parking_index(conn):
+    for index in ReservationArchive.__table__.indexes:
+        if index.name == "ix_reservations_archive_parking":
+            index.create(conn, checkfirst=True)
+
+
+# -----------------------------
+# RUNNER
+# -----------------------------
+def _ensure_version_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """))
+
+
+def applied_versions():
+    with db.engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_version"))}
+
+
+def run_migrations(engine=None):
+    """
+    Apply pending migrations in version order. Returns the versions applied.
+    """
+    engine = engine or db.engine
+    applied = []
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        done = {row[0] for row in conn.execute(text("SELECT version FROM schema_version"))}
+
+    for version, description, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": version, "d": description, "t": datetime.utcnow()},
+            )
+        applied.append(version)
+    return applied
@@ -1,7 +1,10 @@
 # backend/models.py
 import uuid
 from datetime import datetime
+from sqlalchemy import func, text, update, select, delete, cast, Integer
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import validates
+from sqlalchemy.orm.attributes import set_committed_value
 from datab import db
 
 # -----------------------------
@@ -56,7 +59,7 @@ class User(db.Model):
             "username": self.username,
             "email": self.email,
             "active": self.active,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "created_at": self.created_at,
         }
 
 
@@ -65,6 +68,8 @@ class User(db.Model):
 # -----------------------------
 class ParkingLot(db.Model):
     __tablename__ = "parking_lots"
+    # ids keep counting up from the shard's range start (sharding.py)
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = db.Column(db.Integer, primary_key=True)
     prime_location_name = db.Column(db.String(255), nullable=False)
@@ -76,6 +81,16 @@ class ParkingLot(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     notes = db.Column(db.String(512), nullable=True)
 
+    # Denormalized occupancy, kept in step with parking_spots by every reserve/release/resize
+    available_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    occupied_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    # Change sequence for delta sync of the spot grid: bumped with the counters on every
+    # spot change; each changed spot carries the value in ParkingSpot.change_seq.
+    # Tokens below spot_seq_floor (set when spots are deleted) get a full snapshot.
+    spot_seq = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    spot_seq_floor = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     # Relationship: spots are deleted if the lot is deleted
     spots = db.relationship("ParkingSpot", backref="lot", lazy=True, cascade="all, delete-orphan")
 
@@ -83,10 +98,64 @@ class ParkingLot(db.Model):
         return f"<ParkingLot {self.prime_location_name} (spots={self.number_of_spots})>"
 
     def available_spots_count(self):
-        return ParkingSpot.query.filter_by(lot_id=self.id, status=ParkingSpot.STATUS_AVAILABLE).count()
+        return self.available_count
 
     def occupied_spots_count(self):
-        return ParkingSpot.query.filter_by(lot_id=self.id, status=ParkingSpot.STATUS_OCCUPIED).count()
+        return self.occupied_count
+
+    @staticmethod
+    def adjust_counters(lot_id, available=0, occupied=0):
+        """
+        Shift a lot's occupancy counters inside the caller's transaction.
+        Uses "col = col + n" so concurrent bookings never overwrite each other.
+        Also advances spot_seq; the spots written just before were stamped with
+        the new value (ParkingSpot.next_change_seq).
+        """
+        if not available and not occupied:
+            return
+        db.session.execute(
+            update(ParkingLot)
+            .where(ParkingLot.id == lot_id)
+            .values(
+                available_count=ParkingLot.available_count + available,
+                occupied_count=ParkingLot.occupied_count + occupied,
+                spot_seq=ParkingLot.spot_seq + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    def verify_counters(cls, repair=False):
+        """
+        Recompute occupancy from parking_spots (one GROUP BY) and compare with the
+        stored counters. Returns {lot_id: {"stored": (a, o), "actual": (a, o)}} for
+        every lot that drifted; with repair=True the actual values are written back
+        (caller commits).
+        """
+        actual = {}
+        rows = db.session.query(ParkingSpot.lot_id, ParkingSpot.status, func.count(ParkingSpot.id))\
+                         .group_by(ParkingSpot.lot_id, ParkingSpot.status).all()
+        for lot_id, status, count in rows:
+            available, occupied = actual.get(lot_id, (0, 0))
+            if status == ParkingSpot.STATUS_AVAILABLE:
+                available = count
+            else:
+                occupied += count
+            actual[lot_id] = (available, occupied)
+
+        drifted = {}
+        for lot_id, stored_available, stored_occupied in db.session.query(
+                cls.id, cls.available_count, cls.occupied_count).all():
+            expected = actual.get(lot_id, (0, 0))
+            if (stored_available, stored_occupied) != expected:
+                drifted[lot_id] = {"stored": (stored_available, stored_occupied), "actual": expected}
+                if repair:
+                    db.session.execute(
+                        update(cls).where(cls.id == lot_id)
+                        .values(available_count=expected[0], occupied_count=expected[1])
+                        .execution_options(synchronize_session=False)
+                    )
+        return drifted
 
     def to_dict(self, include_spots=False):
         data = {
@@ -96,30 +165,83 @@ class ParkingLot(db.Model):
             "pin_code": self.pin_code,
             "price_per_hour": self.price_per_hour,
             "number_of_spots": self.number_of_spots,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "available_spots": self.available_count,
+            "occupied_spots": self.occupied_count,
+            "created_at": self.created_at,
         }
         if include_spots:
             data["spots"] = [s.to_dict() for s in self.spots]
         return data
 
-    def create_spots(self, commit=True, prefix="S"):
+    def create_spots(self, commit=False, prefix="S", limit=None):
         """
-        Create parking spots to match self.number_of_spots.
+        Create parking spots to match self.number_of_spots (at most `limit` of them).
         If spots exist, it will create the missing ones to reach the desired count.
-        Spot numbering scheme: {prefix}{1..n} e.g. S1, S2...
+        Spot numbering scheme: {prefix}{1..n} e.g. S1, S2... New spots are numbered
+        after the highest existing one, since a shrink can leave gaps (an occupied
+        spot is kept while lower-numbered ones are removed).
+        The spots go in with one executemany INSERT (no ORM object per spot); returns
+        their ids. The lot must already have an id (flushed). Nothing is committed
+        unless commit=True; callers normally wrap the request in datab.transaction().
         """
-        existing_count = len(self.spots)
-        to_create = self.number_of_spots - existing_count
-        created = []
-        for i in range(existing_count + 1, self.number_of_spots + 1):
-            spot_number = f"{prefix}{i}"
-            spot = ParkingSpot(lot_id=self.id, spot_number=spot_number)
-            db.session.add(spot)
-            created.append(spot)
-        if commit and to_create > 0:
+        suffix = cast(func.substr(ParkingSpot.spot_number, len(prefix) + 1), Integer)
+        existing_count, highest = db.session.execute(
+            select(func.count(ParkingSpot.id), func.max(suffix))
+            .where(ParkingSpot.lot_id == self.id)
+        ).one()
+        missing = self.number_of_spots - existing_count
+        if limit is not None:
+            missing = min(missing, limit)
+        first = (highest or 0) + 1
+        rows = [
+            {"lot_id": self.id, "spot_number": f"{prefix}{i}", "status": ParkingSpot.STATUS_AVAILABLE}
+            for i in range(first, first + missing)
+        ]
+        if not rows:
+            return []
+        spots = ParkingSpot.__table__
+        created = db.session.execute(
+            spots.insert()
+            .values(change_seq=ParkingSpot.next_change_seq(self.id))
+            .returning(spots.c.id),
+            rows,
+        ).scalars().all()
+        ParkingLot.adjust_counters(self.id, available=len(created))
+        if commit:
             db.session.commit()
         return created
 
+    def remove_available_spots(self, count):
+        """
+        Delete `count` available spots from the end (highest ids first) with one
+        set-based DELETE, plus their reservation history as the ORM cascade did.
+        Returns the removed ids; raises ValueError (caller rolls back) when fewer
+        than `count` spots are available. Counters and spot_seq_floor follow.
+        """
+        if count <= 0:
+            return []
+        targets = (
+            select(ParkingSpot.id)
+            .where(ParkingSpot.lot_id == self.id, ParkingSpot.status == ParkingSpot.STATUS_AVAILABLE)
+            .order_by(ParkingSpot.id.desc())
+            .limit(count)
+        )
+        db.session.execute(
+            delete(Reservation).where(Reservation.spot_id.in_(targets))
+            .execution_options(synchronize_session=False)
+        )
+        removed = db.session.execute(
+            delete(ParkingSpot).where(ParkingSpot.id.in_(targets))
+            .returning(ParkingSpot.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        if len(removed) < count:
+            raise ValueError("Cannot reduce spots: some spots are occupied")
+        ParkingLot.adjust_counters(self.id, available=-len(removed))
+        # delta tokens from before this can't report the deleted spots
+        self.spot_seq_floor = ParkingLot.spot_seq
+        return removed
+
 
 # -----------------------------
 # PARKING SPOT
@@ -137,6 +259,8 @@ class ParkingSpot(db.Model):
     status = db.Column(db.String(1), default=STATUS_AVAILABLE, nullable=False)  # A=Available, O=Occupied
     vehicle_number = db.Column(db.String(20), nullable=True)
     reserved_at = db.Column(db.DateTime, nullable=True)
+    # ParkingLot.spot_seq of the last status change (delta sync)
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -145,38 +269,57 @@ class ParkingSpot(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint("lot_id", "spot_number", name="uix_lot_spotnumber"),
+        # allocation / availability filters: WHERE lot_id = ? AND status = ? ORDER BY id
+        db.Index("ix_parking_spots_lot_status", "lot_id", "status"),
+        # delta sync: WHERE lot_id = ? AND change_seq > ?
+        db.Index("ix_parking_spots_lot_change_seq", "lot_id", "change_seq"),
+        # ids keep counting up from the shard's range start (sharding.py)
+        {"sqlite_autoincrement": True},
     )
 
     def __repr__(self):
         return f"<ParkingSpot {self.spot_number} ({self.status})>"
 
+    @staticmethod
+    def next_change_seq(lot_id):
+        """
+        SQL value for change_seq of a spot written in this transaction: its lot's
+        spot_seq + 1, which ParkingLot.adjust_counters then moves the lot to.
+        lot_id is a value or ParkingSpot.lot_id (correlated, for UPDATEs over many spots).
+        """
+        return select(ParkingLot.spot_seq + 1).where(ParkingLot.id == lot_id).scalar_subquery()
+
     def is_available(self):
         return self.status == self.STATUS_AVAILABLE
 
     def occupy(self, vehicle_number: str):
         """
         Mark spot as occupied and set vehicle_number & reserved_at.
+        Only mutates state; the caller's transaction commits.
         """
         if not self.is_available():
             raise ValueError("Spot is not available to occupy.")
         self.status = self.STATUS_OCCUPIED
         self.vehicle_number = vehicle_number
         self.reserved_at = datetime.utcnow()
+        self.change_seq = ParkingSpot.next_change_seq(self.lot_id)
         db.session.add(self)
-        db.session.commit()
+        ParkingLot.adjust_counters(self.lot_id, available=-1, occupied=1)
         return self
 
     def release(self):
         """
         Mark spot as available and clear vehicle info.
+        Only mutates state; the caller's transaction commits.
         """
         if self.is_available():
             raise ValueError("Spot is already available.")
         self.status = self.STATUS_AVAILABLE
         self.vehicle_number = None
         self.reserved_at = None
+        self.change_seq = ParkingSpot.next_change_seq(self.lot_id)
         db.session.add(self)
-        db.session.commit()
+        ParkingLot.adjust_counters(self.lot_id, available=1, occupied=-1)
         return self
 
     def to_dict(self, include_reservations=False):
@@ -186,7 +329,7 @@ class ParkingSpot(db.Model):
             "spot_number": self.spot_number,
             "status": self.status,
             "vehicle_number": self.vehicle_number,
-            "reserved_at": self.reserved_at.isoformat() if self.reserved_at else None,
+            "reserved_at": self.reserved_at,
         }
         if include_reservations:
             data["reservations"] = [r.to_dict() for r in self.reservations]
@@ -213,38 +356,75 @@ class Reservation(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # user history / reminders / monthly reports: WHERE user_id = ? [AND parking_timestamp >= ?]
+        db.Index("ix_reservations_user_parking", "user_id", "parking_timestamp"),
+        # active booking of a spot: WHERE spot_id = ? AND leaving_timestamp IS NULL
+        db.Index(
+            "ix_reservations_active_spot", "spot_id",
+            sqlite_where=text("leaving_timestamp IS NULL"),
+            postgresql_where=text("leaving_timestamp IS NULL"),
+        ),
+        # ids keep counting up from the shard's range start (sharding.py)
+        {"sqlite_autoincrement": True},
+    )
+
     def __repr__(self):
         return f"<Reservation id={self.id} user={self.user_id} spot={self.spot_id}>"
 
-    def calculate_cost(self, price_per_hour: float) -> float:
+    @staticmethod
+    def cost_between(parking_ts: datetime, leaving_ts: datetime, price_per_hour: float) -> float:
         """
-        Calculate parking cost using parking_timestamp and leaving_timestamp.
-        If leaving_timestamp is None, returns 0.0 (not finalized).
+        Parking cost for a stay from parking_ts to leaving_ts.
+        Used directly by set-based paths that work on rows instead of objects.
         """
-        if not self.leaving_timestamp:
+        if not leaving_ts:
             return 0.0
-        duration_seconds = (self.leaving_timestamp - self.parking_timestamp).total_seconds()
+        duration_seconds = (leaving_ts - parking_ts).total_seconds()
         duration_hours = duration_seconds / 3600.0
         cost = round(duration_hours * float(price_per_hour), 2)
         return cost
 
-    def finalize(self, leaving_ts: datetime = None, commit=True):
+    def calculate_cost(self, price_per_hour: float) -> float:
+        """
+        Calculate parking cost using parking_timestamp and leaving_timestamp.
+        If leaving_timestamp is None, returns 0.0 (not finalized).
+        """
+        return self.cost_between(self.parking_timestamp, self.leaving_timestamp, price_per_hour)
+
+    def finalize(self, leaving_ts: datetime = None, commit=False):
         """
         Finalize reservation: set leaving_timestamp, compute parking_cost using the lot's price.
-        Also releases the associated ParkingSpot.
+        Also releases the associated ParkingSpot in the same unit of work.
+        The row is claimed with a guarded UPDATE (... AND leaving_timestamp IS NULL):
+        if another request finalized it first, raises ValueError and changes nothing.
         """
         if self.leaving_timestamp:
             # already finalized
             return self
 
-        self.leaving_timestamp = leaving_ts or datetime.utcnow()
-
         # derive price_per_hour from linked spot -> lot
         if not self.spot or not self.spot.lot:
             raise RuntimeError("Cannot finalize reservation: spot or lot not found.")
 
-        price_per_hour = self.spot.lot.price_per_hour
-        self.parking_cost = self.calculate_cost(price_per_hour)
+        leaving_ts = leaving_ts or datetime.utcnow()
+        parking_cost = self.cost_between(self.parking_timestamp, leaving_ts, self.spot.lot.price_per_hour)
+        claimed = db.session.execute(
+            update(Reservation)
+            .where(Reservation.id == self.id, Reservation.leaving_timestamp.is_(None))
+            .values(leaving_timestamp=leaving_ts, parking_cost=parking_cost)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed != 1:
+            raise ValueError("Reservation already released")
+        set_committed_value(self, "leaving_timestamp", leaving_ts)
+        set_committed_value(self, "parking_cost", parking_cost)
+
+        record_rollup(
+            self.parking_timestamp.date(), self.spot.lot_id, self.user_id,
+            revenue=self.parking_cost,
+            hours=(self.leaving_timestamp - self.parking_timestamp).total_seconds() / 3600.0,
+        )
 
         # release the spot
         try:
@@ -253,7 +433,6 @@ class Reservation(db.Model):
             # If release raises (e.g., spot already available), continue to save reservation
             pass
 
-        db.session.add(self)
         if commit:
             db.session.commit()
         return self
@@ -273,14 +452,151 @@ class Reservation(db.Model):
             "cost": self.parking_cost,
 
             # Existing fields
-            "parking_timestamp": self.parking_timestamp.isoformat() if self.parking_timestamp else None,
-            "leaving_timestamp": self.leaving_timestamp.isoformat() if self.leaving_timestamp else None,
+            "parking_timestamp": self.parking_timestamp,
+            "leaving_timestamp": self.leaving_timestamp,
             "parking_cost": self.parking_cost,
             "vehicle_number": self.vehicle_number,
             "remarks": self.remarks,
         }
 
 
+# -----------------------------
+# ARCHIVED RESERVATIONS
+# -----------------------------
+# Reservations released more than ARCHIVE_AFTER_MONTHS ago, moved out of the hot
+# table by archive.py with their original ids. Lot and spot are copied in so the
+# history still reads after a lot is resized or deleted; no FKs for the same
+# reason as the rollups. Rows here are never updated.
+class ReservationArchive(db.Model):
+    __tablename__ = "reservations_archive"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    spot_id = db.Column(db.Integer, nullable=False)
+    lot_id = db.Column(db.Integer, nullable=False)
+    lot_name = db.Column(db.String(255), nullable=True)
+    spot_number = db.Column(db.String(50), nullable=True)
+
+    parking_timestamp = db.Column(db.DateTime, nullable=False)
+    leaving_timestamp = db.Column(db.DateTime, nullable=False)
+    parking_cost = db.Column(db.Float, nullable=True)
+    vehicle_number = db.Column(db.String(20), nullable=False)
+    remarks = db.Column(db.String(512), nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # user history and "does this range reach the archive" (archive.reaches_archive)
+        db.Index("ix_reservations_archive_user_parking", "user_id", "parking_timestamp"),
+        # the same for every user (admin bookings)
+        db.Index("ix_reservations_archive_parking", "parking_timestamp"),
+    )
+
+    def __repr__(self):
+        return f"<ReservationArchive id={self.id} user={self.user_id} lot={self.lot_id}>"
+
+
+# -----------------------------
+# REPORTING ROLLUPS
+# -----------------------------
+# Per-day totals maintained incrementally on reservation create / finalize, so
+# charts and monthly reports never rescan reservations. Everything is attributed
+# to the day the vehicle parked. No FKs: history outlives lots and users.
+class LotDailyStat(db.Model):
+    __tablename__ = "lot_daily_stats"
+
+    day = db.Column(db.Date, primary_key=True)
+    lot_id = db.Column(db.Integer, primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    parked_hours = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class UserDailyStat(db.Model):
+    __tablename__ = "user_daily_stats"
+
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    lot_id = db.Column(db.Integer, primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    parked_hours = db.Column(db.Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        # one user's totals (user dashboard chart): WHERE user_id = ?
+        db.Index("ix_user_daily_stats_user_day", "user_id", "day"),
+    )
+
+
+def _bump_rollup(model, keys, bookings, revenue, hours):
+    stmt = sqlite_insert(model.__table__).values(
+        **keys, bookings=bookings, revenue=revenue, parked_hours=hours
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={
+            "bookings": model.__table__.c.bookings + stmt.excluded.bookings,
+            "revenue": model.__table__.c.revenue + stmt.excluded.revenue,
+            "parked_hours": model.__table__.c.parked_hours + stmt.excluded.parked_hours,
+        },
+    )
+    db.session.execute(stmt)
+
+
+def record_rollup(day, lot_id, user_id, bookings=0, revenue=0.0, hours=0.0):
+    """
+    Add to the day/lot and day/user/lot rollups inside the caller's transaction
+    (bookings on reservation create, revenue and hours on finalize).
+    """
+    revenue = revenue or 0.0
+    _bump_rollup(LotDailyStat, {"day": day, "lot_id": lot_id}, bookings, revenue, hours)
+    _bump_rollup(UserDailyStat, {"day": day, "user_id": user_id, "lot_id": lot_id}, bookings, revenue, hours)
+
+
+# every booking ever made: the hot table plus what archive.py has moved out of it
+_RESERVATION_HISTORY = """
+    WITH history AS (
+        SELECT r.id, r.user_id, s.lot_id, r.parking_timestamp, r.leaving_timestamp, r.parking_cost
+        FROM reservations r JOIN parking_spots s ON s.id = r.spot_id
+        UNION ALL
+        SELECT id, user_id, lot_id, parking_timestamp, leaving_timestamp, parking_cost
+        FROM reservations_archive
+    )
+"""
+
+ROLLUP_REBUILD_SQL = [
+    "DELETE FROM lot_daily_stats",
+    "DELETE FROM user_daily_stats",
+    """
+    INSERT INTO lot_daily_stats (day, lot_id, bookings, revenue, parked_hours)
+    """ + _RESERVATION_HISTORY + """
+    SELECT date(h.parking_timestamp), h.lot_id, COUNT(h.id),
+           COALESCE(SUM(h.parking_cost), 0),
+           COALESCE(SUM((julianday(h.leaving_timestamp) - julianday(h.parking_timestamp)) * 24), 0)
+    FROM history h
+    GROUP BY date(h.parking_timestamp), h.lot_id
+    """,
+    """
+    INSERT INTO user_daily_stats (day, user_id, lot_id, bookings, revenue, parked_hours)
+    """ + _RESERVATION_HISTORY + """
+    SELECT date(h.parking_timestamp), h.user_id, h.lot_id, COUNT(h.id),
+           COALESCE(SUM(h.parking_cost), 0),
+           COALESCE(SUM((julianday(h.leaving_timestamp) - julianday(h.parking_timestamp)) * 24), 0)
+    FROM history h
+    GROUP BY date(h.parking_timestamp), h.user_id, h.lot_id
+    """,
+]
+
+
+def rebuild_rollups(conn=None):
+    """
+    Backfill / repair: recompute both rollup tables from reservation history
+    (hot and archived) with set-based INSERT ... SELECT. Caller commits (or
+    passes a connection inside engine.begin()).
+    """
+    conn = conn or db.session
+    for sql in ROLLUP_REBUILD_SQL:
+        conn.execute(text(sql))
+
 
 # -----------------------------
 # VALIDATIONS / HELPERS
@@ -0,0 +1,254 @@
+# backend/occupancy.py
+import base64
+import hashlib
+import logging
+import threading
+import time
+
+import redis
+from redis.exceptions import RedisError, WatchError
+from sqlalchemy import select
+
+from cache import layout_tag, tag_versions
+from datab import db
+from model import ParkingLot, ParkingSpot
+from events import broker
+
+log = logging.getLogger(__name__)
+
+# -----------------------------
+# LAYOUT + BITMAP FORMAT
+# -----------------------------
+# A lot's layout is its spots ordered by id; spot i of the layout is bit i of the
+# bitmap, most significant bit first within each byte (same order as Redis
+# SETBIT/GETBIT), 1 = occupied. The layout only changes on resize, so clients
+# fetch it once per layout_version and then poll just the bitmap.
+
+
+def layout_version(spot_ids):
+    raw = ",".join(str(i) for i in spot_ids).encode()
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def load_layout(lot_id):
+    """[(spot_id, spot_number, status)] ordered by id (Core select, no ORM objects); None if no such lot."""
+    if db.session.execute(select(ParkingLot.id).where(ParkingLot.id == lot_id)).first() is None:
+        return None
+    return db.session.execute(
+        select(ParkingSpot.id, ParkingSpot.spot_number, ParkingSpot.status)
+        .where(ParkingSpot.lot_id == lot_id)
+        .order_by(ParkingSpot.id.asc())
+    ).all()
+
+
+def pack(statuses):
+    bits = bytearray((len(statuses) + 7) // 8)
+    for i, status in enumerate(statuses):
+        if status == ParkingSpot.STATUS_OCCUPIED:
+            bits[i >> 3] |= 0x80 >> (i & 7)
+    return bits
+
+
+class LotBitmap:
+    def __init__(self, version, index, bits, built_at, layout_tag_version=None):
+        self.version = version
+        self.index = index          # spot_id -> bit position
+        self.bits = bits            # bytearray
+        self.built_at = built_at
+        self.layout_tag_version = layout_tag_version    # cache.layout_tag version read before the build
+
+
+class OccupancyBitmaps:
+    """
+    Per-lot occupancy bitmaps kept up to date from the occupancy events, so
+    reading a lot's occupancy is a dict (or Redis GET) lookup.
+
+    OCCUPANCY_BITMAP_BACKEND = "memory" keeps them in this process and applies
+    every delivered event (use EVENTS_BACKEND = "redis" with several workers);
+    "redis" keeps one shared copy, updated once by the worker making the change.
+    A bitmap is rebuilt from the DB when missing, after a resize, and at least
+    every OCCUPANCY_BITMAP_TTL seconds as a safety net.
+
+    Every event and drop bumps the lot's generation; a build only stores its
+    bitmap if the generation didn't move while it read the DB, otherwise an
+    event landing mid-build would be lost until the TTL.
+
+    Spots added by another process without an event reaching this one (the
+    provisioning task under the memory event backend) bump cache.layout_tag;
+    a memory bitmap built under an older version of that tag counts as missing.
+    """
+    def __init__(self):
+        self.redis = None
+        self.ttl = 300
+        self._lots = {}
+        self._generations = {}      # lot_id -> events seen (memory backend)
+        self._lock = threading.Lock()
+
+    def init_app(self, app, redis_client=None):
+        self.ttl = app.config.get("OCCUPANCY_BITMAP_TTL", 300)
+        if app.config.get("OCCUPANCY_BITMAP_BACKEND", "memory") == "redis":
+            self.redis = redis_client or redis.Redis.from_url(app.config["OCCUPANCY_BITMAP_REDIS_URL"])
+            broker.on_publish.append(self.apply)
+        else:
+            broker.on_deliver.append(self.apply)
+
+    # keys (redis backend) ----------------------------------------
+    @staticmethod
+    def _keys(lot_id):
+        return f"occupancy:bits:{lot_id}", f"occupancy:index:{lot_id}", f"occupancy:version:{lot_id}"
+
+    @staticmethod
+    def _generation_key(lot_id):
+        return f"occupancy:generation:{lot_id}"
+
+    @staticmethod
+    def _layout_tag_version(lot_id):
+        return tag_versions([layout_tag(lot_id)])[0]
+
+    def _generation(self, lot_id):
+        if self.redis is not None:
+            return self.redis.get(self._generation_key(lot_id))
+        with self._lock:
+            return self._generations.get(lot_id, 0)
+
+    # build ---------------------------------------------------
+    def build(self, lot_id):
+        """
+        Read the lot from the DB and cache its bitmap, unless an event for the
+        lot arrived meanwhile (then the bitmap is returned but not kept).
+        """
+        generation = self._generation(lot_id)
+        layout_tag_version = None if self.redis is not None else self._layout_tag_version(lot_id)
+        rows = load_layout(lot_id)
+        if rows is None:
+            self.drop(lot_id)
+            return None
+        bitmap = LotBitmap(
+            layout_version([r.id for r in rows]),
+            {r.id: i for i, r in enumerate(rows)},
+            pack([r.status for r in rows]),
+            time.monotonic(),
+            layout_tag_version,
+        )
+        if self.redis is not None:
+            self._store_redis(lot_id, bitmap, generation)
+        else:
+            with self._lock:
+                if self._generations.get(lot_id, 0) == generation:
+                    self._lots[lot_id] = bitmap
+        return bitmap
+
+    def _store_redis(self, lot_id, bitmap, generation):
+        bits_key, index_key, version_key = self._keys(lot_id)
+        generation_key = self._generation_key(lot_id)
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(generation_key)
+                if pipe.get(generation_key) != generation:
+                    return
+                pipe.multi()
+                pipe.delete(index_key)
+                pipe.set(bits_key, bytes(bitmap.bits), ex=self.ttl)
+                if bitmap.index:
+                    pipe.hset(index_key, mapping=bitmap.index)
+                pipe.expire(index_key, self.ttl)
+                pipe.set(version_key, bitmap.version, ex=self.ttl)
+                pipe.execute()
+            except WatchError:
+                pass
+
+    def drop(self, lot_id):
+        if self.redis is not None:
+            pipe = self.redis.pipeline()
+            pipe.incr(self._generation_key(lot_id))
+            pipe.delete(*self._keys(lot_id))
+            pipe.execute()
+        else:
+            with self._lock:
+                self._generations[lot_id] = self._generations.get(lot_id, 0) + 1
+                self._lots.pop(lot_id, None)
+
+    # read ----------------------------------------------------
+    def _cached(self, lot_id):
+        if self.redis is not None:
+            bits_key, _, version_key = self._keys(lot_id)
+            bits, version = self.redis.mget(bits_key, version_key)
+            if bits is not None and version is not None:
+                return version.decode(), bytes(bits)
+            return None
+        bitmap = self._lots.get(lot_id)
+        if (bitmap is not None and time.monotonic() - bitmap.built_at < self.ttl
+                and bitmap.layout_tag_version == self._layout_tag_version(lot_id)):
+            return bitmap.version, bytes(bitmap.bits)
+        return None
+
+    def snapshot(self, lot_id):
+        """(layout_version, bitmap bytes) or None if the lot doesn't exist."""
+        try:
+            cached = self._cached(lot_id)
+            if cached is not None:
+                return cached
+            bitmap = self.build(lot_id)
+        except RedisError as e:
+            log.warning("Occupancy bitmap unavailable in Redis, reading the DB: %s", e)
+            rows = load_layout(lot_id)
+            if rows is None:
+                return None
+            return layout_version([r.id for r in rows]), bytes(pack([r.status for r in rows]))
+        return (bitmap.version, bytes(bitmap.bits)) if bitmap else None
+
+    # updates -------------------------------------------------
+    def apply(self, event):
+        """Occupancy event hook (events.publish_spots & co)."""
+        lot_id = event.get("lot_id")
+        if event["type"] != "spots":
+            # spots removed / lot deleted: layout changed, rebuild on next read
+            self.drop(lot_id)
+            return
+        occupied = event["status"] == ParkingSpot.STATUS_OCCUPIED
+        if self.redis is not None:
+            self._apply_redis(lot_id, event["spot_ids"], occupied)
+            return
+        with self._lock:
+            self._generations[lot_id] = self._generations.get(lot_id, 0) + 1
+            bitmap = self._lots.get(lot_id)
+            if bitmap is None:
+                return
+            for spot_id in event["spot_ids"]:
+                pos = bitmap.index.get(spot_id)
+                if pos is None:
+                    # a spot this bitmap doesn't know (lot grew): rebuild on next read
+                    self._lots.pop(lot_id, None)
+                    return
+                if occupied:
+                    bitmap.bits[pos >> 3] |= 0x80 >> (pos & 7)
+                else:
+                    bitmap.bits[pos >> 3] &= ~(0x80 >> (pos & 7)) & 0xFF
+
+    def _apply_redis(self, lot_id, spot_ids, occupied):
+        bits_key, index_key, _ = self._keys(lot_id)
+        try:
+            pipe = self.redis.pipeline()
+            pipe.incr(self._generation_key(lot_id))
+            pipe.hmget(index_key, spot_ids)
+            _, positions = pipe.execute()
+            if any(p is None for p in positions):
+                self.drop(lot_id)
+                return
+            pipe = self.redis.pipeline()
+            for pos in positions:
+                pipe.setbit(bits_key, int(pos), 1 if occupied else 0)
+            pipe.execute()
+        except RedisError as e:
+            log.warning("Occupancy bitmap update failed, dropping lot %s: %s", lot_id, e)
+            try:
+                self.drop(lot_id)
+            except RedisError:
+                pass
+
+
+bitmaps = OccupancyBitmaps()
+
+
+def encode_bitmap(bits):
+    return base64.b64encode(bits).decode()
@@ -0,0 +1,30 @@
+# backend/query_counter.py
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.sql_query_count = g.get("sql_query_count", 0) + 1
+
+
+def query_count():
+    """Number of SQL statements executed so far in the current request."""
+    return g.get("sql_query_count", 0)
+
+
+def init_app(app):
+    """
+    Count SQL statements per request (every engine) and report them in the
+    X-Query-Count response header. Enabled with SQL_QUERY_COUNTER or debug mode.
+    """
+    if not (app.config.get("SQL_QUERY_COUNTER") or app.debug):
+        return
+    if not event.contains(Engine, "before_cursor_execute", _count_statement):
+        event.listen(Engine, "before_cursor_execute", _count_statement)
+
+    @app.after_request
+    def add_query_count_header(response):
+        response.headers["X-Query-Count"] = str(query_count())
+        return response
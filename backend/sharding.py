@@ -0,0 +1,179 @@
+# backend/sharding.py
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from flask import current_app, g, request
+from sqlalchemy import text
+
+from datab import db, use_replica, SHARD_BIND_PREFIX
+
+# -----------------------------
+# SHARDING BY LOT
+# -----------------------------
+# Shard 0 is the primary database: users, roles and every lot created before
+# sharding was turned on. SHARD_URIS adds shards 1..n. A lot lives on one shard
+# together with its spots, reservations and rollups (datab.SHARDED_TABLES), and
+# RoutingSession.get_bind sends those tables to the shard picked for the request.
+#
+# Shard k hands out ids from k * SHARD_ID_SPAN upwards, so lot / spot / booking
+# ids stay unique across shards and an id alone says where its row lives.
+
+SHARD_ID_SPAN = 10 ** 12
+ID_TABLES = ("parking_lots", "parking_spots", "reservations")
+# URL arguments that name a lot-scoped row (see route_request)
+SHARD_VIEW_ARGS = ("lot_id", "spot_id", "booking_id")
+
+_pool = None
+
+
+def shard_bind(shard):
+    return f"{SHARD_BIND_PREFIX}{shard}"
+
+
+def configure(app):
+    """Register a bind per extra shard; call before db.init_app()."""
+    uris = app.config.get("SHARD_URIS") or []
+    if uris:
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        for shard, uri in enumerate(uris, 1):
+            binds[shard_bind(shard)] = uri
+        app.config["SQLALCHEMY_BINDS"] = binds
+
+
+def shard_count():
+    return 1 + len(current_app.config.get("SHARD_URIS") or [])
+
+
+def enabled():
+    return shard_count() > 1
+
+
+def shard_ids():
+    return range(shard_count())
+
+
+def shard_of(object_id):
+    """Shard holding a lot / spot / reservation id; None if no shard has that range."""
+    try:
+        shard = int(object_id) // SHARD_ID_SPAN
+    except (TypeError, ValueError):
+        return None
+    return shard if 0 <= shard < shard_count() else None
+
+
+def choose_shard(pin_code):
+    """
+    Home shard for a new lot: the longest matching SHARD_PIN_CODE_PREFIXES entry
+    (region -> shard), otherwise a stable hash of the pin code.
+    """
+    pin_code = str(pin_code or "")
+    prefixes = current_app.config.get("SHARD_PIN_CODE_PREFIXES") or {}
+    for prefix in sorted(prefixes, key=len, reverse=True):
+        if pin_code.startswith(prefix) and prefixes[prefix] < shard_count():
+            return prefixes[prefix]
+    return zlib.crc32(pin_code.encode()) % shard_count()
+
+
+# -----------------------------
+# ROUTING
+# -----------------------------
+def use_shard(shard):
+    """Send this request's lot-scoped statements to `shard` (0 / None = primary)."""
+    g.shard = shard
+
+
+def use_shard_of(object_id):
+    """use_shard() for the shard of an id; returns it (None if the id can't exist)."""
+    shard = shard_of(object_id)
+    use_shard(shard)
+    return shard
+
+
+@contextmanager
+def on_shard(shard):
+    previous = g.get("shard")
+    g.shard = shard
+    try:
+        yield
+    finally:
+        g.shard = previous
+
+
+def route_request():
+    """before_request: lot / spot / booking ids in the URL pick the shard."""
+    for name in SHARD_VIEW_ARGS:
+        value = (request.view_args or {}).get(name)
+        if value is not None:
+            use_shard_of(value)
+            return
+
+
+# -----------------------------
+# SCATTER / GATHER
+# -----------------------------
+def scatter(fn, *args, **kwargs):
+    """
+    Run fn(*args, **kwargs) on every shard in parallel (a thread, app context and
+    session per shard) and return the results in shard order. fn must not touch
+    `request`: build statements first and pass them in.
+    Without extra shards fn just runs here.
+    """
+    if not enabled():
+        return [fn(*args, **kwargs)]
+    app = current_app._get_current_object()
+    replica = g.get("use_replica", False)
+
+    def run(shard):
+        with app.app_context():
+            use_shard(shard)
+            if replica:
+                use_replica()
+            return fn(*args, **kwargs)
+
+    return list(_pool.map(run, shard_ids()))
+
+
+def for_each_shard(fn, *args, **kwargs):
+    """fn on every shard one after the other, in this context (tasks, CLI)."""
+    results = []
+    for shard in shard_ids():
+        with on_shard(shard):
+            results.append(fn(*args, **kwargs))
+    return results
+
+
+# -----------------------------
+# SETUP
+# -----------------------------
+def create_shards():
+    """Schema and migrations on every extra shard, and its id ranges."""
+    from migrations import run_migrations
+
+    for shard in list(shard_ids())[1:]:
+        engine = db.engines[shard_bind(shard)]
+        db.metadata.create_all(engine)
+        run_migrations(engine)
+        floor = shard * SHARD_ID_SPAN
+        with engine.begin() as conn:
+            for table in ID_TABLES:
+                seq = conn.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :t"), {"t": table}).scalar()
+                if seq is None:
+                    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:t, :s)"),
+                                 {"t": table, "s": floor})
+                elif seq < floor:
+                    conn.execute(text("UPDATE sqlite_sequence SET seq = :s WHERE name = :t"),
+                                 {"t": table, "s": floor})
+
+
+def init_app(app):
+    """Shard schemas, request routing and the scatter pool; call after db.init_app()."""
+    global _pool
+    with app.app_context():
+        if not enabled():
+            return
+        create_shards()
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=app.config.get("SHARD_SCATTER_WORKERS", 8),
+                                   thread_name_prefix="shard-scatter")
+    app.before_request(route_request)
@@ -0,0 +1,173 @@
+# backend/spot_pool.py
+import logging
+
+import redis
+from redis.exceptions import RedisError
+
+from datab import db
+from model import ParkingLot, ParkingSpot
+from sharding import for_each_shard, on_shard, shard_of
+
+log = logging.getLogger(__name__)
+
+SEEDED_KEY = "spot_pool:seeded"
+
+# Pops up to ARGV[1] of the lowest spot ids from the lot's free pool.
+# Returns nil when the lot was never seeded so the caller can fall back to the DB.
+POP_SCRIPT = """
+if redis.call('SISMEMBER', KEYS[2], ARGV[2]) == 0 then
+    return false
+end
+local ids = redis.call('ZRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #ids > 0 then
+    redis.call('ZREM', KEYS[1], unpack(ids))
+end
+return ids
+"""
+
+
+def pool_key(lot_id):
+    return f"spot_pool:lot:{lot_id}"
+
+
+class SpotPool:
+    """
+    Optional per-lot pool of free spot ids kept in a Redis sorted set
+    (score = spot id, so pops keep the "lowest id first" rule).
+    The DB stays the source of truth: a popped id is still claimed with the
+    guarded UPDATE in allocation.claim_spot, and reconcile() repairs drift.
+    """
+    def __init__(self):
+        self.redis = None
+        self._pop = None
+
+    def init_app(self, app, redis_client=None):
+        if not app.config.get("SPOT_POOL_ENABLED"):
+            return
+        self.redis = redis_client or redis.Redis.from_url(app.config["SPOT_POOL_REDIS_URL"])
+        self._pop = self.redis.register_script(POP_SCRIPT)
+        with app.app_context():
+            try:
+                self.seed()
+            except RedisError as e:
+                log.warning("Spot pool disabled, Redis unavailable: %s", e)
+                self.redis = None
+
+    @property
+    def enabled(self):
+        return self.redis is not None
+
+    def _free_spot_ids(self, lot_id):
+        with on_shard(shard_of(lot_id)):
+            rows = db.session.query(ParkingSpot.id).filter_by(
+                lot_id=lot_id, status=ParkingSpot.STATUS_AVAILABLE
+            ).all()
+        return {r[0] for r in rows}
+
+    @staticmethod
+    def _all_lot_ids():
+        shards = for_each_shard(lambda: [r[0] for r in db.session.query(ParkingLot.id).all()])
+        return [lot_id for ids in shards for lot_id in ids]
+
+    def seed(self, lot_ids=None):
+        """
+        Rebuild the pools of the given lots (all lots if None) from ParkingSpot.
+        """
+        if not self.enabled:
+            return
+        if lot_ids is None:
+            lot_ids = self._all_lot_ids()
+        for lot_id in lot_ids:
+            free = self._free_spot_ids(lot_id)
+            pipe = self.redis.pipeline()
+            pipe.delete(pool_key(lot_id))
+            if free:
+                pipe.zadd(pool_key(lot_id), {str(i): i for i in free})
+            pipe.sadd(SEEDED_KEY, lot_id)
+            pipe.execute()
+
+    def seed_lot(self, lot_id):
+        """Seed one lot after it was created; Redis errors only disable the fast path."""
+        try:
+            self.seed([lot_id])
+        except RedisError as e:
+            log.warning("Spot pool seed failed for lot %s: %s", lot_id, e)
+
+    def pop(self, lot_id, count=1):
+        """
+        Atomically take up to `count` free spot ids from the lot's pool.
+        Returns None when the pool can't answer (not seeded / Redis down).
+        """
+        if not self.enabled:
+            return None
+        try:
+            ids = self._pop(keys=[pool_key(lot_id), SEEDED_KEY], args=[count, lot_id])
+        except RedisError as e:
+            log.warning("Spot pool pop failed for lot %s: %s", lot_id, e)
+            return None
+        if ids is None:
+            return None
+        return [int(i) for i in ids]
+
+    def push(self, lot_id, spot_ids):
+        """Return spots to the lot's pool (release / new spots)."""
+        if not self.enabled or not spot_ids:
+            return
+        try:
+            self.redis.zadd(pool_key(lot_id), {str(i): i for i in spot_ids})
+        except RedisError as e:
+            log.warning("Spot pool push failed for lot %s: %s", lot_id, e)
+
+    def discard(self, lot_id, spot_ids):
+        """Remove spots from the lot's pool (deleted spots)."""
+        if not self.enabled or not spot_ids:
+            return
+        try:
+            self.redis.zrem(pool_key(lot_id), *[str(i) for i in spot_ids])
+        except RedisError as e:
+            log.warning("Spot pool discard failed for lot %s: %s", lot_id, e)
+
+    def drop_lot(self, lot_id):
+        if not self.enabled:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            pipe.delete(pool_key(lot_id))
+            pipe.srem(SEEDED_KEY, lot_id)
+            pipe.execute()
+        except RedisError as e:
+            log.warning("Spot pool drop failed for lot %s: %s", lot_id, e)
+
+    def reconcile(self):
+        """
+        Compare every lot's pool with the DB and repair drift.
+        Returns {lot_id: {"added": n, "removed": n}} for lots that were fixed.
+        """
+        if not self.enabled:
+            return {}
+        repaired = {}
+        lot_ids = set(self._all_lot_ids())
+
+        # pools of lots that no longer exist
+        for member in self.redis.smembers(SEEDED_KEY):
+            if int(member) not in lot_ids:
+                self.drop_lot(int(member))
+
+        for lot_id in lot_ids:
+            free = self._free_spot_ids(lot_id)
+            pooled = {int(i) for i in self.redis.zrange(pool_key(lot_id), 0, -1)}
+            missing = free - pooled
+            extra = pooled - free
+            pipe = self.redis.pipeline()
+            if missing:
+                pipe.zadd(pool_key(lot_id), {str(i): i for i in missing})
+            if extra:
+                pipe.zrem(pool_key(lot_id), *[str(i) for i in extra])
+            pipe.sadd(SEEDED_KEY, lot_id)
+            pipe.execute()
+            if missing or extra:
+                repaired[lot_id] = {"added": len(missing), "removed": len(extra)}
+        return repaired
+
+
+spot_pool = SpotPool()
@@ -0,0 +1,122 @@
+# backend/storage.py
+import logging
+import os
+import sqlite3
+
+from sqlalchemy import event, exc
+
+from datab import db, REPLICA_BIND, SHARD_BIND_PREFIX
+
+log = logging.getLogger(__name__)
+
+# -----------------------------
+# STORAGE PROFILE
+# -----------------------------
+# SQLite tuning applied to every pooled connection (SQLITE_PRAGMAS), and an
+# optional read replica: READ_REPLICA_URI is either the primary file itself (a
+# separate read-only pool; WAL readers never wait for the writer) or a snapshot
+# file that refresh_snapshot() recopies from the primary on a schedule.
+
+
+def configure(app):
+    """Register the replica bind; call before db.init_app()."""
+    replica_uri = app.config.get("READ_REPLICA_URI")
+    if replica_uri:
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        binds[REPLICA_BIND] = replica_uri
+        app.config["SQLALCHEMY_BINDS"] = binds
+
+
+def _apply_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def _snapshot_id(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _watch_snapshot(engine, path):
+    """Pooled replica connections opened before the last refresh_snapshot() are reopened."""
+    @event.listens_for(engine, "connect")
+    def remember_snapshot(dbapi_connection, connection_record):
+        connection_record.info["snapshot"] = _snapshot_id(path)
+
+    @event.listens_for(engine, "checkout")
+    def check_snapshot(dbapi_connection, connection_record, connection_proxy):
+        if connection_record.info.get("snapshot") != _snapshot_id(path):
+            raise exc.DisconnectionError("read replica snapshot was refreshed")
+
+
+def init_app(app):
+    """
+    Pragmas for the primary, shard (sharding.py) and replica engines; call after
+    db.init_app() and before anything connects to them.
+    """
+    if not app.config.get("SQLALCHEMY_DATABASE_URI", "").startswith("sqlite"):
+        return
+    pragmas = dict(app.config.get("SQLITE_PRAGMAS") or {})
+    with app.app_context():
+        primary = db.engines[None]
+        event.listen(primary, "connect", _apply_pragmas(pragmas))
+        # shards are written like the primary: same profile
+        for key, engine in db.engines.items():
+            if isinstance(key, str) and key.startswith(SHARD_BIND_PREFIX) and engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", _apply_pragmas(pragmas))
+
+        replica = db.engines.get(REPLICA_BIND)
+        if replica is None:
+            return
+        # journal_mode belongs to the file (set by the primary); the replica only reads
+        replica_pragmas = {k: v for k, v in pragmas.items() if k != "journal_mode"}
+        replica_pragmas["query_only"] = "ON"
+        event.listen(replica, "connect", _apply_pragmas(replica_pragmas))
+        if replica.url.database != primary.url.database:
+            _watch_snapshot(replica, replica.url.database)
+
+
+# -----------------------------
+# SNAPSHOT REFRESH
+# -----------------------------
+def refresh_snapshot():
+    """
+    Copy the primary into the replica snapshot file (sqlite3 online backup, a
+    consistent copy taken while writes carry on) and swap it in atomically.
+    Returns the replica path, or None when there is no separate snapshot file.
+    """
+    primary = db.engines[None].url.database
+    replica_engine = db.engines.get(REPLICA_BIND)
+    if replica_engine is None or replica_engine.url.database == primary:
+        return None
+    replica = replica_engine.url.database
+    tmp = f"{replica}.tmp"
+
+    source = sqlite3.connect(primary)
+    target = sqlite3.connect(tmp)
+    try:
+        source.backup(target)
+        # readers open it read-only: a rollback journal needs no -wal / -shm files
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp, replica)
+    log.info("Read replica snapshot refreshed: %s", replica)
+    return replica
+
+
+def ensure_snapshot():
+    """Take the first snapshot at startup if the replica file doesn't exist yet."""
+    replica_engine = db.engines.get(REPLICA_BIND)
+    if replica_engine is not None and not os.path.exists(replica_engine.url.database):
+        refresh_snapshot()
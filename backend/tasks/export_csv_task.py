@@ -2,9 +2,13 @@
 import csv
 import os
 from datetime import datetime
+from sqlalchemy import select, union_all
 from celery_app import celery
 from app import create_app
-from model import User, Reservation
+from datab import db
+from model import User, ParkingSpot, Reservation, ReservationArchive
+from archive import reaches_archive
+from sharding import shard_ids, on_shard
 from celery_app import celery
 
 flask_app = create_app()
@@ -12,14 +16,46 @@ flask_app = create_app()
 EXPORT_DIR = os.path.join(os.getcwd(), "exports")
 os.makedirs(EXPORT_DIR, exist_ok=True)
 
+
+def export_rows(user_id, start=None, end=None):
+    """
+    The user's bookings on the current shard with parking_timestamp in [start, end),
+    oldest first. Archived bookings are read only if the range reaches them.
+    """
+    def in_range(query, table):
+        if start:
+            query = query.where(table.parking_timestamp >= start)
+        if end:
+            query = query.where(table.parking_timestamp < end)
+        return query.where(table.user_id == user_id)
+
+    hot = in_range(select(
+        Reservation.id, Reservation.spot_id, ParkingSpot.lot_id,
+        Reservation.parking_timestamp, Reservation.leaving_timestamp,
+        Reservation.parking_cost, Reservation.vehicle_number, Reservation.remarks,
+    ).outerjoin(ParkingSpot, Reservation.spot_id == ParkingSpot.id), Reservation)
+    if not reaches_archive(user_id, start, end):
+        return db.session.execute(hot.order_by(Reservation.parking_timestamp, Reservation.id))
+
+    archived = in_range(select(
+        ReservationArchive.id, ReservationArchive.spot_id, ReservationArchive.lot_id,
+        ReservationArchive.parking_timestamp, ReservationArchive.leaving_timestamp,
+        ReservationArchive.parking_cost, ReservationArchive.vehicle_number, ReservationArchive.remarks,
+    ), ReservationArchive)
+    bookings = union_all(hot, archived).subquery("bookings")
+    return db.session.execute(select(bookings).order_by(bookings.c.parking_timestamp, bookings.c.id))
+
+
 @celery.task()
-def export_user_csv(user_id):
+def export_user_csv(user_id, start=None, end=None):
+    """start / end: optional ISO dates bounding parking_timestamp (end exclusive)."""
     with flask_app.app_context():
         user = User.query.get(user_id)
         if not user:
             return {"status": "error", "message": "User not found"}
+        start = datetime.fromisoformat(start) if start else None
+        end = datetime.fromisoformat(end) if end else None
 
-        reservations = Reservation.query.filter_by(user_id=user.id).all()
         filename = f"user_{user.id}_parking_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.csv"
         filepath = os.path.join(EXPORT_DIR, filename)
 
@@ -30,16 +66,19 @@ def export_user_csv(user_id):
                 "parking_timestamp", "leaving_timestamp",
                 "parking_cost", "vehicle_number", "remarks"
             ])
-            for r in reservations:
-                writer.writerow([
-                    r.id,
-                    r.spot_id,
-                    r.spot.lot_id if r.spot else "",
-                    r.parking_timestamp.isoformat() if r.parking_timestamp else "",
-                    r.leaving_timestamp.isoformat() if r.leaving_timestamp else "",
-                    r.parking_cost,
-                    r.vehicle_number,
-                    r.remarks or ""
-                ])
+            # the user's bookings on every shard
+            for shard in shard_ids():
+                with on_shard(shard):
+                    for r in export_rows(user.id, start, end):
+                        writer.writerow([
+                            r.id,
+                            r.spot_id,
+                            r.lot_id if r.lot_id is not None else "",
+                            r.parking_timestamp.isoformat() if r.parking_timestamp else "",
+                            r.leaving_timestamp.isoformat() if r.leaving_timestamp else "",
+                            r.parking_cost,
+                            r.vehicle_number,
+                            r.remarks or ""
+                        ])
 
         return {"status": "success", "file_path": filepath, "file_name": filename}
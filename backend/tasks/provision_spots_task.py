@@ -0,0 +1,41 @@
+# backend/tasks/provision_spots_task.py
+from celery_app import celery, flask_app
+from datab import db, transaction
+from model import ParkingLot, ParkingSpot
+from cache import invalidate, layout_tag, lot_tag, LOTS, CHARTS, LOT_INFO
+from spot_pool import spot_pool
+from events import publish_spots
+from sharding import use_shard_of
+
+
+@celery.task(bind=True)
+def provision_lot_spots(self, lot_id):
+    """
+    Create the missing spots of a large lot (ParkingLot.number_of_spots is already
+    set) in chunks of SPOT_PROVISION_CHUNK, one transaction each, so bookings on
+    other lots aren't held up for the whole run. Reports PROGRESS {done, total}.
+    Safe to rerun: create_spots only adds what is still missing.
+
+    The spot events are published from the Celery worker: SSE clients only see
+    them with EVENTS_BACKEND = "redis". Occupancy bitmaps pick the new spots up
+    either way, through the lot's layout tag.
+    """
+    with flask_app.app_context():
+        use_shard_of(lot_id)
+        lot = db.session.get(ParkingLot, lot_id)
+        if not lot:
+            return {"status": "error", "message": "Parking lot not found"}
+        chunk = flask_app.config.get("SPOT_PROVISION_CHUNK", 5000)
+        total = max(lot.number_of_spots - ParkingSpot.query.filter_by(lot_id=lot_id).count(), 0)
+        done = 0
+        while True:
+            with transaction():
+                created = lot.create_spots(limit=chunk)
+            if not created:
+                break
+            spot_pool.push(lot_id, created)
+            publish_spots(lot_id, created, ParkingSpot.STATUS_AVAILABLE)
+            done += len(created)
+            self.update_state(state="PROGRESS", meta={"lot_id": lot_id, "done": done, "total": total})
+            invalidate(lot_tag(lot_id), layout_tag(lot_id), LOTS, CHARTS, LOT_INFO)
+        return {"status": "success", "lot_id": lot_id, "created": done}
@@ -0,0 +1,118 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+import pytest
+from flask import Flask
+from flask_restful import Api
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from datab import db  # noqa: E402
+from model import ParkingLot, User  # noqa: E402
+from cache import tiered  # noqa: E402
+from cntrlrs import responses  # noqa: E402
+import query_counter  # noqa: E402
+import sharding  # noqa: E402
+import storage  # noqa: E402
+
+
+def build_app(tmp_path, shards=0):
+    """
+    Bare app (models, pragmas, no routes; add them with api_client) on fresh
+    SQLite files: the primary plus `shards` extra shard files. Caching is
+    in-process and X-Query-Count is on.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config["SHARD_URIS"] = [f"sqlite:///{tmp_path / f'shard{n}.db'}" for n in range(1, shards + 1)]
+    app.config["CACHE_TYPE"] = "SimpleCache"
+    app.config["CACHE_OPTIONS"] = {}
+    app.config["SQL_QUERY_COUNTER"] = True
+    sharding.configure(app)
+    db.init_app(app)
+    storage.init_app(app)
+    tiered.init_app(app)
+    query_counter.init_app(app)
+    with app.app_context():
+        db.create_all(bind_key=None)
+    sharding.init_app(app)
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = build_app(tmp_path)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def sharded_app(tmp_path):
+    """Primary (shard 0) plus two shard files."""
+    app = build_app(tmp_path, shards=2)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def api_client():
+    """api_client(app, {path: Resource}) -> test client with those routes under /api."""
+    def make(app, routes):
+        api = Api(app, prefix="/api")
+        responses.init_app(app, api)
+        for path, resource in routes.items():
+            api.add_resource(resource, path)
+        return app.test_client()
+    return make
+
+
+@pytest.fixture
+def make_lot(app):
+    """make_lot(spots) -> lot id, with its spots created."""
+    def make(spots, name="Test Lot"):
+        lot = ParkingLot(prime_location_name=name, address="addr", pin_code="400001",
+                         price_per_hour=20.0, number_of_spots=spots)
+        db.session.add(lot)
+        db.session.flush()
+        lot.create_spots()
+        db.session.commit()
+        return lot.id
+    return make
+
+
+@pytest.fixture
+def user(app):
+    user = User(username="tester", email="tester@example.com", password="x")
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+@pytest.fixture
+def concurrent_write(app):
+    """
+    concurrent_write(prefix, sql, params): run `sql` once, right before the first
+    statement starting with `prefix`, as another worker's write landing between
+    this transaction's read and its guarded UPDATE.
+    """
+    hooks = []
+
+    def arm(prefix, sql, params=()):
+        def before(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().startswith(prefix) and not fired:
+                fired.append(statement)
+                cursor.connection.execute(sql, params)
+        fired = []
+        event.listen(db.engine, "before_cursor_execute", before)
+        hooks.append(before)
+        return fired
+
+    yield arm
+    for before in hooks:
+        event.remove(db.engine, "before_cursor_execute", before)
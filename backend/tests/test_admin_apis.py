@@ -0,0 +1,58 @@
+# backend/tests/test_admin_apis.py
+from datetime import datetime, timedelta
+
+import pytest
+from flask import g
+
+from allocation import claim_spots
+from cntrlrs.admin_apis import AdminAllBookingsAPI
+from cntrlrs.booking_apis import release_bookings
+from datab import db, transaction
+from model import Reservation, User
+
+
+@pytest.fixture
+def client(app, api_client):
+    return api_client(app, {"/admin/bookings": AdminAllBookingsAPI})
+
+
+def add_bookings(lot_ids, user_ids, count, start):
+    """`count` bookings spread over the lots and users, every other one released."""
+    booking_ids = []
+    for n in range(count):
+        lot_id, user_id = lot_ids[n % len(lot_ids)], user_ids[n % len(user_ids)]
+        with transaction():
+            (spot_id,) = claim_spots(lot_id, [f"V{n}"])
+            reservation = Reservation(user_id=user_id, spot_id=spot_id, vehicle_number=f"V{n}",
+                                      parking_timestamp=start + timedelta(minutes=n))
+            db.session.add(reservation)
+        booking_ids.append(reservation.id)
+    release_bookings(booking_ids[::2], start + timedelta(hours=3))
+    return booking_ids
+
+
+def query_count(client, url):
+    # test requests reuse the fixture's app context, and with it the counter in g
+    g.pop("sql_query_count", None)
+    r = client.get(url)
+    assert r.status_code == 200
+    return int(r.headers["X-Query-Count"]), len(r.json["data"]["bookings"])
+
+
+@pytest.mark.parametrize("url", ["/api/admin/bookings", "/api/admin/bookings?limit=50"])
+def test_admin_bookings_query_count_does_not_grow_with_rows(app, client, make_lot, url):
+    lot_ids = [make_lot(20, name=f"Lot {n}") for n in range(3)]
+    users = [User(username=f"u{n}", email=f"u{n}@example.com", password="x") for n in range(4)]
+    db.session.add_all(users)
+    db.session.commit()
+    user_ids = [u.id for u in users]
+    start = datetime(2025, 6, 1, 8, 0)
+
+    add_bookings(lot_ids, user_ids, 3, start)
+    few, rows = query_count(client, url)
+    assert rows == 3
+
+    add_bookings(lot_ids, user_ids, 27, start + timedelta(hours=1))
+    many, rows = query_count(client, url)
+    assert rows == 30
+    assert many == few
@@ -0,0 +1,159 @@
+# backend/tests/test_allocation.py
+import threading
+from datetime import datetime
+
+import pytest
+
+import allocation
+from allocation import claim_spot, claim_spots, AllocationConflict, allocation_stats
+from datab import db, transaction
+from model import ParkingLot, ParkingSpot
+
+
+def counters(lot_id):
+    db.session.expire_all()
+    lot = db.session.get(ParkingLot, lot_id)
+    return lot.available_count, lot.occupied_count
+
+
+def occupied_spots(lot_id):
+    return ParkingSpot.query.filter_by(lot_id=lot_id, status=ParkingSpot.STATUS_OCCUPIED).all()
+
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+# -----------------------------
+# CONCURRENT CLAIMS
+# -----------------------------
+def test_concurrent_claims_never_share_a_spot(app, make_lot):
+    lot_id = make_lot(20)
+    app.config["SPOT_CLAIM_MAX_ATTEMPTS"] = 50
+    claimed, errors = [], []
+
+    def reserve(worker):
+        with app.app_context():
+            try:
+                for n in range(3):
+                    with transaction():
+                        spot_id = claim_spot(lot_id, f"W{worker}-{n}")
+                    claimed.append(spot_id)
+            except Exception as e:  # surfaced below
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    run_threads(reserve, 8)
+
+    assert not errors
+    assert len(claimed) == 24
+    got = [s for s in claimed if s is not None]
+    assert len(got) == 20 and len(set(got)) == 20      # every spot once, 4 turned away
+    assert claimed.count(None) == 4
+    assert counters(lot_id) == (0, 20)
+    assert {s.vehicle_number for s in occupied_spots(lot_id)} <= {f"W{w}-{n}" for w in range(8) for n in range(3)}
+
+
+def test_concurrent_batch_claims_never_share_a_spot(app, make_lot):
+    lot_id = make_lot(30)
+    app.config["SPOT_CLAIM_MAX_ATTEMPTS"] = 50
+    results, errors = [], []
+
+    def reserve(worker):
+        with app.app_context():
+            try:
+                with transaction():
+                    results.extend(claim_spots(lot_id, [f"B{worker}-{n}" for n in range(5)]))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    run_threads(reserve, 8)
+
+    assert not errors
+    got = [s for s in results if s is not None]
+    assert len(got) == 30 and len(set(got)) == 30
+    assert counters(lot_id) == (0, 30)
+    assert len(occupied_spots(lot_id)) == 30
+
+
+def test_batch_claim_skips_a_spot_taken_in_the_same_tick(app, make_lot, monkeypatch, concurrent_write):
+    lot_id = make_lot(4)
+    tick = datetime(2025, 6, 1, 9, 0)
+
+    class Clock(datetime):
+        @classmethod
+        def utcnow(cls):
+            return tick
+
+    monkeypatch.setattr(allocation, "datetime", Clock)
+    first = ParkingSpot.query.filter_by(lot_id=lot_id).order_by(ParkingSpot.id).first().id
+    # another worker claims the first candidate with the same reserved_at
+    concurrent_write(
+        "UPDATE parking_spots",
+        "UPDATE parking_spots SET status = 'O', vehicle_number = 'OTHER', reserved_at = ? WHERE id = ?",
+        (tick.strftime("%Y-%m-%d %H:%M:%S.%f"), first),
+    )
+    concurrent_write(
+        "UPDATE parking_lots",
+        "UPDATE parking_lots SET available_count = available_count - 1, occupied_count = occupied_count + 1 WHERE id = ?",
+        (lot_id,),
+    )
+    before = allocation_stats()
+
+    with transaction():
+        got = claim_spots(lot_id, ["A", "B"])
+
+    assert first not in got and None not in got and len(set(got)) == 2
+    assert allocation_stats()["conflicts"] - before["conflicts"] == 1
+    assert counters(lot_id) == (1, 3)
+    assert ParkingLot.verify_counters() == {}
+
+
+# -----------------------------
+# RETRY BOUND / COUNTERS
+# -----------------------------
+def test_claim_gives_up_after_max_attempts(app, make_lot, monkeypatch):
+    lot_id = make_lot(2)
+    taken = ParkingSpot.query.filter_by(lot_id=lot_id).first()
+    with transaction():
+        assert claim_spot(lot_id, "FIRST") == taken.id
+    # a stale candidate every time, as if another worker always won the race
+    monkeypatch.setattr(allocation, "_first_available_spot_id", lambda lot: taken.id)
+    before = allocation_stats()
+
+    with pytest.raises(AllocationConflict):
+        with transaction():
+            claim_spot(lot_id, "SECOND", max_attempts=3)
+
+    after = allocation_stats()
+    assert after["conflicts"] - before["conflicts"] == 3
+    assert after["retries"] - before["retries"] == 2
+    assert after["exhausted"] - before["exhausted"] == 1
+    assert counters(lot_id) == (1, 1)
+
+
+def test_claim_on_a_full_lot_returns_none(app, make_lot):
+    lot_id = make_lot(1)
+    with transaction():
+        assert claim_spot(lot_id, "ONE") is not None
+    with transaction():
+        assert claim_spot(lot_id, "TWO") is None
+        assert claim_spots(lot_id, ["THREE", "FOUR"]) == [None, None]
+    assert counters(lot_id) == (0, 1)
+
+
+def test_claim_rolls_back_with_the_transaction(app, make_lot):
+    lot_id = make_lot(3)
+    with pytest.raises(RuntimeError):
+        with transaction():
+            claim_spots(lot_id, ["A", "B"])
+            raise RuntimeError("reservation insert failed")
+    assert counters(lot_id) == (3, 0)
+    assert occupied_spots(lot_id) == []
@@ -0,0 +1,77 @@
+# backend/tests/test_bookings.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from allocation import claim_spots
+from cntrlrs.booking_apis import release_bookings
+from datab import db, transaction
+from model import LotDailyStat, ParkingLot, Reservation
+
+
+def book(lot_id, user_id, count, parked_at):
+    with transaction():
+        spot_ids = claim_spots(lot_id, [f"V{n}" for n in range(count)])
+        reservations = [
+            Reservation(user_id=user_id, spot_id=spot_id, vehicle_number=f"V{n}", parking_timestamp=parked_at)
+            for n, spot_id in enumerate(spot_ids)
+        ]
+        db.session.add_all(reservations)
+    return [r.id for r in reservations]
+
+
+def lot_revenue(lot_id):
+    return db.session.scalar(select(func.sum(LotDailyStat.revenue)).where(LotDailyStat.lot_id == lot_id)) or 0.0
+
+
+def test_release_batch_stores_each_cost(app, make_lot, user):
+    lot_id = make_lot(3)
+    now = datetime(2025, 6, 1, 12, 0)
+    ids = book(lot_id, user, 3, now - timedelta(hours=2))
+
+    _, _, costs, released, lots = release_bookings(ids, now)
+
+    assert released == set(ids)
+    assert sorted(len(spots) for spots in lots.values()) == [3]
+    stored = dict(db.session.execute(select(Reservation.id, Reservation.parking_cost)).all())
+    assert stored == costs
+    assert lot_revenue(lot_id) == sum(costs.values())
+    assert ParkingLot.verify_counters() == {}
+
+    # a second batch finds nothing left to release
+    assert release_bookings(ids, now)[3] == set()
+
+
+def test_release_batch_ignores_a_release_in_the_same_tick(app, make_lot, user, concurrent_write):
+    lot_id = make_lot(3)
+    now = datetime(2025, 6, 1, 12, 0)
+    first, raced, last = book(lot_id, user, 3, now - timedelta(hours=2))
+    raced_spot = db.session.get(Reservation, raced).spot_id
+    db.session.expire_all()
+
+    # a single release of `raced` commits between this batch's read and its UPDATE,
+    # stamped with the same `now`
+    concurrent_write(
+        "UPDATE reservations",
+        "UPDATE reservations SET leaving_timestamp = ?, parking_cost = 7.0 WHERE id = ?",
+        (now.strftime("%Y-%m-%d %H:%M:%S.%f"), raced),
+    )
+    concurrent_write(
+        "UPDATE reservations",
+        "UPDATE parking_spots SET status = 'A', vehicle_number = NULL, reserved_at = NULL WHERE id = ?",
+        (raced_spot,),
+    )
+    concurrent_write(
+        "UPDATE reservations",
+        "UPDATE parking_lots SET available_count = available_count + 1, occupied_count = occupied_count - 1 WHERE id = ?",
+        (lot_id,),
+    )
+
+    _, to_release, costs, released, lots = release_bookings([first, raced, last], now)
+
+    assert raced in to_release                      # it looked active when read
+    assert released == {first, last}
+    assert sorted(lots[lot_id]) == sorted(db.session.get(Reservation, b).spot_id for b in (first, last))
+    assert db.session.get(Reservation, raced).parking_cost == 7.0
+    assert lot_revenue(lot_id) == costs[first] + costs[last]
+    assert ParkingLot.verify_counters() == {}
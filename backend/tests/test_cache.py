@@ -0,0 +1,183 @@
+# backend/tests/test_cache.py
+import json
+import time
+import types
+
+import fakeredis
+import pytest
+from flask import Flask
+from flask_caching import Cache
+
+import cache
+from cache import LocalLRU, TwoTierCache
+
+
+class Clock:
+    """Stand-in for cache.time with a monotonic clock the test moves."""
+    def __init__(self):
+        self.now = 1000.0
+
+    def patch(self, monkeypatch):
+        monkeypatch.setattr(cache, "time", types.SimpleNamespace(
+            monotonic=lambda: self.now, time=time.time, time_ns=time.time_ns, sleep=time.sleep))
+        return self
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    return Clock().patch(monkeypatch)
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def workers(server):
+    """workers(n) -> n TwoTierCache instances sharing one (fake) Redis, as n processes would."""
+    app = Flask(__name__)
+    app.config.update(CACHE_TYPE="RedisCache", CACHE_OPTIONS={}, CACHE_PUBSUB_ENABLED=False,
+                      CACHE_L2_RETRY_SECONDS=5, CACHE_L1_VERSION_TTL=5)
+    ctx = app.app_context()
+    ctx.push()
+
+    def make(n):
+        caches = []
+        for _ in range(n):
+            tiered = TwoTierCache(Cache())
+            tiered.init_app(app, redis_client=fakeredis.FakeRedis(server=server))
+            caches.append(tiered)
+        return caches
+    yield make
+    ctx.pop()
+
+
+# -----------------------------
+# L1
+# -----------------------------
+def test_local_lru_evicts_least_recently_used():
+    lru = LocalLRU(max_items=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1          # "b" is now the oldest
+    lru.set("c", 3)
+    assert len(lru) == 2
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+
+
+def test_local_lru_expires_entries(clock):
+    lru = LocalLRU()
+    lru.set("short", 1, timeout=10)
+    lru.set("forever", 2)
+    clock.now += 9
+    assert lru.get("short") == 1
+    clock.now += 2
+    assert lru.get("short") is None
+    assert len(lru) == 1
+    assert lru.get("forever") == 2
+
+
+# -----------------------------
+# L1 / L2
+# -----------------------------
+def test_get_fills_l1_from_l2(workers):
+    a, b = workers(2)
+    a.set("key", {"v": 1}, timeout=60)
+    assert a.l1.get("key") == {"v": 1}
+    assert b.l1.get("key") is None
+
+    assert b.get("key") == {"v": 1}
+    assert b.l1.get("key") == {"v": 1}
+
+
+def test_l2_down_serves_from_l1(workers, server, clock):
+    (a,) = workers(1)
+    a.set("warm", "from-l1", timeout=60)
+    server.connected = False
+
+    assert a.get("warm") == "from-l1"
+    assert a.get("cold") is None                  # the miss tried L2 and marked it down
+    assert a._down_until == clock.now + 5
+    assert not a.l2_available
+
+    server.connected = True
+    a.set("written-while-down", 1, timeout=60)    # L1 only until the retry window ends
+    assert a.backend.get("written-while-down") is None
+    clock.now += 5
+    assert a.l2_available
+    a.set("written-after", 2, timeout=60)
+    assert a.backend.get("written-after") == 2
+
+
+# -----------------------------
+# TAG VERSIONS
+# -----------------------------
+def next_message(pubsub, seconds=2.0):
+    """First published message (get_message returns None for the subscribe confirmation)."""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        message = pubsub.get_message(timeout=0.1)
+        if message:
+            return message
+    raise AssertionError("nothing published")
+
+
+def test_bump_is_published_and_applied_forward_only(workers, server):
+    a, b = workers(2)
+    key = "tagver:lot:1"
+    assert a.versions([key]) == b.versions([key])      # first use agrees through L2
+
+    listener = fakeredis.FakeRedis(server=server).pubsub(ignore_subscribe_messages=True)
+    listener.subscribe(a.channel)
+    a.bump([key])
+    message = next_message(listener)
+    bumped = json.loads(message["data"])
+    assert bumped[key] == a.versions([key])[0] == a.backend.get(key)
+
+    b._apply(message["data"])
+    assert b.l1.get(key) == bumped[key]
+
+    # a late, older message doesn't move the version back
+    b._apply(json.dumps({key: bumped[key] - 1}))
+    assert b.l1.get(key) == bumped[key]
+    b._apply(json.dumps({key: bumped[key] + 1}))
+    assert b.l1.get(key) == bumped[key] + 1
+
+
+def test_listener_applies_bumps_from_another_worker(workers, server):
+    a, b = workers(2)
+    key = "tagver:charts"
+    b._start_listener()
+    deadline = time.monotonic() + 2
+    while not fakeredis.FakeRedis(server=server).pubsub_numsub(b.channel)[0][1]:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    old = b.versions([key])[0]
+
+    a.bump([key])
+    while b.l1.get(key) == old:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert b.l1.get(key) == a.versions([key])[0]
+
+
+# -----------------------------
+# SINGLE-FLIGHT LOCKS
+# -----------------------------
+def test_acquire_release_across_workers(workers, server):
+    a, b = workers(2)
+    assert a.acquire("lock:x", timeout=30)
+    assert not a.acquire("lock:x", timeout=30)   # held in this process
+    assert not b.acquire("lock:x", timeout=30)   # held by another worker (L2 add)
+
+    a.release("lock:x")
+    assert b.acquire("lock:x", timeout=30)
+    assert not a.acquire("lock:x", timeout=30)
+    b.release("lock:x")
+
+    # L2 down: the process-local lock still holds
+    server.connected = False
+    assert a.acquire("lock:y", timeout=30)
+    assert not a.acquire("lock:y", timeout=30)
@@ -0,0 +1,43 @@
+# backend/tests/test_lot_provision.py
+import types
+
+import pytest
+
+from cntrlrs import parkinglot_apis
+from cntrlrs.parkinglot_apis import LotProvisionStatusAPI
+
+
+@pytest.fixture
+def task_state(app, api_client, monkeypatch):
+    """task_state(state, info=None, result=None) -> GET /api/lots/provision/<id> for a task in that state."""
+    client = api_client(app, {"/lots/provision/<string:task_id>": LotProvisionStatusAPI})
+
+    def get(state, info=None, result=None):
+        task = types.SimpleNamespace(state=state, info=info, result=result)
+        monkeypatch.setattr(parkinglot_apis, "AsyncResult", lambda task_id: task)
+        return client.get("/api/lots/provision/abc")
+    return get
+
+
+def test_progress_and_done_are_success_responses(task_state):
+    r = task_state("PENDING")
+    assert r.status_code == 200
+    assert r.json["status"] == "success" and r.json["data"] == {"state": "pending"}
+
+    r = task_state("PROGRESS", info={"lot_id": 7, "done": 5000, "total": 20000})
+    assert r.status_code == 200
+    assert r.json["data"] == {"state": "running", "lot_id": 7, "done": 5000, "total": 20000}
+
+    r = task_state("SUCCESS", result={"status": "success", "lot_id": 7, "created": 20000})
+    assert r.status_code == 200
+    assert r.json["data"] == {"state": "done", "lot_id": 7, "created": 20000}
+
+
+def test_failures_are_error_responses(task_state):
+    r = task_state("FAILURE", result=RuntimeError("database is locked"))
+    assert r.status_code == 500
+    assert r.json["status"] == "error" and "database is locked" in r.json["message"]
+
+    r = task_state("SUCCESS", result={"status": "error", "message": "Parking lot not found"})
+    assert r.status_code == 404
+    assert r.json["message"] == "Parking lot not found"
@@ -0,0 +1,81 @@
+# backend/tests/test_occupancy.py
+import fakeredis
+import pytest
+from sqlalchemy import select, update
+
+import occupancy
+from cache import invalidate, layout_tag
+from occupancy import OccupancyBitmaps, layout_version
+from datab import db
+from model import ParkingLot, ParkingSpot
+
+
+@pytest.fixture(params=["memory", "redis"])
+def bitmaps(request, app):
+    bitmaps = OccupancyBitmaps()
+    if request.param == "redis":
+        bitmaps.redis = fakeredis.FakeRedis()
+    return bitmaps
+
+
+def first_spot(lot_id):
+    return db.session.execute(
+        select(ParkingSpot.id).where(ParkingSpot.lot_id == lot_id).order_by(ParkingSpot.id)
+    ).scalar()
+
+
+def occupy_during_build(monkeypatch, bitmaps, lot_id, spot_id):
+    """Occupy spot_id (DB + event) right after build() has read the layout."""
+    real_load_layout = occupancy.load_layout
+
+    def load_layout(lot):
+        rows = real_load_layout(lot)
+        monkeypatch.setattr(occupancy, "load_layout", real_load_layout)
+        db.session.execute(update(ParkingSpot).where(ParkingSpot.id == spot_id)
+                           .values(status=ParkingSpot.STATUS_OCCUPIED))
+        db.session.commit()
+        bitmaps.apply({"type": "spots", "lot_id": lot_id, "status": ParkingSpot.STATUS_OCCUPIED,
+                       "spot_ids": [spot_id]})
+        return rows
+
+    monkeypatch.setattr(occupancy, "load_layout", load_layout)
+
+
+def test_snapshot_applies_later_events(bitmaps, make_lot):
+    lot_id = make_lot(10)
+    _, bits = bitmaps.snapshot(lot_id)
+    assert bits == b"\x00\x00"
+
+    bitmaps.apply({"type": "spots", "lot_id": lot_id, "status": ParkingSpot.STATUS_OCCUPIED,
+                   "spot_ids": [first_spot(lot_id)]})
+    assert bitmaps.snapshot(lot_id)[1] == b"\x80\x00"
+
+
+def test_event_during_build_is_not_lost(monkeypatch, bitmaps, make_lot):
+    lot_id = make_lot(10)
+    occupy_during_build(monkeypatch, bitmaps, lot_id, first_spot(lot_id))
+
+    bitmaps.snapshot(lot_id)        # raced with the event: served once, not kept
+    assert bitmaps._cached(lot_id) is None
+    assert bitmaps.snapshot(lot_id)[1] == b"\x80\x00"
+    assert bitmaps._cached(lot_id) is not None
+
+
+def test_memory_bitmap_rebuilds_after_layout_tag_bump(make_lot):
+    bitmaps = OccupancyBitmaps()
+    lot_id = make_lot(10)
+    version, _ = bitmaps.snapshot(lot_id)
+
+    # spots provisioned by another process: no event here, only the tag bump
+    lot = db.session.get(ParkingLot, lot_id)
+    lot.number_of_spots = 12
+    lot.create_spots()
+    db.session.commit()
+    assert bitmaps.snapshot(lot_id)[0] == version
+
+    invalidate(layout_tag(lot_id))
+    version, bits = bitmaps.snapshot(lot_id)
+    assert len(bits) == 2
+    assert version == layout_version(
+        db.session.execute(select(ParkingSpot.id).where(ParkingSpot.lot_id == lot_id)
+                           .order_by(ParkingSpot.id)).scalars().all())
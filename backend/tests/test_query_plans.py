@@ -0,0 +1,91 @@
+# backend/tests/test_query_plans.py
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from datab import db
+from model import ParkingSpot, Reservation
+from allocation import _available_spot_ids
+from cntrlrs.pagination import PageParams, keyset_page
+from cntrlrs.serializers import BOOKING
+
+
+# -----------------------------
+# HELPERS
+# -----------------------------
+@contextmanager
+def captured_sql():
+    """The (statement, parameters) of every SELECT run inside the block."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+
+def query_plan(statement, parameters):
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    return [row[-1] for row in rows]
+
+
+def assert_uses_index(statements, table, index):
+    plans = [query_plan(s, p) for s, p in statements]
+    steps = [step for plan in plans for step in plan if f" {table} " in f" {step} "]
+    assert steps, f"no step reads {table}: {plans}"
+    for step in steps:
+        assert "USING" in step and index in step, f"{table} not read through {index}: {step}"
+        assert not step.startswith("SCAN"), f"full scan of {table}: {step}"
+
+
+# -----------------------------
+# HOT QUERIES
+# -----------------------------
+def test_allocation_uses_lot_status_index(make_lot):
+    lot_id = make_lot(5)
+    with captured_sql() as statements:
+        assert _available_spot_ids(lot_id, 2)
+    assert_uses_index(statements, "parking_spots", "ix_parking_spots_lot_status")
+
+
+def test_user_history_uses_user_parking_index(make_lot, user):
+    lot_id = make_lot(2)
+    spot_id = ParkingSpot.query.filter_by(lot_id=lot_id).first().id
+    db.session.add(Reservation(user_id=user, spot_id=spot_id, vehicle_number="MH01"))
+    db.session.commit()
+
+    query = BOOKING.select().where(Reservation.user_id == user)
+    with captured_sql() as statements:
+        rows, _, _ = keyset_page(query, [Reservation.parking_timestamp, Reservation.id],
+                                 PageParams(limit=10), descending=True)
+    assert len(rows) == 1
+    assert_uses_index(statements, "reservations", "ix_reservations_user_parking")
+
+
+def test_active_reservation_of_spot_uses_partial_index(make_lot, user):
+    lot_id = make_lot(1)
+    spot_id = ParkingSpot.query.filter_by(lot_id=lot_id).first().id
+    db.session.add(Reservation(user_id=user, spot_id=spot_id, vehicle_number="MH01"))
+    db.session.commit()
+
+    # as in ParkingSpotAPI / AdminSpotDetailsAPI
+    with captured_sql() as statements:
+        assert Reservation.query.filter_by(spot_id=spot_id, leaving_timestamp=None).first()
+    assert_uses_index(statements, "reservations", "ix_reservations_active_spot")
+
+
+def test_unindexed_filter_is_reported_as_a_scan(make_lot):
+    # guards the helper itself: a filter with no index must not pass
+    make_lot(1)
+    statements = [("SELECT id FROM parking_spots WHERE vehicle_number = ?", ("MH01",))]
+    try:
+        assert_uses_index(statements, "parking_spots", "ix_parking_spots_lot_status")
+    except AssertionError:
+        return
+    raise AssertionError("full scan was not detected")
@@ -0,0 +1,178 @@
+# backend/tests/test_sharding.py
+from flask import g
+from sqlalchemy import event, select, text
+
+import sharding
+from allocation import claim_spots
+from cntrlrs.booking_apis import ReleaseBatchAPI
+from cntrlrs.pagination import PageParams, sharded_keyset_page
+from datab import db, transaction
+from model import ParkingLot, ParkingSpot, Reservation, User
+from sharding import SHARD_ID_SPAN, choose_shard, create_shards, on_shard, shard_bind, shard_of
+
+
+def make_lot(shard, spots, name="Lot"):
+    with on_shard(shard), transaction():
+        lot = ParkingLot(prime_location_name=name, address="addr", pin_code="400001",
+                         price_per_hour=20.0, number_of_spots=spots)
+        db.session.add(lot)
+        db.session.flush()
+        lot_id = lot.id
+        lot.create_spots()
+    return lot_id
+
+
+def book(lot_id, user_id, count=1):
+    with on_shard(shard_of(lot_id)), transaction():
+        reservations = [
+            Reservation(user_id=user_id, spot_id=spot_id, vehicle_number=f"V{n}")
+            for n, spot_id in enumerate(claim_spots(lot_id, [f"V{n}" for n in range(count)]))
+        ]
+        db.session.add_all(reservations)
+        db.session.flush()
+        booking_ids = [r.id for r in reservations]
+    return booking_ids
+
+
+def make_user():
+    user = User(username="tester", email="tester@example.com", password="x")
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+# -----------------------------
+# PLACEMENT / ID RANGES
+# -----------------------------
+def test_choose_shard_prefers_the_longest_prefix(sharded_app):
+    sharded_app.config["SHARD_PIN_CODE_PREFIXES"] = {"40": 1, "400": 2, "56": 7}
+    assert sharding.shard_count() == 3
+    assert choose_shard("400001") == 2
+    assert choose_shard("401203") == 1
+    # an out-of-range mapping falls back to the stable hash, like an unmapped pin code
+    for pin_code in ("560001", "110001", None):
+        assert choose_shard(pin_code) in (0, 1, 2)
+        assert choose_shard(pin_code) == choose_shard(pin_code)
+
+
+def test_shard_id_ranges(sharded_app):
+    user_id = make_user()
+    for shard in (0, 1, 2):
+        lot_id = make_lot(shard, 2)
+        with on_shard(shard):
+            spot_ids = db.session.execute(select(ParkingSpot.id).where(ParkingSpot.lot_id == lot_id)).scalars().all()
+        booking_ids = book(lot_id, user_id)
+        for object_id in [lot_id, *spot_ids, *booking_ids]:
+            assert shard_of(object_id) == shard
+            assert shard * SHARD_ID_SPAN <= object_id < (shard + 1) * SHARD_ID_SPAN
+
+    # rerunning the setup keeps the sequences where they are
+    last = make_lot(1, 0)
+    create_shards()
+    assert make_lot(1, 0) == last + 1
+    assert shard_of(3 * SHARD_ID_SPAN) is None
+    assert shard_of("not-an-id") is None
+
+
+# -----------------------------
+# ROUTING
+# -----------------------------
+def test_get_bind_routes_lot_tables_to_the_shard(sharded_app):
+    shard_engine = db.engines[shard_bind(1)]
+    session = db.session
+    with on_shard(1):
+        assert session.get_bind(mapper=ParkingLot) is shard_engine
+        assert session.get_bind(mapper=Reservation) is shard_engine
+        assert session.get_bind(clause=select(ParkingSpot.id)) is shard_engine
+        assert session.get_bind(clause=text("SELECT 1")) is shard_engine
+        # users stay on the primary
+        assert session.get_bind(mapper=User) is db.engine
+        assert session.get_bind(clause=select(User.id)) is db.engine
+    with on_shard(0):
+        assert session.get_bind(mapper=ParkingLot) is db.engine
+
+
+def test_route_request_picks_the_shard_from_the_url(sharded_app):
+    @sharded_app.route("/probe/lot/<int:lot_id>")
+    @sharded_app.route("/probe/booking/<int:booking_id>")
+    @sharded_app.route("/probe/none")
+    def probe(**kwargs):
+        return {"shard": g.get("shard")}
+
+    client = sharded_app.test_client()
+    assert client.get(f"/probe/lot/{2 * SHARD_ID_SPAN + 5}").json == {"shard": 2}
+    assert client.get(f"/probe/booking/{SHARD_ID_SPAN + 1}").json == {"shard": 1}
+    assert client.get("/probe/lot/7").json == {"shard": 0}
+    assert client.get(f"/probe/lot/{9 * SHARD_ID_SPAN}").json == {"shard": None}
+    assert client.get("/probe/none").json == {"shard": None}
+
+
+# -----------------------------
+# SCATTER / GATHER PAGES
+# -----------------------------
+def test_sharded_keyset_page_merges_shards(sharded_app):
+    for shard in (0, 1, 2):
+        make_lot(shard, 3)
+    columns = [ParkingSpot.id]
+    query = select(ParkingSpot.id, ParkingSpot.spot_number)
+    everything = sorted(
+        spot_id for ids in sharding.for_each_shard(lambda: db.session.execute(select(ParkingSpot.id)).scalars().all())
+        for spot_id in ids
+    )
+    assert len(everything) == 9
+
+    for descending in (False, True):
+        expected = sorted(everything, reverse=descending)
+        pages, cursor = [], None
+        while True:
+            rows, next_cursor, prev_cursor = sharded_keyset_page(
+                query, columns, PageParams(4, after=cursor), descending)
+            pages.append(([r.id for r in rows], prev_cursor))
+            if next_cursor is None:
+                break
+            cursor = next_cursor
+        assert [len(ids) for ids, _ in pages] == [4, 4, 1]
+        assert [i for ids, _ in pages for i in ids] == expected
+
+        # walk back from the last page
+        ids, prev_cursor = pages[-1]
+        back, cursor = [], prev_cursor
+        while cursor:
+            rows, _, cursor = sharded_keyset_page(query, columns, PageParams(4, before=cursor), descending)
+            back = [r.id for r in rows] + back
+        assert back == expected[:8]
+
+
+# -----------------------------
+# CROSS-SHARD BATCH RELEASE
+# -----------------------------
+def test_release_batch_commits_once_per_shard(sharded_app, api_client):
+    client = api_client(sharded_app, {"/bookings/release/batch": ReleaseBatchAPI})
+    user_id = make_user()
+    ones = book(make_lot(1, 2), user_id, 2)
+    twos = book(make_lot(2, 1), user_id, 1)
+
+    commits = {shard: 0 for shard in (0, 1, 2)}
+    engines = {0: db.engine, 1: db.engines[shard_bind(1)], 2: db.engines[shard_bind(2)]}
+    listeners = {}
+    for shard, engine in engines.items():
+        listeners[shard] = lambda conn, shard=shard: commits.__setitem__(shard, commits[shard] + 1)
+        event.listen(engine, "commit", listeners[shard])
+    try:
+        r = client.post("/api/bookings/release/batch",
+                        json={"booking_ids": [twos[0], ones[0], 5 * SHARD_ID_SPAN, ones[1]]})
+    finally:
+        for shard, engine in engines.items():
+            event.remove(engine, "commit", listeners[shard])
+
+    assert r.status_code == 200
+    assert [(b["booking_id"], b["status"]) for b in r.json["data"]["results"]] == [
+        (twos[0], "released"), (ones[0], "released"), (5 * SHARD_ID_SPAN, "failed"), (ones[1], "released"),
+    ]
+    assert commits[1] == 1 and commits[2] == 1
+    for shard, ids in ((1, ones), (2, twos)):
+        with on_shard(shard):
+            assert db.session.execute(
+                select(Reservation.id).where(Reservation.leaving_timestamp.is_(None))
+            ).all() == []
+            assert ParkingLot.verify_counters() == {}
@@ -0,0 +1,150 @@
+# backend/tests/test_spot_pool.py
+import fakeredis
+import pytest
+from sqlalchemy import select, update
+
+import allocation
+from allocation import claim_spots
+from datab import db, transaction
+from model import ParkingSpot
+from spot_pool import SEEDED_KEY, SpotPool, pool_key
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def pool(app, server, monkeypatch):
+    """init_pool() -> a SpotPool on fakeredis, seeded from the lots that exist by then."""
+    app.config["SPOT_POOL_ENABLED"] = True
+    pool = SpotPool()
+    monkeypatch.setattr(allocation, "spot_pool", pool)
+
+    def init_pool():
+        pool.init_app(app, redis_client=fakeredis.FakeRedis(server=server))
+        return pool
+    return init_pool
+
+
+def spot_ids(lot_id):
+    return db.session.execute(
+        select(ParkingSpot.id).where(ParkingSpot.lot_id == lot_id).order_by(ParkingSpot.id)
+    ).scalars().all()
+
+
+def pooled(pool, lot_id):
+    return [int(i) for i in pool.redis.zrange(pool_key(lot_id), 0, -1)]
+
+
+# -----------------------------
+# SEED / POP
+# -----------------------------
+def test_seed_and_pop_lowest_ids_first(make_lot, pool):
+    lot_id = make_lot(5)
+    pool = pool()
+    ids = spot_ids(lot_id)
+
+    assert pooled(pool, lot_id) == ids
+    assert pool.pop(lot_id, 2) == ids[:2]
+    assert pool.pop(lot_id) == ids[2:3]
+    assert pool.pop(lot_id, 5) == ids[3:]
+    assert pool.pop(lot_id, 1) == []            # seeded but empty: the lot is full
+    assert pool.pop(lot_id + 1, 1) is None      # never seeded: ask the DB
+
+
+def test_seed_lot_skips_occupied_spots(make_lot, pool):
+    pool = pool()
+    lot_id = make_lot(3)
+    assert pool.pop(lot_id) is None
+    with transaction():
+        taken = claim_spots(lot_id, ["A"])
+
+    pool.seed_lot(lot_id)
+    assert pooled(pool, lot_id) == [i for i in spot_ids(lot_id) if i not in taken]
+
+
+# -----------------------------
+# PUSH / DISCARD / DROP
+# -----------------------------
+def test_push_discard_and_drop(make_lot, pool):
+    lot_id = make_lot(4)
+    pool = pool()
+    ids = spot_ids(lot_id)
+    popped = pool.pop(lot_id, 2)
+
+    pool.push(lot_id, popped)
+    assert pooled(pool, lot_id) == ids
+    pool.discard(lot_id, ids[1:3])
+    assert pooled(pool, lot_id) == [ids[0], ids[3]]
+
+    pool.drop_lot(lot_id)
+    assert not pool.redis.exists(pool_key(lot_id))
+    assert not pool.redis.sismember(SEEDED_KEY, lot_id)
+    assert pool.pop(lot_id) is None
+
+
+def test_redis_down_turns_the_pool_off_not_the_app(make_lot, pool, server):
+    lot_id = make_lot(2)
+    pool = pool()
+    server.connected = False
+
+    assert pool.pop(lot_id) is None
+    pool.push(lot_id, [1])
+    pool.discard(lot_id, [1])
+    with transaction():
+        assert claim_spots(lot_id, ["A", "B"]) == spot_ids(lot_id)
+
+
+# -----------------------------
+# RECONCILE
+# -----------------------------
+def test_reconcile_repairs_drift(make_lot, pool):
+    lot_id = make_lot(4)
+    pool = pool()
+    ids = spot_ids(lot_id)
+    occupied = ids[:1]                              # claimed behind the pool's back
+    db.session.execute(update(ParkingSpot).where(ParkingSpot.id.in_(occupied))
+                       .values(status=ParkingSpot.STATUS_OCCUPIED))
+    db.session.commit()
+    pool.redis.zrem(pool_key(lot_id), str(ids[3]))  # a free spot the pool lost
+    pool.redis.sadd(SEEDED_KEY, 999)                # pool of a deleted lot
+    pool.redis.zadd(pool_key(999), {"5000": 5000})
+
+    assert pool.reconcile() == {lot_id: {"added": 1, "removed": 1}}
+    assert pooled(pool, lot_id) == [i for i in ids if i not in occupied]
+    assert not pool.redis.exists(pool_key(999))
+    assert not pool.redis.sismember(SEEDED_KEY, 999)
+    assert pool.reconcile() == {}
+
+
+# -----------------------------
+# ALLOCATION FALLBACK
+# -----------------------------
+def test_short_pool_falls_back_to_the_db_and_reseeds(make_lot, pool):
+    lot_id = make_lot(5)
+    pool = pool()
+    ids = spot_ids(lot_id)
+    lost = pool.pop(lot_id, 3)                      # e.g. claims that rolled back
+
+    candidates = allocation._available_spot_ids(lot_id, 3)
+
+    assert len(candidates) == 3 and set(candidates) <= set(ids)
+    # rebuilt from the DB, minus what was just handed out
+    assert pooled(pool, lot_id) == [i for i in ids if i not in candidates]
+    assert set(lost) & set(candidates)
+
+    with transaction():
+        got = claim_spots(lot_id, ["A", "B", "C"])
+    assert None not in got and len(set(got)) == 3
+
+
+def test_full_pool_is_used_without_the_db(app, make_lot, pool, concurrent_write):
+    lot_id = make_lot(3)
+    pool = pool()
+    expected = spot_ids(lot_id)[:2]
+    watched = concurrent_write("SELECT parking_spots.id", "SELECT 1")
+
+    assert allocation._available_spot_ids(lot_id, 2) == expected
+    assert watched == []
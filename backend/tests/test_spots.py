@@ -0,0 +1,51 @@
+# backend/tests/test_spots.py
+from sqlalchemy import select, update
+
+from datab import db, transaction
+from model import ParkingLot, ParkingSpot
+
+
+def spot_numbers(lot_id):
+    return db.session.execute(
+        select(ParkingSpot.spot_number).where(ParkingSpot.lot_id == lot_id).order_by(ParkingSpot.id)
+    ).scalars().all()
+
+
+def resize(lot_id, spots):
+    with transaction():
+        lot = db.session.get(ParkingLot, lot_id)
+        delta = spots - lot.number_of_spots
+        lot.number_of_spots = spots
+        if delta < 0:
+            lot.remove_available_spots(-delta)
+        else:
+            lot.create_spots()
+
+
+def test_grow_after_shrink_skips_used_numbers(make_lot):
+    lot_id = make_lot(5)
+    # S5 is occupied, so shrinking to 3 removes S3 and S4 and leaves a gap
+    db.session.execute(update(ParkingSpot).where(ParkingSpot.spot_number == "S5")
+                       .values(status=ParkingSpot.STATUS_OCCUPIED))
+    ParkingLot.adjust_counters(lot_id, available=-1, occupied=1)
+    db.session.commit()
+
+    resize(lot_id, 3)
+    assert spot_numbers(lot_id) == ["S1", "S2", "S5"]
+
+    resize(lot_id, 8)
+    assert spot_numbers(lot_id) == ["S1", "S2", "S5", "S6", "S7", "S8", "S9", "S10"]
+    lot = db.session.get(ParkingLot, lot_id)
+    db.session.refresh(lot)
+    assert (lot.available_count, lot.occupied_count) == (7, 1)
+
+
+def test_create_spots_in_chunks(make_lot):
+    lot_id = make_lot(0)
+    lot = db.session.get(ParkingLot, lot_id)
+    lot.number_of_spots = 5
+    assert len(lot.create_spots(limit=2)) == 2
+    assert len(lot.create_spots(limit=2)) == 2
+    assert len(lot.create_spots(limit=2)) == 1
+    assert lot.create_spots(limit=2) == []
+    assert spot_numbers(lot_id) == ["S1", "S2", "S3", "S4", "S5"]